@@ -24,7 +24,21 @@ from app.schemas.admin import (
     RtdConfigUpdate,
     UserResponse,
 )
-from app.services.ssh_runtime import get_host_parallel_limit_info, probe_host_parallel_limit_info
+from app.services.catalog_cache import (
+    clear_catalog_cache,
+    get_catalog_cache_stats,
+    invalidate_ezdfs_catalog,
+    invalidate_rtd_catalog,
+)
+from app.services.ezdfs_catalog_custom import clear_subrule_memo
+from app.services.remote_source_cache import clear_remote_source_cache, get_remote_source_cache_stats
+from app.services.ssh_runtime import (
+    close_host_ssh_connections,
+    get_host_parallel_limit_info,
+    probe_host_parallel_limit_info,
+)
+from app.services.task_history import get_retention_stats
+from app.services.task_worker import get_task_scheduler_stats
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -140,6 +154,32 @@ def list_host_ssh_limits(
     return success_response({"items": response_items})
 
 
+@router.get("/task-scheduler")
+def get_task_scheduler_status(
+    _: User = Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    return success_response({"scheduler": get_task_scheduler_stats(db)})
+
+
+@router.get("/task-retention")
+def get_task_retention_status(_: User = Depends(get_current_admin)):
+    return success_response({"retention": get_retention_stats()})
+
+
+@router.get("/catalog-cache")
+def get_catalog_cache_status(_: User = Depends(get_current_admin)):
+    return success_response({"cache": get_catalog_cache_stats(), "source_cache": get_remote_source_cache_stats()})
+
+
+@router.delete("/catalog-cache", status_code=status.HTTP_204_NO_CONTENT)
+def clear_catalog_cache_entries(_: User = Depends(get_current_admin)):
+    clear_catalog_cache()
+    clear_remote_source_cache()
+    clear_subrule_memo()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
 @router.post("/hosts", status_code=status.HTTP_201_CREATED)
 def create_host(
     payload: HostConfigCreate,
@@ -181,6 +221,7 @@ def update_host(
     db.add(host)
     db.commit()
     db.refresh(host)
+    close_host_ssh_connections(name)
     return success_response({"host": HostConfigResponse.model_validate(host).model_dump()})
 
 
@@ -229,6 +270,7 @@ def delete_host(
 
     db.delete(host)
     db.commit()
+    close_host_ssh_connections(name)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -327,6 +369,7 @@ def update_host_credential(
     db.add(credential)
     db.commit()
     db.refresh(credential)
+    close_host_ssh_connections(name)
     return success_response({"credential": HostCredentialResponse.model_validate(credential).model_dump()})
 
 
@@ -362,6 +405,7 @@ def delete_host_credential(
 
     db.delete(credential)
     db.commit()
+    close_host_ssh_connections(name)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -428,10 +472,16 @@ def update_rtd_config(
     config.home_dir_path = payload.home_dir_path
     config.host_name = payload.host_name
     config.login_user = payload.login_user
+    if payload.parallel_test_enabled is not None:
+        config.parallel_test_enabled = payload.parallel_test_enabled
+    if payload.parallel_test_limit is not None:
+        config.parallel_test_limit = payload.parallel_test_limit
     config.modifier = current_admin.user_name
     db.add(config)
     db.commit()
     db.refresh(config)
+    invalidate_rtd_catalog(line_name)
+    invalidate_rtd_catalog(config.line_name)
     return success_response({"config": RtdConfigResponse.model_validate(config).model_dump()})
 
 
@@ -446,6 +496,7 @@ def delete_rtd_config(
         raise HTTPException(status_code=404, detail="RTD config not found")
     db.delete(config)
     db.commit()
+    invalidate_rtd_catalog(line_name)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -498,10 +549,14 @@ def update_ezdfs_config(
     config.home_dir_path = payload.home_dir_path
     config.host_name = payload.host_name
     config.login_user = payload.login_user
+    if payload.queue_policy is not None:
+        config.queue_policy = payload.queue_policy
     config.modifier = current_admin.user_name
     db.add(config)
     db.commit()
     db.refresh(config)
+    invalidate_ezdfs_catalog(module_name)
+    invalidate_ezdfs_catalog(config.module_name)
     return success_response({"config": EzdfsConfigResponse.model_validate(config).model_dump()})
 
 
@@ -516,4 +571,5 @@ def delete_ezdfs_config(
         raise HTTPException(status_code=404, detail="ezDFS config not found")
     db.delete(config)
     db.commit()
+    invalidate_ezdfs_catalog(module_name)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import Generator
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from sqlalchemy.orm import Session
@@ -26,6 +26,25 @@ def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db),
 ) -> User:
+    return _resolve_user_from_token(db, token)
+
+
+def get_current_user_from_query_token(token: str = Query(default="")) -> User:
+    """
+    Authenticate long-lived streaming requests (EventSource cannot send headers).
+
+    Uses its own short DB session so the stream does not pin a connection.
+    """
+    db = SessionLocal()
+    try:
+        user = _resolve_user_from_token(db, token)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+
+def _resolve_user_from_token(db: Session, token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail={
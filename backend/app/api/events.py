@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import get_current_user_from_query_token
+from app.models.entities import User
+from app.services.task_events import task_event_broker
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+_KEEPALIVE_SECONDS = 15.0
+
+
+@router.get("/tasks")
+async def stream_task_events(
+    request: Request,
+    current_user: User = Depends(get_current_user_from_query_token),
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events stream of the caller's task / queue changes."""
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    subscriber, backlog = task_event_broker.subscribe(current_user.user_id, resume_from)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            for event in backlog:
+                yield event.to_sse()
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield event.to_sse()
+        finally:
+            task_event_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
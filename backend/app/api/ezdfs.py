@@ -1,15 +1,16 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_user, get_current_user_from_query_token, get_db
 from app.core.responses import success_response
 from app.models.entities import User
 from app.schemas.testing import EzdfsActionRequest, EzdfsAggregateSummaryRequest, EzdfsSessionPayload, SvnUploadRequest
 from app.services.catalog_service import (
+    get_ezdfs_dependents,
     get_ezdfs_modules,
     get_ezdfs_rules,
     get_ezdfs_sub_rules,
@@ -20,6 +21,7 @@ from app.services.file_download import (
     get_existing_download_path,
 )
 from app.services.file_service import generate_summary_file
+from app.services.output_tail import iter_task_output_events, resolve_task_raw_dir
 from app.services.rule_favorites import list_favorite_rule_names, set_favorite
 from app.services.session_service import clear_runtime_session, get_runtime_session_payload, upsert_runtime_session
 from app.services.svn_upload_custom import perform_ezdfs_svn_upload
@@ -27,9 +29,10 @@ from app.services.task_service import (
     create_test_task,
     ensure_task_owner,
     list_tasks_by_type,
+    resolve_task_priority,
     serialize_task,
 )
-from app.services.task_worker import queue_task
+from app.services.task_worker import cancel_task, queue_task
 from app.utils.enums import ActionType, TaskStep, TestType
 
 router = APIRouter(prefix="/api/ezdfs", tags=["ezdfs"])
@@ -106,6 +109,17 @@ def sub_rules(
         return success_response({"items": ["error"], "error": str(exc)})
 
 
+@router.get("/dependents")
+def dependents(
+    module_name: str,
+    rule_name: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Rules whose deployed file directly includes `rule_name` (dependency index reverse lookup)."""
+    return success_response({"items": get_ezdfs_dependents(db, current_user, module_name, rule_name)})
+
+
 @router.get("/session")
 def get_session(
     current_user: User = Depends(get_current_user),
@@ -165,6 +179,7 @@ def _create_ezdfs_task(
         owner_user_id=current_user.user_id,
         target_name=payload.rule_name,
         requested_payload=payload.model_dump(),
+        priority=resolve_task_priority(current_user, payload.priority),
         current_step=TaskStep.TESTING,
     )
     queue_task(background_tasks, task.task_id, TaskStep.TESTING, TestType.EZDFS)
@@ -185,6 +200,7 @@ def sync_action(
         owner_user_id=current_user.user_id,
         target_name=payload.rule_name,
         requested_payload=payload.model_dump(),
+        priority=resolve_task_priority(current_user, payload.priority),
         current_step=TaskStep.SYNCING,
     )
     queue_task(background_tasks, task.task_id, TaskStep.SYNCING, TestType.EZDFS)
@@ -230,6 +246,16 @@ def get_status(
     return success_response({"task": serialize_task(task)})
 
 
+@router.post("/status/{task_id}/cancel")
+def cancel_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    task = ensure_task_owner(db, task_id, current_user.user_id, TestType.EZDFS)
+    return success_response({"task": serialize_task(cancel_task(db, task))})
+
+
 @router.get("/results/{task_id}/raw")
 def download_raw(
     task_id: str,
@@ -241,6 +267,25 @@ def download_raw(
     return FileResponse(path=path, filename=path.name, media_type="text/plain")
 
 
+@router.get("/results/{task_id}/tail")
+def tail_output(
+    task_id: str,
+    request: Request,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user_from_query_token),
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+):
+    """SSE live output of a RUNNING test task, from byte `offset` (negative = from the end)."""
+    raw_task_dir = resolve_task_raw_dir(task_id, current_user.user_id, TestType.EZDFS)
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    return StreamingResponse(
+        iter_task_output_events(request, task_id, raw_task_dir, None, offset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/results/{task_id}/summary")
 def generate_summary(
     task_id: str,
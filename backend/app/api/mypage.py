@@ -1,26 +1,29 @@
 from __future__ import annotations
 
-import json
 from datetime import date, datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Query as OrmQuery, Session
 
 from app.api.deps import get_current_user, get_db
 from app.core.responses import success_response
-from app.models.entities import DashboardLike, RtdConfig, TaskHistoryDaily, TestTask, User
+from app.models.entities import DashboardLike, RtdConfig, TaskHistoryDaily, TestTask, TestTaskRule, User
 from app.services.file_download import (
     get_ezdfs_raw_content_path,
     get_existing_download_path,
     get_rtd_raw_rule_file_map,
+    iter_raw_export_entries,
+    list_raw_export_tasks,
 )
 from app.services.file_service import generate_summary_file
+from app.services.task_history import flush_task_history
 from app.services.task_service import ensure_task_owner, list_tasks_by_type, serialize_task
 from app.utils.enums import ActionType, TaskStatus, TestType
 from app.utils.constants import TARGET_SUFFIX
 from app.utils.naming import normalize_target_line_name
+from app.utils.zip_stream import iter_zip_stream
 
 router = APIRouter(prefix="/api/mypage", tags=["mypage"])
 
@@ -28,46 +31,6 @@ _RESULT_TEST_ACTIONS = [ActionType.TEST.value, ActionType.RETEST.value]
 _PAGE_SIZE = 8
 
 
-def _task_rule_name(task: TestTask) -> str:
-    try:
-        p = json.loads(task.requested_payload_json or "{}")
-        n = p.get("payload") if isinstance(p.get("payload"), dict) else p
-        return str(n.get("selected_rule") or p.get("rule_name") or "").strip()
-    except (json.JSONDecodeError, ValueError):
-        return ""
-
-
-def _task_rule_names(task: TestTask) -> list[str]:
-    try:
-        p = json.loads(task.requested_payload_json or "{}")
-        n = p.get("payload") if isinstance(p.get("payload"), dict) else p
-        selected_rule_targets = (
-            n.get("selected_rule_targets")
-            if isinstance(n.get("selected_rule_targets"), list)
-            else []
-        )
-        rule_names = [
-            str(item.get("rule_name", "")).strip()
-            for item in selected_rule_targets
-            if str(item.get("rule_name", "")).strip()
-        ]
-        if rule_names:
-            return rule_names
-        fallback_rule = str(n.get("selected_rule") or p.get("rule_name") or "").strip()
-        return [fallback_rule] if fallback_rule else []
-    except (json.JSONDecodeError, ValueError):
-        return []
-
-
-def _task_module_name(task: TestTask) -> str:
-    try:
-        p = json.loads(task.requested_payload_json or "{}")
-        n = p.get("payload") if isinstance(p.get("payload"), dict) else p
-        return str(n.get("selected_module") or p.get("module_name") or "").strip()
-    except (json.JSONDecodeError, ValueError):
-        return ""
-
-
 def _rtd_action_display_name(action_type: str) -> str:
     normalized = str(action_type or "").strip().upper()
     if normalized == ActionType.COPY.value:
@@ -88,11 +51,12 @@ def _queue_status_priority(status: str) -> int:
     return 9
 
 
-def _paginate(items: list, page: int) -> tuple[list, int, int]:
-    total = len(items)
-    start = (page - 1) * _PAGE_SIZE
+def _paginate(query: OrmQuery, page: int) -> tuple[list, int, int]:
+    """Offset page of an ordered query; the total is counted in SQL, not by loading rows."""
+    total = query.order_by(None).count()
     pages = max(1, (total + _PAGE_SIZE - 1) // _PAGE_SIZE)
-    return items[start : start + _PAGE_SIZE], total, pages
+    rows = query.offset((page - 1) * _PAGE_SIZE).limit(_PAGE_SIZE).all() if total else []
+    return rows, total, pages
 
 
 # ─── existing endpoints ───────────────────────────────────────────────────────
@@ -120,6 +84,7 @@ def _build_stats_payload(db: Session, user_id: str | None) -> dict:
 
     user_id=None 이면 전체 사용자 합계 (Dashboard global 용).
     """
+    flush_task_history()
     today = datetime.now(timezone.utc).date()
 
     daily_dates = [today - timedelta(days=i) for i in range(13, -1, -1)]
@@ -256,6 +221,7 @@ def today_stats(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    flush_task_history()
     today = datetime.now(timezone.utc).date()
     rows = (
         db.query(TaskHistoryDaily.test_type, func.sum(TaskHistoryDaily.count).label("cnt"))
@@ -381,18 +347,25 @@ def rtd_raw_options(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tasks = (
-        db.query(TestTask)
-        .filter(
-            TestTask.user_id == current_user.user_id,
-            TestTask.test_type == TestType.RTD.value,
-            TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
-            TestTask.raw_result_path.isnot(None),
-        )
-        .all()
+    raw_task_filters = (
+        TestTask.user_id == current_user.user_id,
+        TestTask.test_type == TestType.RTD.value,
+        TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
+        TestTask.raw_result_path.isnot(None),
+    )
+    target_names = db.scalars(
+        select(TestTask.target_name).where(*raw_task_filters).distinct()
+    ).all()
+    rule_names = set(
+        db.scalars(
+            select(TestTaskRule.rule_name)
+            .join(TestTask, TestTask.task_id == TestTaskRule.task_id)
+            .where(*raw_task_filters, TestTaskRule.has_raw.is_(True))
+            .distinct()
+        ).all()
     )
-    lines = sorted({normalize_target_line_name(t.target_name) for t in tasks if t.target_name})
-    rules = sorted({rule_name for t in tasks for rule_name in (_task_rule_names(t) or get_rtd_raw_rule_file_map(t).keys()) if rule_name})
+    lines = sorted({normalize_target_line_name(name) for name in target_names if name})
+    rules = sorted(rule_name for rule_name in rule_names if rule_name)
     return success_response({"lines": lines, "rules": rules})
 
 
@@ -404,38 +377,36 @@ def rtd_raw_list(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    # (task, rule) 한 쌍이 목록 한 줄이다. test_task_rules join으로 SQL에서 바로 페이지를 자른다.
     q = (
-        db.query(TestTask)
+        db.query(TestTask.task_id, TestTask.target_name, TestTask.requested_at, TestTaskRule.rule_name)
+        .join(TestTaskRule, TestTaskRule.task_id == TestTask.task_id)
         .filter(
             TestTask.user_id == current_user.user_id,
             TestTask.test_type == TestType.RTD.value,
             TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
             TestTask.raw_result_path.isnot(None),
+            TestTaskRule.has_raw.is_(True),
         )
-        .order_by(TestTask.requested_at.desc())
+        .order_by(TestTask.requested_at.desc(), TestTask.id.desc(), TestTaskRule.rule_name.asc())
     )
     if line:
         q = q.filter(
             or_(TestTask.target_name == line, TestTask.target_name == line + TARGET_SUFFIX)
         )
-    items_all: list[dict[str, str | None]] = []
-    for t in q.all():
-        rule_file_map = get_rtd_raw_rule_file_map(t)
-        rule_names = sorted(rule_file_map.keys()) or _task_rule_names(t)
-        for rule_name in rule_names:
-            if rule and rule_name != rule:
-                continue
-            items_all.append(
-                {
-                    "task_id": t.task_id,
-                    "line": normalize_target_line_name(t.target_name),
-                    "rule": rule_name,
-                    "requested_at": t.requested_at.isoformat() if t.requested_at else None,
-                }
-            )
+    if rule:
+        q = q.filter(TestTaskRule.rule_name == rule)
 
-    paged, total, pages = _paginate(items_all, page)
-    items = paged
+    rows, total, pages = _paginate(q, page)
+    items = [
+        {
+            "task_id": row.task_id,
+            "line": normalize_target_line_name(row.target_name),
+            "rule": row.rule_name,
+            "requested_at": row.requested_at.isoformat() if row.requested_at else None,
+        }
+        for row in rows
+    ]
     return success_response({"items": items, "total": total, "page": page, "pages": pages})
 
 
@@ -447,7 +418,7 @@ def rtd_summary_list(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tasks = (
+    q = (
         db.query(TestTask)
         .filter(
             TestTask.user_id == current_user.user_id,
@@ -455,17 +426,15 @@ def rtd_summary_list(
             TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
             TestTask.status == TaskStatus.DONE.value,
         )
-        .order_by(TestTask.requested_at.desc())
-        .all()
+        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
     )
+    paged, total, pages = _paginate(q, page)
 
-    line_names = {normalize_target_line_name(t.target_name) for t in tasks}
+    line_names = {normalize_target_line_name(t.target_name) for t in paged}
     bu_map = {
         c.line_name: c.business_unit
         for c in db.query(RtdConfig).filter(RtdConfig.line_name.in_(line_names)).all()
     }
-
-    paged, total, pages = _paginate(tasks, page)
     items = [
         {
             "task_id": t.task_id,
@@ -485,7 +454,7 @@ def ezdfs_raw_list(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tasks = (
+    q = (
         db.query(TestTask)
         .filter(
             TestTask.user_id == current_user.user_id,
@@ -493,14 +462,13 @@ def ezdfs_raw_list(
             TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
             TestTask.raw_result_path.isnot(None),
         )
-        .order_by(TestTask.requested_at.desc())
-        .all()
+        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
     )
-    paged, total, pages = _paginate(tasks, page)
+    paged, total, pages = _paginate(q, page)
     items = [
         {
             "task_id": t.task_id,
-            "rule": _task_rule_name(t),
+            "rule": t.rule_name,
             "requested_at": t.requested_at.isoformat() if t.requested_at else None,
         }
         for t in paged
@@ -516,7 +484,7 @@ def ezdfs_summary_list(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    tasks = (
+    q = (
         db.query(TestTask)
         .filter(
             TestTask.user_id == current_user.user_id,
@@ -524,14 +492,13 @@ def ezdfs_summary_list(
             TestTask.action_type.in_(_RESULT_TEST_ACTIONS),
             TestTask.status == TaskStatus.DONE.value,
         )
-        .order_by(TestTask.requested_at.desc())
-        .all()
+        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
     )
-    paged, total, pages = _paginate(tasks, page)
+    paged, total, pages = _paginate(q, page)
     items = [
         {
             "task_id": t.task_id,
-            "module": _task_module_name(t) or t.target_name,
+            "module": t.module_name or t.target_name,
             "requested_at": t.requested_at.isoformat() if t.requested_at else None,
         }
         for t in paged
@@ -541,6 +508,45 @@ def ezdfs_summary_list(
 
 # ─── Download ─────────────────────────────────────────────────────────────────
 
+@router.get("/results/raw/export")
+def export_raw_results(
+    test_type: TestType = Query(default=TestType.RTD),
+    date_from: date | None = Query(default=None),
+    date_to: date | None = Query(default=None),
+    lines: str | None = Query(default=None),
+    rules: str | None = Query(default=None),
+    modules: str | None = Query(default=None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # 여러 task의 raw txt를 manifest.json과 함께 ZIP 하나로 stream 한다 (디스크/메모리 staging 없음).
+    line_items = _split_csv(lines)
+    rule_items = _split_csv(rules)
+    rows = list_raw_export_tasks(
+        db,
+        current_user.user_id,
+        test_type,
+        date_from=date_from,
+        date_to=date_to,
+        lines=line_items,
+        rules=rule_items,
+        modules=_split_csv(modules),
+    )
+    if not rows:
+        raise HTTPException(status_code=404, detail="No raw results found for the selected filters")
+
+    zip_name = f"{test_type.value.lower()}-raw-export-{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return StreamingResponse(
+        iter_zip_stream(iter_raw_export_entries(rows, rule_items)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_name}"'},
+    )
+
+
+def _split_csv(value: str | None) -> list[str]:
+    return [item.strip() for item in str(value or "").split(",") if item.strip()]
+
+
 @router.get("/results/{task_id}/download")
 def download_result(
     task_id: str,
@@ -563,7 +569,7 @@ def download_result(
         if task.test_type == TestType.RTD.value:
             normalized_rule = str(rule or "").strip()
             if not normalized_rule:
-                normalized_rule = _task_rule_name(task)
+                normalized_rule = task.rule_name
             rule_file_map = get_rtd_raw_rule_file_map(task)
             if normalized_rule and normalized_rule in rule_file_map:
                 path = rule_file_map[normalized_rule]
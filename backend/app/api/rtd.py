@@ -1,16 +1,13 @@
 from __future__ import annotations
 
-import io
 import re
-import zipfile
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from starlette.responses import Response
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import get_current_user, get_current_user_from_query_token, get_db
 from app.core.responses import success_response
 from app.models.entities import User
 from app.schemas.testing import (
@@ -23,6 +20,7 @@ from app.services.catalog_service import (
     compare_macros_by_rule_targets,
     get_business_units,
     get_lines_by_business_unit,
+    get_rtd_dependents,
     get_rule_versions_by_line_name,
     get_rules_by_line_name,
     get_target_lines_by_business_unit,
@@ -33,6 +31,7 @@ from app.services.file_download import (
     get_rtd_raw_rule_file_map,
 )
 from app.services.file_service import generate_summary_file
+from app.services.output_tail import iter_task_output_events, resolve_task_raw_dir
 from app.services.rule_favorites import (
     list_favorite_rule_names,
     reorder_favorites_first,
@@ -45,11 +44,13 @@ from app.services.task_service import (
     ensure_task_owner,
     list_rtd_target_monitor_items,
     list_tasks_by_type,
+    resolve_task_priority,
     serialize_task,
 )
-from app.services.task_worker import queue_task
+from app.services.task_worker import cancel_task, queue_task
 from app.utils.enums import ActionType, TaskStep, TestType
 from app.utils.naming import normalize_target_line_name, sanitize_path_token
+from app.utils.zip_stream import iter_zip_stream
 
 router = APIRouter(prefix="/api/rtd", tags=["rtd"])
 
@@ -132,6 +133,17 @@ def toggle_rule_favorite(
     })
 
 
+@router.get("/macros/dependents")
+def macro_dependents(
+    line_name: str,
+    name: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Rule / macro reports that directly include macro `name` (dependency index reverse lookup)."""
+    return success_response({"items": get_rtd_dependents(db, current_user, line_name, name)})
+
+
 @router.post("/macros/compare")
 def compare_macros(
     payload: RtdMacroCompareRequest,
@@ -308,6 +320,7 @@ def _create_rtd_tasks(
         RtdActionRequest(target_lines=target_lines, payload=payload.payload),
         action_type,
     )
+    priority = resolve_task_priority(current_user, payload.priority)
     if action_type in {ActionType.TEST, ActionType.RETEST} and not task_requests:
         raise HTTPException(status_code=422, detail="selected_rule_targets is required")
 
@@ -321,6 +334,7 @@ def _create_rtd_tasks(
             target_name=target_line,
             requested_payload=requested_payload,
             current_step=step,
+            priority=priority,
         )
         queue_task(background_tasks, task.task_id, step, TestType.RTD)
         items.append(serialize_task(task))
@@ -414,6 +428,16 @@ def get_status(
     return success_response({"task": serialize_task(task)})
 
 
+@router.post("/status/{task_id}/cancel")
+def cancel_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    task = ensure_task_owner(db, task_id, current_user.user_id, TestType.RTD)
+    return success_response({"task": serialize_task(cancel_task(db, task))})
+
+
 @router.get("/results/{task_id}/raw")
 def download_raw(
     task_id: str,
@@ -422,39 +446,53 @@ def download_raw(
     db: Session = Depends(get_db),
 ):
     task = ensure_task_owner(db, task_id, current_user.user_id, TestType.RTD)
-    sections = {
-        rule_name: file_path.read_text(encoding="utf-8", errors="ignore")
-        for rule_name, file_path in get_rtd_raw_rule_file_map(task).items()
-    }
+    rule_files = get_rtd_raw_rule_file_map(task)
     normalized_rule = str(selected_rule or "").strip()
 
-    if not sections:
+    if not rule_files:
         raise HTTPException(status_code=404, detail="Rule raw data files not found for this RTD task")
 
     if normalized_rule and normalized_rule != "__ALL__":
-        content = sections.get(normalized_rule)
-        if content is None:
+        file_path = rule_files.get(normalized_rule)
+        if file_path is None:
             raise HTTPException(status_code=404, detail="Selected rule raw data not found")
-        filename = _build_rtd_raw_txt_name(task, normalized_rule)
-        return Response(
-            content=content,
+        return FileResponse(
+            path=file_path,
+            filename=_build_rtd_raw_txt_name(task, normalized_rule),
             media_type="text/plain; charset=utf-8",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
-        for rule_name, content in sections.items():
-            archive.writestr(_build_rtd_raw_txt_name(task, rule_name), content)
-    zip_buffer.seek(0)
     zip_name = f"{sanitize_path_token(normalize_target_line_name(task.target_name))}-raw.zip"
-    return Response(
-        content=zip_buffer.getvalue(),
+    return StreamingResponse(
+        iter_zip_stream(
+            (_build_rtd_raw_txt_name(task, rule_name), file_path)
+            for rule_name, file_path in rule_files.items()
+        ),
         media_type="application/zip",
         headers={"Content-Disposition": f'attachment; filename="{zip_name}"'},
     )
 
 
+@router.get("/results/{task_id}/tail")
+def tail_output(
+    task_id: str,
+    request: Request,
+    rule: str | None = None,
+    offset: int = 0,
+    current_user: User = Depends(get_current_user_from_query_token),
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+):
+    """SSE live output of a RUNNING test task, from byte `offset` (negative = from the end)."""
+    raw_task_dir = resolve_task_raw_dir(task_id, current_user.user_id, TestType.RTD)
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+    return StreamingResponse(
+        iter_task_output_events(request, task_id, raw_task_dir, rule, offset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/results/{task_id}/summary")
 def generate_summary(
     task_id: str,
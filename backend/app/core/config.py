@@ -29,10 +29,51 @@ class Settings(BaseSettings):
 
     cors_origins: str = "*"
 
+    ssh_pool_enabled: bool = True
+    ssh_pool_idle_timeout_seconds: int = 300
+    ssh_pool_keepalive_seconds: int = 30
+    ssh_pool_max_idle_per_key: int = 4
+
+    catalog_cache_ttl_seconds: int = 300
+    catalog_cache_error_ttl_seconds: int = 15
+    remote_source_cache_enabled: bool = True
+    remote_source_cache_max_bytes: int = 64 * 1024 * 1024
+
+    rtd_copy_batch_enabled: bool = True
+    rtd_compile_parallel_enabled: bool = True
+
+    # TEST 출력을 메모리에 모으지 않고 raw 결과 파일로 바로 기록
+    raw_output_stream_enabled: bool = True
+    # rule 파일당 앞부분 상한; 넘치면 마지막 raw_output_tail_bytes만 뒤에 붙인다.
+    raw_output_max_bytes: int = 512 * 1024 * 1024
+    raw_output_tail_bytes: int = 1024 * 1024
+
+    task_worker_pool_size: int = 8
+    task_worker_drain_timeout_seconds: int = 30
+    task_queue_lease_seconds: int = 60
+    task_queue_poll_interval_seconds: float = 2.0
+    # requeue: expired lease → WAITING again (TEST/RETEST/SYNC, up to max attempts), fail: mark task FAIL
+    task_queue_expired_lease_policy: str = "requeue"
+    task_queue_max_attempts: int = 3
+    # ezDFS module queue 기본 정책: fifo, round_robin (사용자별 교대), weighted_fair (최근 실행 시간 기준)
+    task_queue_default_policy: str = "fifo"
+    # round_robin / weighted_fair가 사용자별 최근 실행 이력을 보는 구간
+    task_queue_fair_share_window_seconds: int = 60 * 60
+    # admin scheduler 통계의 사용자별 대기 시간 percentile 집계 구간
+    task_queue_wait_stats_window_seconds: int = 24 * 60 * 60
+    # 같은 line/module로 대기 중인 SYNC들을 한 번의 class_sync_file.sh 실행으로 완료
+    sync_coalesce_enabled: bool = True
+
     task_retention_days: int = 90
     task_retention_max_per_user: int = 1000
     task_retention_sweep_interval_seconds: int = 6 * 60 * 60
     task_retention_delete_files: bool = True
+    # 한 transaction에서 지우는 최대 task 수 (writer lock 보유 시간 상한)
+    task_retention_chunk_size: int = 500
+    # 종료 시 남은 결과 파일 삭제를 기다리는 최대 시간
+    task_retention_shutdown_drain_seconds: float = 30.0
+    # TaskHistoryDaily 증분 버퍼 flush 주기
+    task_history_flush_interval_seconds: float = 5.0
 
     default_admin_user_id: str = "admin"
     default_admin_password: str = "admin1234"
@@ -21,6 +21,10 @@ class RemoteCommandError(RuntimeError):
         self.exit_status = exit_status
 
 
+class TaskCanceledError(RuntimeError):
+    """A running task was canceled by its owner; its remote process was stopped."""
+
+
 class ConfigNotFoundError(ValueError):
     """A required RTD / ezDFS / Host configuration record was not found."""
 
@@ -42,6 +42,14 @@ def _ensure_legacy_columns():
             connection.execute(
                 text("ALTER TABLE rtd_configs ADD COLUMN login_user VARCHAR(100) NOT NULL DEFAULT ''")
             )
+        if "parallel_test_enabled" not in rtd_columns:
+            connection.execute(
+                text("ALTER TABLE rtd_configs ADD COLUMN parallel_test_enabled BOOLEAN NOT NULL DEFAULT 0")
+            )
+        if "parallel_test_limit" not in rtd_columns:
+            connection.execute(
+                text("ALTER TABLE rtd_configs ADD COLUMN parallel_test_limit INTEGER NOT NULL DEFAULT 0")
+            )
 
         ezdfs_columns = {column["name"] for column in inspector.get_columns("ezdfs_configs")}
         if "modifier" not in ezdfs_columns:
@@ -52,14 +60,126 @@ def _ensure_legacy_columns():
             connection.execute(
                 text("ALTER TABLE ezdfs_configs ADD COLUMN login_user VARCHAR(100) NOT NULL DEFAULT ''")
             )
+        if "queue_policy" not in ezdfs_columns:
+            connection.execute(
+                text("ALTER TABLE ezdfs_configs ADD COLUMN queue_policy VARCHAR(20) NOT NULL DEFAULT ''")
+            )
 
         host_columns = {column["name"] for column in inspector.get_columns("host_configs")}
         if "login_user" in host_columns and "login_password" in host_columns:
             _migrate_host_credentials(connection)
 
+        queue_columns = {column["name"] for column in inspector.get_columns("task_queue_entries")}
+        if "cancel_requested_at" not in queue_columns:
+            connection.execute(text("ALTER TABLE task_queue_entries ADD COLUMN cancel_requested_at DATETIME"))
+        if "user_id" not in queue_columns:
+            connection.execute(text("ALTER TABLE task_queue_entries ADD COLUMN user_id VARCHAR(50)"))
+        if "priority" not in queue_columns:
+            connection.execute(
+                text("ALTER TABLE task_queue_entries ADD COLUMN priority INTEGER NOT NULL DEFAULT 0")
+            )
+        if "coalesce_key" not in queue_columns:
+            connection.execute(text("ALTER TABLE task_queue_entries ADD COLUMN coalesce_key VARCHAR(200)"))
+        if "coalesced_into" not in queue_columns:
+            connection.execute(text("ALTER TABLE task_queue_entries ADD COLUMN coalesced_into VARCHAR(64)"))
+            connection.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_task_queue_entries_coalesced "
+                "ON task_queue_entries (coalesced_into)"
+            ))
+
+        task_columns = {column["name"] for column in inspector.get_columns("test_tasks")}
+        if "priority" not in task_columns:
+            connection.execute(text("ALTER TABLE test_tasks ADD COLUMN priority INTEGER NOT NULL DEFAULT 0"))
+        if "coalesced_into" not in task_columns:
+            connection.execute(text("ALTER TABLE test_tasks ADD COLUMN coalesced_into VARCHAR(64)"))
+        payload_field_columns = {
+            "rule_name": "VARCHAR(255)",
+            "rule_file_name": "VARCHAR(255)",
+            "module_name": "VARCHAR(100)",
+        }
+        missing_payload_fields = [name for name in payload_field_columns if name not in task_columns]
+        for column_name in missing_payload_fields:
+            connection.execute(
+                text(
+                    f"ALTER TABLE test_tasks ADD COLUMN {column_name} "
+                    f"{payload_field_columns[column_name]} NOT NULL DEFAULT ''"
+                )
+            )
+        if missing_payload_fields:
+            _backfill_test_task_payload_fields(connection)
+
+        task_rule_columns = {column["name"] for column in inspector.get_columns("test_task_rules")}
+        if "has_raw" not in task_rule_columns:
+            connection.execute(
+                text("ALTER TABLE test_task_rules ADD COLUMN has_raw BOOLEAN NOT NULL DEFAULT 0")
+            )
+            # 취소 기능 이전의 raw 결과는 선택된 모든 rule을 담고 있다.
+            connection.execute(
+                text(
+                    "UPDATE test_task_rules SET has_raw = 1 WHERE task_id IN"
+                    " (SELECT task_id FROM test_tasks WHERE raw_result_path IS NOT NULL)"
+                )
+            )
+
         _ensure_test_task_indexes(connection)
 
 
+def _backfill_test_task_payload_fields(connection) -> None:
+    """기존 task의 payload JSON에서 rule/module 컬럼과 test_task_rules를 채운다 (컬럼 추가 시 1회)."""
+    from app.utils.task_payload import extract_task_payload_fields, parse_requested_payload
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(
+                "SELECT id, task_id, requested_payload_json, raw_result_path FROM test_tasks"
+                " WHERE id > :last_id ORDER BY id LIMIT 500"
+            ),
+            {"last_id": last_id},
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        task_updates = []
+        rule_rows = []
+        for row_id, task_id, requested_payload_json, raw_result_path in rows:
+            fields = extract_task_payload_fields(parse_requested_payload(requested_payload_json))
+            task_updates.append(
+                {
+                    "id": row_id,
+                    "rule_name": fields.rule_name,
+                    "rule_file_name": fields.rule_file_name,
+                    "module_name": fields.module_name,
+                }
+            )
+            rule_rows.extend(
+                {
+                    "task_id": task_id,
+                    "rule_name": rule_name,
+                    "position": position,
+                    "has_raw": raw_result_path is not None,
+                }
+                for position, rule_name in enumerate(fields.rule_names)
+            )
+
+        connection.execute(
+            text(
+                "UPDATE test_tasks SET rule_name = :rule_name, rule_file_name = :rule_file_name,"
+                " module_name = :module_name WHERE id = :id"
+            ),
+            task_updates,
+        )
+        if rule_rows:
+            connection.execute(
+                text(
+                    "INSERT OR IGNORE INTO test_task_rules (task_id, rule_name, position, has_raw)"
+                    " VALUES (:task_id, :rule_name, :position, :has_raw)"
+                ),
+                rule_rows,
+            )
+
+
 def _ensure_test_task_indexes(connection) -> None:
     connection.execute(text(
         "CREATE INDEX IF NOT EXISTS ix_test_tasks_user_type_requested "
@@ -74,6 +194,18 @@ def _ensure_test_task_indexes(connection) -> None:
         "ON test_tasks (status, requested_at, id) "
         "WHERE status IN ('RUNNING','PENDING')"
     ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_test_tasks_type_module "
+        "ON test_tasks (test_type, module_name, requested_at)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_test_tasks_type_rule "
+        "ON test_tasks (test_type, rule_name, requested_at)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_test_tasks_type_target_action "
+        "ON test_tasks (test_type, target_name, action_type, requested_at)"
+    ))
     connection.execute(text("ANALYZE test_tasks"))
 
 
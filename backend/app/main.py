@@ -9,6 +9,7 @@ from starlette.requests import Request
 
 from app.api.admin import router as admin_router
 from app.api.auth import router as auth_router
+from app.api.events import router as events_router
 from app.api.ezdfs import router as ezdfs_router
 from app.api.mypage import router as mypage_router
 from app.api.rtd import router as rtd_router
@@ -22,8 +23,18 @@ from app.core.exceptions import (
 )
 from app.db.session import SessionLocal, init_db
 from app.services.bootstrap import ensure_default_admin, ensure_storage_dirs
-from app.services.task_history import backfill_from_test_tasks, start_retention_sweeper
+from app.services.rtd_monitor import backfill_rtd_monitor
+from app.services.ssh_runtime import close_all_ssh_connections
+from app.services.task_history import (
+    backfill_from_test_tasks,
+    drain_file_deletions,
+    start_retention_sweeper,
+    start_task_history_writer,
+    stop_task_history_writer,
+)
 from app.services.task_service import fail_inflight_tasks_on_startup
+from app.services.task_queue import recover_expired_leases
+from app.services.task_worker import shutdown_task_scheduler, start_task_scheduler
 
 settings = get_settings()
 
@@ -35,12 +46,20 @@ async def lifespan(_: FastAPI):
     ensure_default_admin()
     db = SessionLocal()
     try:
+        backfill_rtd_monitor(db)
         fail_inflight_tasks_on_startup(db)
+        recover_expired_leases(db)
         backfill_from_test_tasks(db)
     finally:
         db.close()
+    start_task_history_writer()
     start_retention_sweeper()
+    start_task_scheduler()
     yield
+    shutdown_task_scheduler()
+    stop_task_history_writer()
+    drain_file_deletions()
+    close_all_ssh_connections()
 
 
 app = FastAPI(
@@ -69,6 +88,7 @@ app.include_router(admin_router)
 app.include_router(rtd_router)
 app.include_router(ezdfs_router)
 app.include_router(mypage_router)
+app.include_router(events_router)
 
 
 # ─── Custom exception handlers ────────────────────────────────────────────
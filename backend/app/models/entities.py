@@ -77,6 +77,9 @@ class RtdConfig(TimestampMixin, Base):
     home_dir_path: Mapped[str] = mapped_column(String(255), nullable=False)
     host_name: Mapped[str] = mapped_column(ForeignKey("host_configs.name"), nullable=False)
     login_user: Mapped[str] = mapped_column(String(100), nullable=False, default="")
+    # TEST/RETEST에서 선택 rule들을 동시에 실행할지 여부. limit 0 = host parallel_limit 기준 자동.
+    parallel_test_enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    parallel_test_limit: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     modifier: Mapped[str] = mapped_column(String(100), nullable=False)
 
 
@@ -89,6 +92,8 @@ class EzdfsConfig(TimestampMixin, Base):
     home_dir_path: Mapped[str] = mapped_column(String(255), nullable=False)
     host_name: Mapped[str] = mapped_column(ForeignKey("host_configs.name"), nullable=False)
     login_user: Mapped[str] = mapped_column(String(100), nullable=False, default="")
+    # module queue 정책 (fifo / round_robin / weighted_fair). 빈 값이면 task_queue_default_policy.
+    queue_policy: Mapped[str] = mapped_column(String(20), nullable=False, default="")
     modifier: Mapped[str] = mapped_column(String(100), nullable=False)
 
 
@@ -108,6 +113,9 @@ class TestTask(TimestampMixin, Base):
             "status", "requested_at", "id",
             sqlite_where=text("status IN ('RUNNING','PENDING')"),
         ),
+        Index("ix_test_tasks_type_module", "test_type", "module_name", "requested_at"),
+        Index("ix_test_tasks_type_rule", "test_type", "rule_name", "requested_at"),
+        Index("ix_test_tasks_type_target_action", "test_type", "target_name", "action_type", "requested_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -120,12 +128,119 @@ class TestTask(TimestampMixin, Base):
     current_step: Mapped[str] = mapped_column(String(30), nullable=False)
     message: Mapped[str] = mapped_column(String(255), default="", nullable=False)
     requested_payload_json: Mapped[str] = mapped_column(Text, default="{}", nullable=False)
+    # requested_payload_json에서 create 시 한 번 추출한 목록/필터용 값 (app.utils.task_payload).
+    rule_name: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+    rule_file_name: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+    module_name: Mapped[str] = mapped_column(String(100), default="", nullable=False)
+    # 같은 queue 안에서 높은 값이 먼저 실행된다. 일반 사용자는 0 이하만 지정할 수 있다.
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # 다른 SYNC task의 원격 실행 한 번으로 함께 완료된 경우 그 task_id
+    coalesced_into: Mapped[str | None] = mapped_column(String(64), nullable=True)
     raw_result_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
     summary_result_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
     requested_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc, nullable=False)
     started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     ended_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 
+    rules: Mapped[list["TestTaskRule"]] = relationship(
+        "TestTaskRule",
+        cascade="all, delete-orphan",
+        order_by="TestTaskRule.position",
+        lazy="selectin",
+    )
+
+
+class TestTaskRule(Base):
+    """Task 하나가 다루는 rule 이름 (selected_rule_targets 순서 = position).
+
+    Why: rule 필터(monitor, MyPage raw 목록/옵션, 통합 report)가 모든 task의
+    payload JSON을 Python에서 파싱해 거르던 것을 (rule_name, task_id) index
+    조회로 바꾼다. targets가 없는 task는 rule_name 하나를 position 0으로 둔다.
+    """
+
+    __tablename__ = "test_task_rules"
+    __table_args__ = (
+        UniqueConstraint("task_id", "position", name="uq_test_task_rules_task_position"),
+        Index("ix_test_task_rules_rule_task", "rule_name", "task_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    task_id: Mapped[str] = mapped_column(
+        ForeignKey("test_tasks.task_id", ondelete="CASCADE"), nullable=False
+    )
+    rule_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # generate_raw_file이 이 rule의 raw txt를 index.json에 기록했는지 (취소된 task는 일부 rule만)
+    has_raw: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+
+
+class RtdMonitorEntry(Base):
+    """RTD monitor 한 칸: (target, rule, action 묶음)의 현재 active task와 최근 종료 task.
+
+    Why: monitor polling마다 target의 모든 RTD task를 읽어 target × action
+    단위로 다시 훑던 것을, task 상태가 바뀔 때 해당 칸만 다시 계산해 두고
+    polling은 이 테이블을 index로 읽게 한다. rule_key "__ALL__"은 rule
+    선택이 없는 칸이고, 그 외에는 test_task_rules의 rule 이름이다.
+    """
+
+    __tablename__ = "rtd_monitor_entries"
+    __table_args__ = (
+        UniqueConstraint("target_name", "rule_key", "action_group", name="uq_rtd_monitor_entry"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    target_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    rule_key: Mapped[str] = mapped_column(String(255), nullable=False)
+    # COPY / SYNC / COMPILE / TEST (RETEST는 TEST 칸에 포함)
+    action_group: Mapped[str] = mapped_column(String(30), nullable=False)
+    # 가장 최근 RUNNING task, 없으면 가장 최근 PENDING task
+    active_task_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    latest_finished_task_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc, onupdate=now_utc, nullable=False)
+
+
+class TaskQueueEntry(Base):
+    """Durable serialization queue row for one PENDING/RUNNING task.
+
+    Why: in-process queue dict는 재시작 시 사라져 대기 중 task가 모두 FAIL
+    처리되었다. queue 상태를 DB에 두고 lease/heartbeat로 실행 소유권을 표시해
+    재시작 후 FIFO 순서로 이어서 실행하고, 여러 uvicorn worker가 같은 queue를
+    공유할 수 있게 한다. id 순서가 FIFO 순서이고, priority와 module별 queue
+    정책(app.services.queue_policy)이 그 위에서 실행 순서를 정한다.
+    """
+
+    __tablename__ = "task_queue_entries"
+    __table_args__ = (
+        Index("ix_task_queue_entries_state", "state", "id"),
+        Index("ix_task_queue_entries_rtd_key", "rtd_queue_key", "id"),
+        Index("ix_task_queue_entries_ezdfs_key", "ezdfs_queue_key", "id"),
+        Index("ix_task_queue_entries_coalesced", "coalesced_into"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    task_id: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    step: Mapped[str] = mapped_column(String(30), nullable=False)
+    rtd_queue_key: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    ezdfs_queue_key: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # queue 메시지에 쓰는 표시 이름. enqueue 시 한 번만 계산한다.
+    label: Mapped[str] = mapped_column(String(255), default="", nullable=False)
+    # queue 정책 계산용 task 값 사본 (claim 시 test_tasks join 없이 정렬)
+    user_id: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    priority: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # WAITING → LEASED. 완료되면 row를 삭제한다.
+    state: Mapped[str] = mapped_column(String(20), default="WAITING", nullable=False)
+    lease_owner: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    enqueued_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc, nullable=False)
+    # 같은 line/module SYNC끼리 같은 값. claim 시 함께 lease되어 한 번만 실행된다.
+    coalesce_key: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    # 함께 lease된 follower entry의 leader task_id (leader heartbeat/완료를 따른다)
+    coalesced_into: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # 실행 중 task 취소 요청. lease owner process가 heartbeat 때 읽어 원격 프로세스를 종료한다.
+    cancel_requested_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
 
 class RuntimeSession(Base):
     __tablename__ = "runtime_sessions"
@@ -183,6 +298,50 @@ class RuleFavorite(TimestampMixin, Base):
     rule_name: Mapped[str] = mapped_column(String(200), nullable=False)
 
 
+class DependencySource(Base):
+    """Dependency index 에 반영된 rule / macro 파일 하나.
+
+    Why: sub rule / macro 참조 관계를 요청마다 원격 파일에서 다시 파싱하지
+    않도록 DB에 보관한다. file_stamp(size:mtime:inode)가 바뀐 파일만 다시
+    읽어 증분 갱신한다. scope_key는 RTD면 line_name, ezDFS면 module_name.
+    """
+
+    __tablename__ = "dependency_sources"
+    __table_args__ = (
+        UniqueConstraint(
+            "test_type", "scope_key", "source_kind", "file_name",
+            name="uq_dependency_source_key",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    test_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    scope_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    # rule | macro
+    source_kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    file_stamp: Mapped[str] = mapped_column(String(100), nullable=False)
+    indexed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=now_utc, nullable=False)
+
+
+class DependencyEdge(Base):
+    """source 파일이 직접 참조하는 macro / sub rule 이름 하나 (position = 본문 등장 순서)."""
+
+    __tablename__ = "dependency_edges"
+    __table_args__ = (
+        Index("ix_dependency_edges_source", "test_type", "scope_key", "source_kind", "source_file_name"),
+        Index("ix_dependency_edges_target", "test_type", "scope_key", "target_name"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    test_type: Mapped[str] = mapped_column(String(20), nullable=False)
+    scope_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    source_kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    source_file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    target_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    position: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
 class DashboardLike(TimestampMixin, Base):
     __tablename__ = "dashboard_likes"
 
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
+from typing import Literal
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class UserResponse(BaseModel):
@@ -72,6 +73,15 @@ class HostSshLimitResponse(BaseModel):
     host_name: str
     parallel_limit: int
     source: str
+    pool_enabled: bool = True
+    pool_idle_connections: int = 0
+    pool_hits: int = 0
+    pool_misses: int = 0
+    pool_evictions: int = 0
+    handshake_count: int = 0
+    handshake_total_ms: float = 0.0
+    handshake_avg_ms: float = 0.0
+    handshake_saved_ms: float = 0.0
 
 
 class RtdConfigCreate(BaseModel):
@@ -81,6 +91,8 @@ class RtdConfigCreate(BaseModel):
     home_dir_path: str
     host_name: str
     login_user: str
+    parallel_test_enabled: bool = False
+    parallel_test_limit: int = Field(default=0, ge=0)
 
 
 class RtdConfigUpdate(BaseModel):
@@ -90,6 +102,8 @@ class RtdConfigUpdate(BaseModel):
     home_dir_path: str
     host_name: str
     login_user: str
+    parallel_test_enabled: bool | None = None
+    parallel_test_limit: int | None = Field(default=None, ge=0)
 
 
 class RtdConfigResponse(RtdConfigCreate):
@@ -100,12 +114,16 @@ class RtdConfigResponse(RtdConfigCreate):
     updated_at: datetime
 
 
+QueuePolicy = Literal["", "fifo", "round_robin", "weighted_fair"]
+
+
 class EzdfsConfigCreate(BaseModel):
     module_name: str
     port: int
     home_dir_path: str
     host_name: str
     login_user: str
+    queue_policy: QueuePolicy = ""
 
 
 class EzdfsConfigUpdate(BaseModel):
@@ -114,6 +132,7 @@ class EzdfsConfigUpdate(BaseModel):
     home_dir_path: str
     host_name: str
     login_user: str
+    queue_policy: QueuePolicy | None = None
 
 
 class EzdfsConfigResponse(EzdfsConfigCreate):
@@ -46,6 +46,8 @@ class EzdfsSessionPayload(BaseModel):
 class RtdActionRequest(BaseModel):
     target_lines: list[str] = Field(default_factory=list)
     payload: dict[str, Any] = Field(default_factory=dict)
+    # Queue priority; higher runs first. Values above 0 are admin-only.
+    priority: int = Field(default=0, ge=-10, le=10)
 
 
 class RtdMacroCompareRequest(BaseModel):
@@ -57,6 +59,8 @@ class EzdfsActionRequest(BaseModel):
     module_name: str
     rule_name: str
     payload: dict[str, Any] = Field(default_factory=dict)
+    # Queue priority; higher runs first. Values above 0 are admin-only.
+    priority: int = Field(default=0, ge=-10, le=10)
 
 
 class EzdfsAggregateSummaryRequest(BaseModel):
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+"""
+Process-wide rule catalog cache.
+
+The remote rule listing (`find` over SSH) depends only on the RTD line or
+ezDFS module, not on the user, so it is cached once per process keyed by
+`("RTD", line_name)` / `("EZDFS", module_name)` instead of inside every
+user's RuntimeSession.
+
+- Entries expire after `catalog_cache_ttl_seconds`; error catalogs expire
+  after the shorter `catalog_cache_error_ttl_seconds` so a host outage is
+  retried soon without every request paying the SSH timeout.
+- Concurrent misses on the same key are single-flight: one caller fetches,
+  the others wait for its result.
+- COPY / SYNC tasks and SVN upload invalidate the key of the directory they
+  touched (`invalidate_rtd_catalog`, `invalidate_ezdfs_catalog`).
+
+Each catalog carries a `fetched_at` stamp so callers can tell whether their
+session snapshot (`catalog_cache`) still matches the shared entry.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+CatalogKey = tuple[str, str]
+
+
+@dataclass
+class _CacheEntry:
+    catalog: dict
+    expires_at: float
+
+
+@dataclass
+class _InFlight:
+    done: threading.Event = field(default_factory=threading.Event)
+    catalog: dict | None = None
+    error: BaseException | None = None
+
+
+class CatalogCache:
+    """TTL cache with per-key single-flight fetching."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[CatalogKey, _CacheEntry] = {}
+        self._in_flight: dict[CatalogKey, _InFlight] = {}
+        # Bumped by invalidate(); a fetch started before it must not repopulate the key.
+        self._generations: dict[CatalogKey, int] = {}
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._invalidations = 0
+
+    def get_or_fetch(self, key: CatalogKey, fetch: Callable[[], dict]) -> dict:
+        """Return the cached catalog for `key`, fetching it once on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._hits += 1
+                return entry.catalog
+            flight = self._in_flight.get(key)
+            is_owner = flight is None
+            if is_owner:
+                flight = _InFlight()
+                self._in_flight[key] = flight
+                self._misses += 1
+                generation = self._generations.get(key, 0)
+            else:
+                self._waits += 1
+
+        if not is_owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.catalog
+
+        try:
+            catalog = {**fetch(), "fetched_at": time.time()}
+        except BaseException as exc:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.error = exc
+            flight.done.set()
+            raise
+
+        ttl = settings.catalog_cache_error_ttl_seconds if catalog.get("error") else settings.catalog_cache_ttl_seconds
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if ttl > 0 and self._generations.get(key, 0) == generation:
+                self._entries[key] = _CacheEntry(catalog=catalog, expires_at=time.monotonic() + ttl)
+        flight.catalog = catalog
+        flight.done.set()
+        return catalog
+
+    def invalidate(self, key: CatalogKey) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries) + list(self._in_flight):
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.clear()
+            self._invalidations += 1
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "ttl_seconds": settings.catalog_cache_ttl_seconds,
+                "entries": sum(1 for entry in self._entries.values() if entry.expires_at > now),
+                "in_flight": len(self._in_flight),
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "invalidations": self._invalidations,
+            }
+
+
+_catalog_cache = CatalogCache()
+
+
+def get_cached_catalog(test_type: str, name: str, fetch: Callable[[], dict]) -> dict:
+    return _catalog_cache.get_or_fetch((test_type, name), fetch)
+
+
+def invalidate_rtd_catalog(line_name: str) -> None:
+    if line_name:
+        _catalog_cache.invalidate(("RTD", line_name))
+
+
+def invalidate_ezdfs_catalog(module_name: str) -> None:
+    if module_name:
+        _catalog_cache.invalidate(("EZDFS", module_name))
+
+
+def clear_catalog_cache() -> None:
+    _catalog_cache.clear()
+
+
+def get_catalog_cache_stats() -> dict[str, object]:
+    return _catalog_cache.stats()
@@ -5,7 +5,17 @@ from collections import defaultdict
 from sqlalchemy import distinct
 from sqlalchemy.orm import Session
 
+from app.core.exceptions import CatalogError
 from app.models.entities import EzdfsConfig, HostConfig, RtdConfig, User
+from app.services.catalog_cache import get_cached_catalog
+from app.services.dependency_index import (
+    get_dependents,
+    get_direct_references,
+    get_reference_graph,
+    is_dependency_index_current,
+    refresh_dependency_index,
+    start_dependency_index_refresh,
+)
 from app.services.ezdfs_catalog_custom import (
     find_latest_backup_version,
     get_backup_file_list as get_ezdfs_backup_file_list,
@@ -14,6 +24,7 @@ from app.services.ezdfs_catalog_custom import (
 )
 from app.services.rtd_catalog_custom import (
     get_macro_file_list,
+    get_macro_file_lists,
     get_rule_file_list,
 )
 from app.services.session_service import get_runtime_session_payload, upsert_runtime_session
@@ -69,6 +80,14 @@ def compare_macros_by_rule_targets(
     line_name: str,
     selected_rule_targets: list[dict[str, str]],
 ) -> dict:
+    """
+    Old/new macro lists for every selected rule, resolved in one pass.
+
+    File names come from one catalog snapshot, references from the
+    dependency index in one query; rule files the index does not cover (or
+    all of them, while the index is still being built) are read together in
+    one remote round trip.
+    """
     if not selected_rule_targets:
         return {"per_rule": [], "has_any": False}
 
@@ -80,8 +99,13 @@ def compare_macros_by_rule_targets(
     if host is None:
         raise ValueError("RTD host config not found")
 
-    per_rule: list[dict[str, object]] = []
+    catalog = _get_or_fetch_rtd_catalog(db, current_user, line_name)
+    file_name_by_version = {
+        (item.get("rule_name"), item.get("version")): item.get("file_name")
+        for item in reversed(catalog.get("files", []))
+    }
 
+    resolved_targets: list[tuple[str, str, str, str, str]] = []
     for item in selected_rule_targets:
         rule_name = str(item.get("rule_name") or "").strip()
         old_version = str(item.get("old_version") or "").strip()
@@ -89,23 +113,30 @@ def compare_macros_by_rule_targets(
         if not rule_name or not old_version or not new_version:
             continue
 
-        old_file_name = find_rule_file_name_in_session(db, current_user, line_name, rule_name, old_version)
-        new_file_name = find_rule_file_name_in_session(db, current_user, line_name, rule_name, new_version)
+        old_file_name = file_name_by_version.get((rule_name, old_version))
+        new_file_name = file_name_by_version.get((rule_name, new_version))
         if not old_file_name or not new_file_name:
             continue
+        resolved_targets.append((rule_name, old_version, new_version, old_file_name, new_file_name))
 
-        old_macros = get_macro_list_by_rule_name(db, current_user, line_name, rule_name, old_version)
-        new_macros = get_macro_list_by_rule_name(db, current_user, line_name, rule_name, new_version)
+    file_names = list(dict.fromkeys(name for target in resolved_targets for name in target[3:]))
+    macros_by_file: dict[str, list[str]] = {}
+    if file_names and is_dependency_index_current(TestType.RTD, line_name, catalog):
+        macros_by_file = get_direct_references(db, TestType.RTD, line_name, "rule", file_names)
+    unindexed = [name for name in file_names if name not in macros_by_file]
+    if unindexed:
+        macros_by_file.update(get_macro_file_lists(host, config.login_user, config.home_dir_path, unindexed))
 
-        per_rule.append(
-            {
-                "rule_name": rule_name,
-                "old_version": old_version,
-                "new_version": new_version,
-                "old_macros": old_macros,
-                "new_macros": new_macros,
-            }
-        )
+    per_rule: list[dict[str, object]] = [
+        {
+            "rule_name": rule_name,
+            "old_version": old_version,
+            "new_version": new_version,
+            "old_macros": macros_by_file.get(old_file_name, []),
+            "new_macros": macros_by_file.get(new_file_name, []),
+        }
+        for rule_name, old_version, new_version, old_file_name, new_file_name in resolved_targets
+    ]
 
     has_any = any(entry["old_macros"] or entry["new_macros"] for entry in per_rule)
     return {"per_rule": per_rule, "has_any": has_any}
@@ -130,9 +161,40 @@ def get_macro_list_by_rule_name(
     if not file_name:
         raise ValueError("Rule file not found in session cache")
 
+    catalog = _get_or_fetch_rtd_catalog(db, current_user, line_name)
+    if is_dependency_index_current(TestType.RTD, line_name, catalog):
+        indexed = get_direct_references(db, TestType.RTD, line_name, "rule", [file_name])
+        if file_name in indexed:
+            return indexed[file_name]
+
     return get_macro_file_list(host, config.login_user, config.home_dir_path, file_name)
 
 
+def get_rtd_dependents(db: Session, current_user: User, line_name: str, name: str) -> list[dict[str, str]]:
+    """Rule / macro reports in one line that directly reference the macro `name`."""
+    catalog = _get_or_fetch_rtd_catalog(db, current_user, line_name)
+    if not refresh_dependency_index(db, TestType.RTD, line_name, catalog):
+        raise CatalogError(catalog.get("error") or "RTD dependency index is unavailable")
+    return get_dependents(db, TestType.RTD, line_name, name)
+
+
+def get_indexed_macro_references(db: Session, line_name: str, macro_names: list[str]) -> dict[str, list[str]] | None:
+    """
+    Direct macro references of `macro_names` on one line, from the dependency index.
+
+    Returns None when the index is not built for the current catalog yet or
+    does not cover every macro, so callers can fall back to reading the
+    macro bodies.
+    """
+    catalog = _get_shared_rtd_catalog(db, line_name)
+    if not is_dependency_index_current(TestType.RTD, line_name, catalog):
+        return None
+    references = get_direct_references(db, TestType.RTD, line_name, "macro", macro_names)
+    if any(name not in references for name in macro_names):
+        return None
+    return references
+
+
 def get_target_lines_by_business_unit(db: Session, business_unit: str, current_user: User) -> list[str]:
     return get_lines_by_business_unit(db, business_unit, current_user)
 
@@ -145,7 +207,7 @@ def get_ezdfs_modules(db: Session, current_user: User) -> list[str]:
 
 
 def get_ezdfs_rules(db: Session, current_user: User, module_name: str) -> list[dict[str, str]]:
-    catalog = _get_or_fetch_ezdfs_catalog(db, current_user, module_name, force_refresh=True)
+    catalog = _get_or_fetch_ezdfs_catalog(db, current_user, module_name)
     return catalog["rules"] or [{"file_name": RULE_ERROR_ITEM, "rule_name": RULE_ERROR_ITEM, "version": "", "old_version": ""}]
 
 
@@ -159,7 +221,7 @@ def get_ezdfs_sub_rules(
     if rule_name == RULE_ERROR_ITEM:
         return [RULE_ERROR_ITEM]
 
-    catalog = _get_or_fetch_ezdfs_catalog(db, current_user, module_name, force_refresh=True)
+    catalog = _get_or_fetch_ezdfs_catalog(db, current_user, module_name)
     config = db.query(EzdfsConfig).filter(EzdfsConfig.module_name == module_name).first()
     if config is None:
         raise ValueError("ezDFS config not found")
@@ -172,15 +234,34 @@ def get_ezdfs_sub_rules(
     if not resolved_file_name:
         raise ValueError("ezDFS rule file not found in session cache")
 
+    dependency_graph = (
+        get_reference_graph(db, TestType.EZDFS, module_name, "rule")
+        if is_dependency_index_current(TestType.EZDFS, module_name, catalog)
+        else None
+    )
     return get_ezdfs_subrule_file_list(
         host,
         config.login_user,
         config.home_dir_path,
         resolved_file_name,
         catalog_files=catalog.get("files", []),
+        dependency_graph=dependency_graph,
     )
 
 
+def get_ezdfs_dependents(db: Session, current_user: User, module_name: str, rule_name: str) -> list[dict[str, str]]:
+    """Rules in one module whose deployed file directly references `rule_name`."""
+    catalog = _get_or_fetch_ezdfs_catalog(db, current_user, module_name)
+    if not refresh_dependency_index(db, TestType.EZDFS, module_name, catalog):
+        raise CatalogError(catalog.get("error") or "ezDFS dependency index is unavailable")
+
+    rule_name_by_file = {item.get("file_name"): item.get("rule_name") for item in catalog.get("files", [])}
+    return [
+        {"file_name": item["file_name"], "rule_name": rule_name_by_file.get(item["file_name"]) or ""}
+        for item in get_dependents(db, TestType.EZDFS, module_name, rule_name)
+    ]
+
+
 def find_ezdfs_rule_file_name_in_session(
     db: Session,
     current_user: User,
@@ -195,22 +276,52 @@ def find_ezdfs_rule_file_name_in_session(
 
 
 def _get_or_fetch_rtd_catalog(db: Session, current_user: User, line_name: str) -> dict:
-    session_payload = get_runtime_session_payload(db, current_user.user_id, TestType.RTD)
-    cached = session_payload.get("catalog_cache", {})
+    catalog = _get_shared_rtd_catalog(db, line_name)
+    _store_session_catalog_snapshot(db, current_user, TestType.RTD, catalog)
+    return catalog
 
-    if cached.get("line_name") == line_name and cached.get("rules"):
-        return {
-            "line_name": cached.get("line_name"),
-            "files": cached.get("files", []),
-            "rules": cached.get("rules", []),
-            "versions": cached.get("versions", {}),
-            "error": cached.get("error"),
-        }
 
+def _get_shared_rtd_catalog(db: Session, line_name: str) -> dict:
+    catalog = get_cached_catalog(
+        TestType.RTD.value,
+        line_name,
+        lambda: _fetch_rtd_catalog_or_error(db, line_name),
+    )
+    start_dependency_index_refresh(TestType.RTD, line_name, catalog)
+    return catalog
+
+
+def _get_or_fetch_ezdfs_catalog(db: Session, current_user: User, module_name: str) -> dict:
+    catalog = get_cached_catalog(
+        TestType.EZDFS.value,
+        module_name,
+        lambda: _fetch_ezdfs_catalog_or_error(db, module_name),
+    )
+    start_dependency_index_refresh(TestType.EZDFS, module_name, catalog)
+    _store_session_catalog_snapshot(db, current_user, TestType.EZDFS, catalog)
+    return catalog
+
+
+def _store_session_catalog_snapshot(db: Session, current_user: User, test_type: TestType, catalog: dict) -> None:
+    """
+    Keep the user's session `catalog_cache` in step with the shared cache.
+
+    Session save and action payloads still read file names from the session
+    snapshot, so it is rewritten only when the shared entry was refetched.
+    """
+    session_payload = get_runtime_session_payload(db, current_user.user_id, test_type)
+    cached = session_payload.get("catalog_cache")
+    if isinstance(cached, dict) and cached.get("fetched_at") == catalog.get("fetched_at"):
+        return
+    session_payload["catalog_cache"] = catalog
+    upsert_runtime_session(db, current_user.user_id, test_type, session_payload)
+
+
+def _fetch_rtd_catalog_or_error(db: Session, line_name: str) -> dict:
     try:
-        catalog = _fetch_rtd_catalog_over_ssh(db, line_name)
+        return _fetch_rtd_catalog_over_ssh(db, line_name)
     except (ValueError, OSError) as exc:
-        catalog = {
+        return {
             "line_name": line_name,
             "files": [],
             "rules": [RULE_ERROR_ITEM],
@@ -218,42 +329,18 @@ def _get_or_fetch_rtd_catalog(db: Session, current_user: User, line_name: str) -
             "error": str(exc),
         }
 
-    session_payload["catalog_cache"] = catalog
-    upsert_runtime_session(db, current_user.user_id, TestType.RTD, session_payload)
-    return catalog
-
-
-def _get_or_fetch_ezdfs_catalog(
-    db: Session,
-    current_user: User,
-    module_name: str,
-    force_refresh: bool = False,
-) -> dict:
-    session_payload = get_runtime_session_payload(db, current_user.user_id, TestType.EZDFS)
-    cached = session_payload.get("catalog_cache", {})
-
-    if not force_refresh and cached.get("module_name") == module_name:
-        normalized_catalog = _normalize_ezdfs_cached_catalog(module_name, cached)
-        if normalized_catalog is not None:
-            if normalized_catalog != cached:
-                session_payload["catalog_cache"] = normalized_catalog
-                upsert_runtime_session(db, current_user.user_id, TestType.EZDFS, session_payload)
-            return normalized_catalog
 
+def _fetch_ezdfs_catalog_or_error(db: Session, module_name: str) -> dict:
     try:
-        catalog = _fetch_ezdfs_catalog_over_ssh(db, module_name)
+        return _fetch_ezdfs_catalog_over_ssh(db, module_name)
     except (ValueError, OSError) as exc:
-        catalog = {
+        return {
             "module_name": module_name,
             "files": [],
             "rules": [{"file_name": RULE_ERROR_ITEM, "rule_name": RULE_ERROR_ITEM, "version": "", "old_version": ""}],
             "error": str(exc),
         }
 
-    session_payload["catalog_cache"] = catalog
-    upsert_runtime_session(db, current_user.user_id, TestType.EZDFS, session_payload)
-    return catalog
-
 
 def _fetch_rtd_catalog_over_ssh(db: Session, line_name: str) -> dict:
     config = db.query(RtdConfig).filter(RtdConfig.line_name == line_name).first()
@@ -331,65 +418,3 @@ def _group_versions_by_rule(catalog_files: list[dict[str, str]]) -> dict[str, li
         rule_name: sorted(version_names, key=str.lower)
         for rule_name, version_names in versions_by_rule.items()
     }
-
-
-def _normalize_ezdfs_cached_catalog(module_name: str, cached: dict) -> dict | None:
-    files = cached.get("files", [])
-    rules = cached.get("rules", [])
-    error = cached.get("error")
-
-    normalized_files = _normalize_ezdfs_catalog_entries(files)
-    normalized_rules = _normalize_ezdfs_catalog_entries(rules)
-
-    if normalized_rules:
-        if not normalized_files:
-            normalized_files = normalized_rules
-        return {
-            "module_name": module_name,
-            "home_dir_path": cached.get("home_dir_path"),
-            "host_name": cached.get("host_name"),
-            "files": normalized_files,
-            "rules": normalized_rules,
-            "error": error,
-        }
-
-    if normalized_files:
-        return {
-            "module_name": module_name,
-            "home_dir_path": cached.get("home_dir_path"),
-            "host_name": cached.get("host_name"),
-            "files": normalized_files,
-            "rules": normalized_files,
-            "error": error,
-        }
-
-    return None
-
-
-def _normalize_ezdfs_catalog_entries(items: list) -> list[dict[str, str]]:
-    if not isinstance(items, list) or not items:
-        return []
-
-    if all(_is_valid_ezdfs_catalog_entry(item) for item in items):
-        return [
-            {
-                "file_name": str(item.get("file_name", "")).strip(),
-                "rule_name": str(item.get("rule_name", "")).strip(),
-                "version": str(item.get("version", "")).strip(),
-                "old_version": str(item.get("old_version", "")).strip(),
-            }
-            for item in items
-            if _is_valid_ezdfs_catalog_entry(item)
-        ]
-
-    return []
-
-
-def _is_valid_ezdfs_catalog_entry(item: object) -> bool:
-    if not isinstance(item, dict):
-        return False
-
-    file_name = str(item.get("file_name", "")).strip()
-    rule_name = str(item.get("rule_name", "")).strip()
-    version = str(item.get("version", "")).strip()
-    return bool(file_name and rule_name and version)
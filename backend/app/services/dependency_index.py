@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+"""
+Persistent rule / macro dependency index.
+
+For every RTD line and ezDFS module the index keeps the scanned source files
+(`DependencySource`, with their remote `size:mtime:inode` stamp) and their
+direct references (`DependencyEdge`):
+
+- RTD:   rule report → macro names, macro report → macro names
+- ezDFS: deployed rule file → sub rule names
+
+`refresh_dependency_index()` is tied to the shared catalog: it runs at most
+once per catalog fetch (`fetched_at`) and asks the `*_catalog_custom`
+`scan_dependency_sources()` hook to re-read only files whose stamp changed.
+Queries (forward references, whole graph, reverse "who includes X") are
+plain indexed SELECTs and never touch SSH.
+
+Catalog reads start the refresh on a background thread
+(`start_dependency_index_refresh()`), so no user request pays for a full
+scan. Until `is_dependency_index_current()` reports the index up to date for
+the catalog — or when a refresh fails — callers fall back to reading
+sources directly. Only the reverse lookups, which have no fallback, refresh
+inline.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, exists, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import CatalogError
+from app.db.session import SessionLocal
+from app.models.entities import DependencyEdge, DependencySource, EzdfsConfig, HostConfig, RtdConfig
+from app.services import ezdfs_catalog_custom, rtd_catalog_custom
+from app.utils.enums import TestType
+
+logger = logging.getLogger(__name__)
+
+_state_lock = threading.Lock()
+# (test_type, scope_key) -> catalog `fetched_at` the index was last refreshed for
+_indexed_catalogs: dict[tuple[str, str], float] = {}
+_refresh_locks: dict[tuple[str, str], threading.Lock] = {}
+# scopes with a background refresh running
+_background_refreshes: set[tuple[str, str]] = set()
+
+
+def is_dependency_index_current(test_type: TestType, scope_key: str, catalog: dict) -> bool:
+    """True when the index of one line / module was refreshed for this exact catalog fetch."""
+    fetched_at = catalog.get("fetched_at")
+    if catalog.get("error") or fetched_at is None:
+        return False
+    with _state_lock:
+        return _indexed_catalogs.get((test_type.value, scope_key)) == fetched_at
+
+
+def start_dependency_index_refresh(test_type: TestType, scope_key: str, catalog: dict) -> None:
+    """Refresh the index for `catalog` on a background thread unless it is current or already refreshing."""
+    if catalog.get("error") or is_dependency_index_current(test_type, scope_key, catalog):
+        return
+    key = (test_type.value, scope_key)
+    with _state_lock:
+        if key in _background_refreshes:
+            return
+        _background_refreshes.add(key)
+    threading.Thread(
+        target=_refresh_in_background,
+        args=(test_type, scope_key, catalog),
+        daemon=True,
+        name=f"dependency-index-{test_type.value.lower()}",
+    ).start()
+
+
+def _refresh_in_background(test_type: TestType, scope_key: str, catalog: dict) -> None:
+    db = SessionLocal()
+    try:
+        refresh_dependency_index(db, test_type, scope_key, catalog)
+    except Exception:  # noqa: BLE001
+        logger.exception("Background dependency index refresh failed for %s %s", test_type.value, scope_key)
+    finally:
+        db.close()
+        with _state_lock:
+            _background_refreshes.discard((test_type.value, scope_key))
+
+
+def refresh_dependency_index(db: Session, test_type: TestType, scope_key: str, catalog: dict) -> bool:
+    """
+    Bring the index of one line / module up to date with `catalog`.
+
+    Returns True when the index can be used for this scope.
+    """
+    if catalog.get("error"):
+        return False
+
+    key = (test_type.value, scope_key)
+    with _state_lock:
+        refresh_lock = _refresh_locks.setdefault(key, threading.Lock())
+
+    with refresh_lock:
+        fetched_at = catalog.get("fetched_at")
+        if is_dependency_index_current(test_type, scope_key, catalog):
+            return True
+
+        file_names = [
+            str(item.get("file_name") or "").strip()
+            for item in catalog.get("files", [])
+            if str(item.get("file_name") or "").strip()
+        ]
+        known_stamps = {
+            (source_kind, file_name): file_stamp
+            for source_kind, file_name, file_stamp in db.execute(
+                select(DependencySource.source_kind, DependencySource.file_name, DependencySource.file_stamp).where(
+                    DependencySource.test_type == test_type.value,
+                    DependencySource.scope_key == scope_key,
+                )
+            )
+        }
+
+        try:
+            rows = _scan_sources(db, test_type, scope_key, file_names, known_stamps)
+        except (CatalogError, ValueError, OSError) as exc:
+            logger.warning("Dependency index refresh failed for %s %s: %s", test_type.value, scope_key, exc)
+            return False
+
+        try:
+            _apply_scan(db, test_type, scope_key, rows, known_stamps)
+        except IntegrityError:
+            # Another worker indexed the same files concurrently; its rows are as fresh as ours.
+            db.rollback()
+            return True
+
+        if fetched_at is not None:
+            with _state_lock:
+                _indexed_catalogs[key] = fetched_at
+        return True
+
+
+def get_direct_references(
+    db: Session,
+    test_type: TestType,
+    scope_key: str,
+    source_kind: str,
+    file_names: list[str],
+) -> dict[str, list[str]]:
+    """Direct references of indexed files, in body order; unindexed files are absent."""
+    if not file_names:
+        return {}
+    indexed = db.scalars(
+        select(DependencySource.file_name).where(
+            DependencySource.test_type == test_type.value,
+            DependencySource.scope_key == scope_key,
+            DependencySource.source_kind == source_kind,
+            DependencySource.file_name.in_(file_names),
+        )
+    ).all()
+    result: dict[str, list[str]] = {file_name: [] for file_name in indexed}
+    edges = db.execute(
+        select(DependencyEdge.source_file_name, DependencyEdge.target_name)
+        .where(
+            DependencyEdge.test_type == test_type.value,
+            DependencyEdge.scope_key == scope_key,
+            DependencyEdge.source_kind == source_kind,
+            DependencyEdge.source_file_name.in_(list(result)),
+        )
+        .order_by(DependencyEdge.source_file_name, DependencyEdge.position)
+    )
+    for source_file_name, target_name in edges:
+        result[source_file_name].append(target_name)
+    return result
+
+
+def get_reference_graph(
+    db: Session,
+    test_type: TestType,
+    scope_key: str,
+    source_kind: str | None = None,
+) -> dict[str, list[str]]:
+    """Whole `{file_name: direct references}` graph of one scope (every indexed file is a key)."""
+    source_query = select(DependencySource.file_name).where(
+        DependencySource.test_type == test_type.value,
+        DependencySource.scope_key == scope_key,
+    )
+    edge_query = (
+        select(DependencyEdge.source_file_name, DependencyEdge.target_name)
+        .where(DependencyEdge.test_type == test_type.value, DependencyEdge.scope_key == scope_key)
+        .order_by(DependencyEdge.source_file_name, DependencyEdge.position)
+    )
+    if source_kind is not None:
+        source_query = source_query.where(DependencySource.source_kind == source_kind)
+        edge_query = edge_query.where(DependencyEdge.source_kind == source_kind)
+
+    graph: dict[str, list[str]] = {file_name: [] for file_name in db.scalars(source_query)}
+    for source_file_name, target_name in db.execute(edge_query):
+        graph.setdefault(source_file_name, []).append(target_name)
+    return graph
+
+
+def get_dependents(db: Session, test_type: TestType, scope_key: str, target_name: str) -> list[dict[str, str]]:
+    """Reverse lookup: indexed files that directly reference `target_name`."""
+    rows = db.execute(
+        select(DependencyEdge.source_kind, DependencyEdge.source_file_name)
+        .where(
+            DependencyEdge.test_type == test_type.value,
+            DependencyEdge.scope_key == scope_key,
+            DependencyEdge.target_name == target_name,
+        )
+        .order_by(DependencyEdge.source_kind, DependencyEdge.source_file_name)
+        .distinct()
+    )
+    return [{"kind": source_kind, "file_name": file_name} for source_kind, file_name in rows]
+
+
+def _scan_sources(
+    db: Session,
+    test_type: TestType,
+    scope_key: str,
+    file_names: list[str],
+    known_stamps: dict[tuple[str, str], str],
+) -> list[dict[str, object]]:
+    if test_type == TestType.RTD:
+        config = db.query(RtdConfig).filter(RtdConfig.line_name == scope_key).first()
+        scan = rtd_catalog_custom.scan_dependency_sources
+    else:
+        config = db.query(EzdfsConfig).filter(EzdfsConfig.module_name == scope_key).first()
+        scan = ezdfs_catalog_custom.scan_dependency_sources
+    if config is None:
+        raise ValueError(f"{test_type.value} config not found: {scope_key}")
+
+    host = db.query(HostConfig).filter(HostConfig.name == config.host_name).first()
+    if host is None:
+        raise ValueError(f"Host config not found: {config.host_name}")
+
+    if test_type == TestType.RTD:
+        return scan(
+            host,
+            config.login_user,
+            config.home_dir_path,
+            file_names,
+            known_stamps,
+            _unresolved_macro_names(db, scope_key),
+        )
+    return scan(host, config.login_user, config.home_dir_path, file_names, known_stamps)
+
+
+def _unresolved_macro_names(db: Session, scope_key: str) -> list[str]:
+    """
+    Macro names referenced by indexed sources that have no source row yet.
+
+    Unchanged sources are not re-read, so a macro that was missing when its
+    referrer was scanned would otherwise never be looked up again.
+    """
+    indexed_macro = exists().where(
+        DependencySource.test_type == TestType.RTD.value,
+        DependencySource.scope_key == scope_key,
+        DependencySource.source_kind == "macro",
+        DependencySource.file_name == DependencyEdge.target_name,
+    )
+    return list(
+        db.scalars(
+            select(DependencyEdge.target_name)
+            .where(
+                DependencyEdge.test_type == TestType.RTD.value,
+                DependencyEdge.scope_key == scope_key,
+                ~indexed_macro,
+            )
+            .distinct()
+            .order_by(DependencyEdge.target_name)
+        )
+    )
+
+
+def _apply_scan(
+    db: Session,
+    test_type: TestType,
+    scope_key: str,
+    rows: list[dict[str, object]],
+    known_stamps: dict[tuple[str, str], str],
+) -> None:
+    """Delete vanished sources, replace edges of re-read sources, keep unchanged ones."""
+    present = {(str(row["kind"]), str(row["file_name"])) for row in rows}
+    changed = [row for row in rows if row["references"] is not None]
+    stale_keys = [key for key in known_stamps if key not in present]
+    rewritten_keys = stale_keys + [(str(row["kind"]), str(row["file_name"])) for row in changed]
+
+    scope_filter = (DependencySource.test_type == test_type.value, DependencySource.scope_key == scope_key)
+    edge_scope_filter = (DependencyEdge.test_type == test_type.value, DependencyEdge.scope_key == scope_key)
+    for start in range(0, len(rewritten_keys), 400):
+        chunk = rewritten_keys[start:start + 400]
+        db.execute(
+            delete(DependencyEdge).where(
+                *edge_scope_filter,
+                tuple_(DependencyEdge.source_kind, DependencyEdge.source_file_name).in_(chunk),
+            )
+        )
+        db.execute(
+            delete(DependencySource).where(
+                *scope_filter,
+                tuple_(DependencySource.source_kind, DependencySource.file_name).in_(chunk),
+            )
+        )
+
+    indexed_at = datetime.now(timezone.utc)
+    for row in changed:
+        kind = str(row["kind"])
+        file_name = str(row["file_name"])
+        db.add(
+            DependencySource(
+                test_type=test_type.value,
+                scope_key=scope_key,
+                source_kind=kind,
+                file_name=file_name,
+                file_stamp=str(row["stamp"]),
+                indexed_at=indexed_at,
+            )
+        )
+        db.add_all(
+            DependencyEdge(
+                test_type=test_type.value,
+                scope_key=scope_key,
+                source_kind=kind,
+                source_file_name=file_name,
+                target_name=str(target_name),
+                position=position,
+            )
+            for position, target_name in enumerate(row["references"] or [])
+        )
+    db.commit()
@@ -15,22 +15,36 @@ Public API:
    rule 파일이 **재귀적으로** 참조하는 sub rule 이름 목록을 반환한다.
    caller가 이미 catalog를 들고 있으면 `catalog_files`로 전달해 재조회를
    피할 수 있다.
+   트리는 레벨 단위 BFS로 한 번에 읽고, 결과는 (module, root 파일, catalog)
+   기준으로 memoize 된다.
 5. read_rule_source_text() / read_rule_source_bytes()
    선택된 deployed rule 파일 본문을 문자열/바이트로 읽는다.
 6. find_latest_backup_version()
    backup catalog에서 하나의 rule에 대한 최신 버전을 선택한다.
+7. scan_dependency_sources()
+   deployed rule 파일의 sub rule 참조를 stat 기반으로 증분 스캔한다
+   (dependency index 갱신용).
 """
 
+import hashlib
 import posixpath
 import re
 import shlex
+import threading
+from collections import OrderedDict
 
 from app.core.exceptions import CatalogError, SSHConnectionError
 from app.models.entities import HostConfig
+from app.services.remote_source_cache import read_changed_remote_files, read_remote_file, read_remote_files
 from app.services.ssh_runtime import open_limited_ssh_client
 from app.utils.ssh_helpers import build_clean_bash_command
 
 
+_SUBRULE_MEMO_SIZE = 512
+# (host, login_user, home_dir_path, root file_name, catalog fingerprint) -> resolved sub rule names
+_subrule_memo: OrderedDict[tuple[str, str, str, str, str], tuple[str, ...]] = OrderedDict()
+_subrule_memo_lock = threading.Lock()
+
 _EZDFS_FILE_RE = re.compile(
     r"^(?P<rule_name>.+?)-(?P<version>ver\.[^.]+(?:\.[^.]+)*)\.(?P<timestamp>[^.]+)\.rul$",
     flags=re.IGNORECASE,
@@ -85,6 +99,7 @@ def get_subrule_file_list(
     home_dir_path: str,
     rule_file_name: str,
     catalog_files: list[dict[str, str]] | None = None,
+    dependency_graph: dict[str, list[str]] | None = None,
 ) -> list[str]:
     """
     Return sub-rule **rule_names** (not file names) reachable from one root
@@ -94,6 +109,8 @@ def get_subrule_file_list(
     - rule_file_name: A `file_name` from `get_rule_file_list()` (the root).
     - catalog_files: Optional pre-fetched catalog. When None the function
       fetches it once via `get_rule_file_list()`.
+    - dependency_graph: Optional `{file_name: direct sub rule_names}` from
+      the dependency index. When it covers the root no file is read.
 
     Returns:
     - list[str]: Unique sub-rule `rule_name`s in first-seen order.
@@ -114,85 +131,113 @@ def get_subrule_file_list(
     )
     preferred_version = str(root_entry.get("version", "")).strip() if root_entry else ""
 
+    if dependency_graph is not None and normalized_root_name in dependency_graph:
+        return _walk_sub_rule_graph(dependency_graph, rule_file_name, catalog, preferred_version)
+
+    memo_key = (
+        host.name,
+        login_user,
+        home_dir_path,
+        normalized_root_name,
+        _catalog_fingerprint(catalog),
+    )
+    with _subrule_memo_lock:
+        memoized = _subrule_memo.get(memo_key)
+        if memoized is not None:
+            _subrule_memo.move_to_end(memo_key)
+            return list(memoized)
+
     try:
-        root_text = read_rule_source_text(host, login_user, home_dir_path, rule_file_name)
+        children_by_file, complete = _read_sub_rule_graph(
+            host, login_user, home_dir_path, rule_file_name, catalog, preferred_version
+        )
     except (CatalogError, OSError):
         return []
 
-    resolved: list[str] = []
-    seen_rules: set[str] = set()
-
-    def walk(rule_text: str) -> None:
-        for sub_rule_name in _extract_sub_rule_names_from_text(rule_text):
-            if sub_rule_name not in resolved:
-                resolved.append(sub_rule_name)
-
-            if sub_rule_name in seen_rules:
-                continue
-            seen_rules.add(sub_rule_name)
+    resolved = _walk_sub_rule_graph(children_by_file, rule_file_name, catalog, preferred_version)
 
-            child_file_name = _find_catalog_file_name_by_rule_name(
-                catalog,
-                sub_rule_name,
-                preferred_version=preferred_version,
-            )
-            if not child_file_name:
-                continue
-
-            try:
-                child_text = read_rule_source_text(host, login_user, home_dir_path, child_file_name)
-            except (CatalogError, OSError):
-                continue
+    if complete:
+        with _subrule_memo_lock:
+            _subrule_memo[memo_key] = tuple(resolved)
+            while len(_subrule_memo) > _SUBRULE_MEMO_SIZE:
+                _subrule_memo.popitem(last=False)
+    return resolved
 
-            walk(child_text)
 
-    walk(root_text)
-    return resolved
+def clear_subrule_memo() -> None:
+    """Forget resolved sub-rule trees, e.g. after rule files were edited in place."""
+    with _subrule_memo_lock:
+        _subrule_memo.clear()
 
 
 def read_rule_source_text(
     host: HostConfig, login_user: str, home_dir_path: str, file_name: str
 ) -> str:
-    """Read one deployed ezDFS rule file body as UTF-8 text over SSH."""
-    deployed_dir = _deployed_dir_from_home(home_dir_path)
-    command = build_clean_bash_command(
-        f"cd {shlex.quote(deployed_dir)} && cat {shlex.quote(file_name)}"
-    )
-
-    try:
-        with open_limited_ssh_client(host, login_user) as client:
-            _, stdout, stderr = client.exec_command(command, timeout=10)
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode("utf-8", errors="ignore")
-            error_output = stderr.read().decode("utf-8", errors="ignore").strip()
-    except (SSHConnectionError, OSError) as exc:
-        raise CatalogError(f"SSH file read failed: {exc}") from exc
-
-    if exit_status != 0:
-        raise RuntimeError(error_output or f"Failed to read ezDFS rule file: {file_name}")
-
-    return output
+    """Read one deployed ezDFS rule file body as UTF-8 text (served from the source cache)."""
+    return read_rule_source_bytes(host, login_user, home_dir_path, file_name).decode("utf-8", errors="ignore")
 
 
 def read_rule_source_bytes(
     host: HostConfig, login_user: str, home_dir_path: str, file_name: str
 ) -> bytes:
-    """Read one deployed ezDFS rule file as raw bytes over SFTP."""
+    """Read one deployed ezDFS rule file as raw bytes over SFTP (cached by size/mtime)."""
     deployed_dir = _deployed_dir_from_home(home_dir_path)
     remote_path = f"{deployed_dir.rstrip('/')}/{file_name}"
 
     try:
-        with open_limited_ssh_client(host, login_user) as client:
-            sftp = client.open_sftp()
-            try:
-                with sftp.open(remote_path, "rb") as remote_file:
-                    return remote_file.read()
-            finally:
-                sftp.close()
+        return read_remote_file(host, login_user, remote_path)
     except (SSHConnectionError, OSError) as exc:
         raise CatalogError(f"SFTP byte read failed: {exc}") from exc
 
 
+def scan_dependency_sources(
+    host: HostConfig,
+    login_user: str,
+    home_dir_path: str,
+    rule_file_names: list[str],
+    known_stamps: dict[tuple[str, str], str],
+) -> list[dict[str, object]]:
+    """
+    Incrementally scan deployed rule files for the persistent dependency index.
+
+    Input:
+    - rule_file_names: deployed `file_name`s from `get_rule_file_list()`.
+    - known_stamps: `{("rule", file_name): stamp}` already stored in the index.
+
+    Returns:
+    - list[dict]: one row per existing file with `kind` (`"rule"`),
+      `file_name`, `stamp` and `references` (direct sub rule names, or None
+      when the stamp is unchanged and the file was not re-read).
+
+    One stat round trip covers every file; only changed files are read.
+    """
+    deployed_dir = _deployed_dir_from_home(home_dir_path).rstrip("/")
+    paths = {f"{deployed_dir}/{file_name}": file_name for file_name in rule_file_names}
+    try:
+        result = read_changed_remote_files(
+            host,
+            login_user,
+            list(paths),
+            {path: known_stamps[("rule", name)] for path, name in paths.items() if ("rule", name) in known_stamps},
+        )
+    except (SSHConnectionError, OSError) as exc:
+        raise CatalogError(f"SSH dependency scan failed: {exc}") from exc
+
+    return [
+        {
+            "kind": "rule",
+            "file_name": paths[path],
+            "stamp": stamp,
+            "references": (
+                None
+                if data is None
+                else _extract_sub_rule_names_from_text(data.decode("utf-8", errors="ignore"))
+            ),
+        }
+        for path, (stamp, data) in result.items()
+    ]
+
+
 def find_latest_backup_version(
     backup_catalog_files: list[dict[str, str]],
     rule_name: str,
@@ -305,6 +350,99 @@ def _extract_sub_rule_names_from_text(rule_text: str) -> list[str]:
     return result
 
 
+def _walk_sub_rule_graph(
+    children_by_file: dict[str, list[str]],
+    rule_file_name: str,
+    catalog: list[dict[str, str]],
+    preferred_version: str,
+) -> list[str]:
+    """Same first-seen DFS order as the original per-file walk, over an in-memory graph."""
+    resolved: list[str] = []
+    seen_rules: set[str] = set()
+
+    def walk(file_name: str) -> None:
+        for sub_rule_name in children_by_file.get(file_name, []):
+            if sub_rule_name not in resolved:
+                resolved.append(sub_rule_name)
+
+            if sub_rule_name in seen_rules:
+                continue
+            seen_rules.add(sub_rule_name)
+
+            child_file_name = _find_catalog_file_name_by_rule_name(
+                catalog,
+                sub_rule_name,
+                preferred_version=preferred_version,
+            )
+            if child_file_name:
+                walk(child_file_name)
+
+    walk(rule_file_name)
+    return resolved
+
+
+def _read_sub_rule_graph(
+    host: HostConfig,
+    login_user: str,
+    home_dir_path: str,
+    rule_file_name: str,
+    catalog: list[dict[str, str]],
+    preferred_version: str,
+) -> tuple[dict[str, list[str]], bool]:
+    """
+    Read the sub-rule tree breadth-first, one batched remote read per level.
+
+    Returns `{file_name: direct sub rule_names}` for every readable file and
+    whether every referenced file could be read (only complete graphs are
+    memoized). Raises CatalogError when the root itself cannot be read.
+    """
+    deployed_dir = _deployed_dir_from_home(home_dir_path).rstrip("/")
+    children_by_file: dict[str, list[str]] = {}
+    complete = True
+    frontier = [rule_file_name]
+    is_root = True
+
+    while frontier:
+        paths = {f"{deployed_dir}/{file_name}": file_name for file_name in frontier}
+        try:
+            contents = read_remote_files(host, login_user, list(paths), skip_missing=not is_root)
+        except (SSHConnectionError, OSError) as exc:
+            if is_root:
+                raise CatalogError(f"SFTP byte read failed: {exc}") from exc
+            complete = False
+            break
+        if len(contents) < len(paths):
+            complete = False
+
+        next_frontier: list[str] = []
+        for remote_path, data in contents.items():
+            sub_rule_names = _extract_sub_rule_names_from_text(data.decode("utf-8", errors="ignore"))
+            children_by_file[paths[remote_path]] = sub_rule_names
+            for sub_rule_name in sub_rule_names:
+                child_file_name = _find_catalog_file_name_by_rule_name(
+                    catalog,
+                    sub_rule_name,
+                    preferred_version=preferred_version,
+                )
+                if (
+                    child_file_name
+                    and child_file_name not in children_by_file
+                    and child_file_name not in paths.values()
+                    and child_file_name not in next_frontier
+                ):
+                    next_frontier.append(child_file_name)
+        frontier = next_frontier
+        is_root = False
+
+    return children_by_file, complete
+
+
+def _catalog_fingerprint(catalog: list[dict[str, str]]) -> str:
+    """Digest of the catalog file names; a newly deployed version changes the memo key."""
+    file_names = sorted(str(item.get("file_name", "")).strip() for item in catalog)
+    return hashlib.sha1("\n".join(file_names).encode("utf-8")).hexdigest()
+
+
 def _deployed_dir_from_home(home_dir_path: str) -> str:
     """Resolve the deployed ezDFS directory from one module home path."""
     return posixpath.normpath(posixpath.join(home_dir_path, "repository/container/dfsdev/deployed"))
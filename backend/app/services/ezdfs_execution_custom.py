@@ -12,6 +12,7 @@ ezDFS execution custom flow
    원격 `ezDFS_test` 바이너리를 실행한다.
 5. 결과 raw output과 실행 command를 task raw/result 파일 생성에 넘긴다.
    file_service가 command는 `_meta.txt`, 본문은 rule 이름 txt로 분리 저장한다.
+   raw_output_stream_enabled이면 stdout은 실행 중에 rule 이름 txt로 바로 기록된다.
 """
 
 import posixpath
@@ -20,10 +21,17 @@ from typing import Any
 
 from sqlalchemy.orm import Session
 
-from app.core.exceptions import RemoteCommandError, SSHConnectionError
+from app.core.exceptions import RemoteCommandError
 from app.models.entities import EzdfsConfig, HostConfig, TestTask
-from app.services.ssh_runtime import open_limited_ssh_client
-from app.utils.ssh_helpers import build_clean_bash_command, extract_session_payload, run_remote_command
+from app.services.raw_capture import TaskRawCapture, open_task_raw_capture
+from app.services.task_cancellation import CancelToken, get_cancel_token
+from app.utils.ssh_helpers import (
+    build_clean_bash_command,
+    collect_remote_command,
+    extract_session_payload,
+    run_remote_command,
+    stream_remote_command,
+)
 
 
 def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) -> dict[str, str]:
@@ -39,8 +47,10 @@ def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
     Returns:
     - dict[str, str]:
       - message: Monitor/status summary
-      - raw_output: Raw stdout text from the remote test binary
+      - raw_output: Raw stdout text from the remote test binary (empty when streamed)
       - test_command: Executed command string. 저장 단계에서 `_meta.txt`에 기록된다.
+      - raw_files_by_rule: `{rule_name: file name}` when stdout was streamed
+        into the raw result directory
 
     Behavior:
     - resolves selected module and rule from request/session payload
@@ -67,10 +77,23 @@ def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
         raise ValueError("rule_name is required for ezDFS test action")
 
     config, host = _get_ezdfs_module_context(db, module_name)
+    capture = open_task_raw_capture(task)
     output, executed_command = _run_ezdfs_test_binary(
-        host, config.login_user, config.home_dir_path, rule_name
+        host,
+        config.login_user,
+        config.home_dir_path,
+        rule_name,
+        capture=capture,
+        cancel_token=get_cancel_token(task.task_id),
     )
 
+    if capture is not None:
+        return {
+            "message": f"Test completed: module={config.module_name}, rule={rule_name}",
+            "raw_output": "",
+            "test_command": executed_command,
+            "raw_files_by_rule": dict(capture.rule_files),
+        }
     return {
         "message": f"Test completed: module={config.module_name}, rule={rule_name}",
         "raw_output": output,
@@ -123,6 +146,8 @@ def _run_ezdfs_test_binary(
     working_dir: str,
     rule_name: str,
     timeout: int = 1200,
+    capture: TaskRawCapture | None = None,
+    cancel_token: CancelToken | None = None,
 ) -> tuple[str, str]:
     """
     Run the remote `ezDFS_test` binary for one rule.
@@ -131,11 +156,14 @@ def _run_ezdfs_test_binary(
     - host: SSH connection target.
     - working_dir: ezDFS module home directory.
     - rule_name: Selected ezDFS rule name.
-    - timeout: Remote command timeout in seconds.
+    - timeout: Seconds without any output before the command is treated as hung.
+    - capture: When given, stdout / stderr are streamed into the rule's raw
+      txt file instead of being read into memory.
+    - cancel_token: Canceling it kills the remote process group.
 
     Returns:
     - tuple[str, str]:
-      - stdout text
+      - stdout text (only its beginning when streamed)
       - executed command string
 
     Behavior:
@@ -155,14 +183,28 @@ def _run_ezdfs_test_binary(
         )
     )
 
-    try:
-        with open_limited_ssh_client(host, login_user) as client:
-            _, stdout, stderr = client.exec_command(remote_command, timeout=timeout)
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode("utf-8", errors="ignore").strip()
-            error_output = stderr.read().decode("utf-8", errors="ignore").strip()
-    except (SSHConnectionError, OSError) as exc:
-        raise SSHConnectionError(f"Remote command failed on host={host.name}: {exc}") from exc
+    should_cancel = cancel_token.is_canceled if cancel_token is not None else None
+    if capture is not None:
+        with capture.open(rule_name) as stream:
+            exit_status = stream_remote_command(
+                host,
+                login_user,
+                remote_command,
+                stream.write,
+                stream.write_stderr,
+                timeout=timeout,
+                should_cancel=should_cancel,
+            )
+        output = stream.head_text()
+        error_output = stream.stderr_text()
+    else:
+        exit_status, output, error_output = collect_remote_command(
+            host,
+            login_user,
+            remote_command,
+            timeout=timeout,
+            should_cancel=should_cancel,
+        )
 
     if exit_status != 0:
         raise RemoteCommandError(
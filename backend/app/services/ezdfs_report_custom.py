@@ -222,22 +222,8 @@ def _sanitize_ezdfs_path_token(value: str) -> str:
 
 
 def _resolve_ezdfs_rule_name(task: TestTask) -> str:
-    """Resolve the logical ezDFS rule name from the stored task payload."""
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return str(task.target_name or "").strip()
-    payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    return str(
-        payload.get("selected_rule")
-        or requested_payload.get("rule_name")
-        or task.target_name
-        or ""
-    ).strip()
+    """Resolve the logical ezDFS rule name stored on the task row."""
+    return str(task.rule_name or task.target_name or "").strip()
 
 
 def _collect_major_change_items(
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import json
-from datetime import datetime
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 from fastapi import HTTPException
@@ -9,11 +10,12 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.models.entities import RtdConfig, TestTask
+from app.models.entities import RtdConfig, TestTask, TestTaskRule
 from app.services.ezdfs_report_custom import build_ezdfs_test_report
 from app.services.file_service import _build_ezdfs_raw_file_name
 from app.services.rtd_report_custom import build_rtd_test_report
 from app.services.session_service import get_runtime_session_payload
+from app.services.task_service import get_task_rule_names
 from app.utils.constants import TARGET_SUFFIX
 from app.utils.enums import TaskStatus, TestType
 from app.utils.naming import normalize_target_line_name, sanitize_path_token
@@ -99,25 +101,6 @@ def generate_aggregate_rtd_summary_file(
 
     target_set = list(dict.fromkeys(normalize_target_line_name(line) for line in target_lines if line))
     legacy_target_set = [f"{line}{TARGET_SUFFIX}" for line in target_set]
-    tasks = (
-        db.query(TestTask)
-        .filter(
-            TestTask.user_id == user_id,
-            TestTask.test_type == "RTD",
-            or_(
-                TestTask.target_name.in_(target_set),
-                TestTask.target_name.in_(legacy_target_set),
-            ),
-            TestTask.action_type.in_(["TEST", "RETEST"]),
-            TestTask.status == TaskStatus.DONE.value,
-        )
-        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
-        .all()
-    )
-
-    if not tasks:
-        raise HTTPException(status_code=404, detail="No RTD test results found for selected target lines")
-
     runtime_payload = get_runtime_session_payload(db, user_id, TestType.RTD)
     fallback_major_change_items = (
         runtime_payload.get("major_change_items")
@@ -137,6 +120,23 @@ def generate_aggregate_rtd_summary_file(
         )
     )
 
+    query = db.query(TestTask).filter(
+        TestTask.user_id == user_id,
+        TestTask.test_type == "RTD",
+        or_(
+            TestTask.target_name.in_(target_set),
+            TestTask.target_name.in_(legacy_target_set),
+        ),
+        TestTask.action_type.in_(["TEST", "RETEST"]),
+        TestTask.status == TaskStatus.DONE.value,
+    )
+    if selected_rule_names:
+        query = query.filter(TestTask.rules.any(TestTaskRule.rule_name.in_(selected_rule_names)))
+    tasks = query.order_by(TestTask.requested_at.desc(), TestTask.id.desc()).all()
+
+    if not tasks:
+        raise HTTPException(status_code=404, detail="No RTD test results found for selected target lines")
+
     latest_tasks = _pick_latest_rtd_tasks_per_rule(tasks, target_set, selected_rule_names)
 
     report_dir = Path(settings.result_base_path) / "rtd" / "reports" / sanitize_path_token(user_id)
@@ -212,6 +212,107 @@ def generate_aggregate_ezdfs_summary_file(
     )
 
 
+def list_raw_export_tasks(
+    db: Session,
+    user_id: str,
+    test_type: TestType,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    lines: list[str] | None = None,
+    rules: list[str] | None = None,
+    modules: list[str] | None = None,
+) -> list:
+    """
+    Column rows (no ORM objects) of the user's TEST / RETEST tasks with raw
+    output matching the bulk export filters, oldest first.
+
+    `date_to` is inclusive. Lines accept both `LINE` and legacy `LINE_TARGET`.
+    """
+    query = db.query(
+        TestTask.task_id,
+        TestTask.test_type,
+        TestTask.target_name,
+        TestTask.module_name,
+        TestTask.rule_name,
+        TestTask.status,
+        TestTask.raw_result_path,
+        TestTask.requested_at,
+    ).filter(
+        TestTask.user_id == user_id,
+        TestTask.test_type == test_type.value,
+        TestTask.action_type.in_(["TEST", "RETEST"]),
+        TestTask.raw_result_path.isnot(None),
+    )
+    if date_from is not None:
+        query = query.filter(TestTask.requested_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to is not None:
+        query = query.filter(
+            TestTask.requested_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+        )
+    if lines:
+        line_set = list(dict.fromkeys(normalize_target_line_name(line) for line in lines if line))
+        query = query.filter(
+            or_(
+                TestTask.target_name.in_(line_set),
+                TestTask.target_name.in_([f"{line}{TARGET_SUFFIX}" for line in line_set]),
+            )
+        )
+    if modules:
+        query = query.filter(or_(TestTask.module_name.in_(modules), TestTask.target_name.in_(modules)))
+    if rules:
+        if test_type == TestType.RTD:
+            query = query.filter(TestTask.rules.any(TestTaskRule.rule_name.in_(rules)))
+        else:
+            query = query.filter(TestTask.rule_name.in_(rules))
+    return query.order_by(TestTask.requested_at.asc(), TestTask.id.asc()).all()
+
+
+def iter_raw_export_entries(rows: list, rules: list[str] | None = None) -> Iterator[tuple[str, Path | bytes]]:
+    """
+    ZIP entries of a bulk raw export: every raw txt of `rows` under
+    `<line or module>/<task_id>/`, followed by `manifest.json`.
+
+    Index files are read lazily while the archive is being streamed, so the
+    caller's DB session is not needed anymore.
+    """
+    rule_filter = {rule for rule in rules or [] if rule}
+    manifest: list[dict[str, object]] = []
+    for row in rows:
+        if row.test_type == TestType.RTD.value:
+            scope = normalize_target_line_name(row.target_name)
+            files = [
+                (rule_name, file_path)
+                for rule_name, file_path in get_rtd_raw_rule_file_map(row).items()
+                if not rule_filter or rule_name in rule_filter
+            ]
+        else:
+            scope = row.module_name or row.target_name
+            file_path = get_ezdfs_raw_content_path(row)
+            files = [(row.rule_name, file_path)] if file_path is not None else []
+
+        for rule_name, file_path in files:
+            arcname = f"{sanitize_path_token(scope)}/{row.task_id}/{file_path.name}"
+            manifest.append(
+                {
+                    "file": arcname,
+                    "task_id": row.task_id,
+                    "test_type": row.test_type,
+                    "target": scope,
+                    "rule": rule_name,
+                    "status": row.status,
+                    "requested_at": row.requested_at.isoformat() if row.requested_at else None,
+                    "size": file_path.stat().st_size if file_path.exists() else None,
+                }
+            )
+            yield arcname, file_path
+
+    yield "manifest.json", json.dumps(
+        {"generated_at": datetime.now().isoformat(), "files": manifest},
+        ensure_ascii=False,
+        indent=2,
+    ).encode("utf-8")
+
+
 def _pick_latest_rtd_tasks_per_rule(
     tasks: list[TestTask],
     target_lines: list[str],
@@ -234,16 +335,7 @@ def _pick_latest_rtd_tasks_per_rule(
         line_name = normalize_target_line_name(task.target_name)
         if line_set and line_name not in line_set:
             continue
-        try:
-            requested_payload = json.loads(task.requested_payload_json or "{}")
-        except (json.JSONDecodeError, ValueError):
-            requested_payload = {}
-        payload = (
-            requested_payload.get("payload")
-            if isinstance(requested_payload.get("payload"), dict)
-            else requested_payload
-        )
-        rule_names = _collect_rtd_task_rule_names(requested_payload, payload)
+        rule_names = get_task_rule_names(task)
         contributes = False
         for rule_name in rule_names:
             if rule_filter and rule_name not in rule_filter:
@@ -258,26 +350,6 @@ def _pick_latest_rtd_tasks_per_rule(
     return picked
 
 
-def _collect_rtd_task_rule_names(requested_payload: dict, payload: dict) -> list[str]:
-    """Extract rule names from a RTD task payload in the same order the report builder sees them."""
-    targets = (
-        payload.get("selected_rule_targets")
-        if isinstance(payload.get("selected_rule_targets"), list)
-        else []
-    )
-    names: list[str] = []
-    for item in targets:
-        if not isinstance(item, dict):
-            continue
-        rule_name = str(item.get("rule_name", "")).strip()
-        if rule_name:
-            names.append(rule_name)
-    if names:
-        return names
-    fallback = str(requested_payload.get("rule_name", "")).strip()
-    return [fallback] if fallback else []
-
-
 def _build_business_unit_token(db: Session, target_lines: list[str]) -> str:
     business_units: list[str] = []
     for line in target_lines:
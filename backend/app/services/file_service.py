@@ -13,6 +13,7 @@ from app.models.entities import RtdConfig, TestTask
 from app.services.ezdfs_report_custom import build_ezdfs_test_report
 from app.services.rtd_report_custom import build_rtd_test_report
 from app.services.session_service import get_runtime_session_payload
+from app.services.task_service import get_task_primary_rule_name
 from app.utils.enums import TaskStatus, TestType
 from app.utils.naming import normalize_target_line_name, sanitize_path_token
 
@@ -30,28 +31,54 @@ def _ensure_task_dir(task: TestTask) -> Path:
     return path
 
 
+def get_raw_task_dir(task: TestTask) -> Path:
+    """`<result_base>/<type>/raw/<user>/<task_id>/` holding `_meta.txt`, `index.json` and raw txt files."""
+    return _raw_root_dir(task) / task.task_id
+
+
+def _raw_root_dir(task: TestTask) -> Path:
+    return Path(settings.result_base_path) / task.test_type.lower() / "raw" / sanitize_path_token(task.user_id)
+
+
 def generate_raw_file(
     db: Session,
     task: TestTask,
     raw_output: str | None = None,
     raw_outputs_by_rule: dict[str, str] | None = None,
+    raw_files_by_rule: dict[str, str] | None = None,
 ) -> Path:
-    if task.status != TaskStatus.DONE.value:
+    """
+    Save the raw result of a finished task and set `raw_result_path`.
+
+    `raw_files_by_rule` (`rule_name -> file name`) lists txt files that were
+    already streamed into `get_raw_task_dir(task)` during execution (see
+    `raw_capture`); only `_meta.txt` / `index.json` are written for them.
+    CANCELED tasks keep the partial output streamed before they were stopped.
+    """
+    if task.status not in {TaskStatus.DONE.value, TaskStatus.CANCELED.value}:
         raise HTTPException(status_code=409, detail="Task is not completed yet")
 
     line_token = sanitize_path_token(normalize_target_line_name(task.target_name))
-    rule_token = sanitize_path_token(_extract_rtd_rule_name(task)) if task.test_type == "RTD" else ""
+    rule_token = sanitize_path_token(get_task_primary_rule_name(task)) if task.test_type == "RTD" else ""
     timestamp = (task.ended_at or task.started_at or task.requested_at or datetime.now()).strftime("%Y%m%d_%H%M%S")
-    task_dir = Path(settings.result_base_path) / task.test_type.lower() / "raw" / sanitize_path_token(task.user_id)
+    task_dir = _raw_root_dir(task)
     task_dir.mkdir(parents=True, exist_ok=True)
 
     if (
         task.test_type == TestType.RTD.value
         and task.action_type in {"TEST", "RETEST"}
-        and isinstance(raw_outputs_by_rule, dict)
-        and raw_outputs_by_rule
+        and (raw_outputs_by_rule or raw_files_by_rule)
     ):
-        meta_path = _write_rtd_rule_raw_files(task_dir, task, line_token, raw_outputs_by_rule)
+        meta_path, rule_files = _write_rtd_rule_raw_files(
+            task_dir,
+            task,
+            line_token,
+            raw_outputs_by_rule or {},
+            raw_files_by_rule,
+        )
+        # MyPage lists only these rules; a CANCELED task may not have reached the others.
+        for task_rule in task.rules:
+            task_rule.has_raw = task_rule.rule_name in rule_files
         task.raw_result_path = str(meta_path)
         db.add(task)
         db.commit()
@@ -59,7 +86,7 @@ def generate_raw_file(
         return meta_path
 
     if task.test_type == TestType.EZDFS.value and task.action_type in {"TEST", "RETEST"}:
-        meta_path = _write_ezdfs_raw_files(task_dir, task, raw_output or "")
+        meta_path = _write_ezdfs_raw_files(task_dir, task, raw_output or "", streamed=bool(raw_files_by_rule))
         task.raw_result_path = str(meta_path)
         db.add(task)
         db.commit()
@@ -167,7 +194,7 @@ def _build_summary_output_path(db: Session, task: TestTask) -> Path:
 def _build_summary_name_token(db: Session, task: TestTask) -> str:
     """Build a human-readable summary filename token for one task."""
     if task.test_type == TestType.EZDFS.value:
-        module_name = _extract_ezdfs_module_name(task) or task.target_name
+        module_name = task.module_name or task.target_name
         return sanitize_path_token(module_name)
 
     if task.test_type == TestType.RTD.value:
@@ -183,15 +210,16 @@ def _write_rtd_rule_raw_files(
     task: TestTask,
     line_token: str,
     raw_outputs_by_rule: dict[str, str],
-) -> Path:
+    raw_files_by_rule: dict[str, str] | None = None,
+) -> tuple[Path, dict[str, str]]:
     raw_task_dir = raw_root_dir / task.task_id
     raw_task_dir.mkdir(parents=True, exist_ok=True)
 
-    used_file_names: set[str] = set()
+    used_file_names: set[str] = set((raw_files_by_rule or {}).values())
     index_payload: dict[str, dict[str, str] | str] = {
         "task_id": task.task_id,
         "line_name": normalize_target_line_name(task.target_name),
-        "rule_files": {},
+        "rule_files": dict(raw_files_by_rule or {}),
     }
 
     for rule_name, output in raw_outputs_by_rule.items():
@@ -219,13 +247,14 @@ def _write_rtd_rule_raw_files(
         json.dumps(index_payload, ensure_ascii=True, indent=2),
         encoding="utf-8",
     )
-    return meta_path
+    return meta_path, index_payload["rule_files"]
 
 
 def _write_ezdfs_raw_files(
     raw_root_dir: Path,
     task: TestTask,
     raw_output: str,
+    streamed: bool = False,
 ) -> Path:
     raw_task_dir = raw_root_dir / task.task_id
     raw_task_dir.mkdir(parents=True, exist_ok=True)
@@ -244,8 +273,9 @@ def _write_ezdfs_raw_files(
         meta_lines.append(f"command={command_text}")
     meta_content = "\n".join(meta_lines)
     meta_path.write_text(meta_content, encoding="utf-8")
-    raw_file_name = _build_ezdfs_raw_file_name(task)
-    (raw_task_dir / raw_file_name).write_text(detail_text, encoding="utf-8")
+    if not streamed:
+        raw_file_name = _build_ezdfs_raw_file_name(task)
+        (raw_task_dir / raw_file_name).write_text(detail_text, encoding="utf-8")
     return meta_path
 
 
@@ -278,72 +308,6 @@ def _split_ezdfs_raw_output(raw_output: str) -> tuple[str, str]:
 
 def _build_ezdfs_raw_file_name(task: TestTask) -> str:
     """Build a stable ezDFS raw txt filename from the selected rule name."""
-    rule_name = _extract_ezdfs_rule_name(task)
+    rule_name = task.rule_name
     rule_token = sanitize_path_token(rule_name) if rule_name else "raw"
     return f"{rule_token}.txt"
-
-
-def _extract_rtd_rule_name(task: TestTask) -> str:
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return ""
-
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    selected_rule = str(
-        nested_payload.get("selected_rule")
-        or requested_payload.get("rule_name")
-        or ""
-    ).strip()
-    if selected_rule:
-        return selected_rule
-
-    selected_rule_targets = nested_payload.get("selected_rule_targets", [])
-    if isinstance(selected_rule_targets, list):
-        for item in selected_rule_targets:
-            rule_name = str(item.get("rule_name", "")).strip()
-            if rule_name:
-                return rule_name
-    return ""
-
-
-def _extract_ezdfs_rule_name(task: TestTask) -> str:
-    """Extract the selected ezDFS rule name from one stored task payload."""
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return ""
-
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    return str(
-        requested_payload.get("rule_name")
-        or nested_payload.get("selected_rule")
-        or ""
-    ).strip()
-
-
-def _extract_ezdfs_module_name(task: TestTask) -> str:
-    """Extract the selected ezDFS module name from one stored task payload."""
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return ""
-
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    return str(
-        requested_payload.get("module_name")
-        or nested_payload.get("selected_module")
-        or ""
-    ).strip()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+"""
+Live tail of a TEST task's raw output.
+
+While a task runs, `raw_capture` streams stdout into the rule txt files of
+`get_raw_task_dir(task)` and lists them in `index.json`. The tail stream
+seeks to the client's byte offset in that file and only reads what was
+appended since, so a 20-minute `atm_testscript` can be followed without
+re-reading the file or polling `/status`.
+
+SSE frames (`event` field):
+- output: `{rule, offset, next_offset, text}`; the frame id is `next_offset`
+          so a reconnecting EventSource resumes with `Last-Event-ID`
+- end:    `{status, next_offset}` once the task finished and the file is
+          fully sent
+"""
+
+import asyncio
+import codecs
+import json
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.db.session import SessionLocal
+from app.models.entities import TestTask
+from app.services.file_service import get_raw_task_dir
+from app.services.task_service import ensure_task_owner
+from app.utils.enums import TaskStatus, TestType
+
+_POLL_SECONDS = 1.0
+_STATUS_POLL_SECONDS = 3.0
+_KEEPALIVE_SECONDS = 15.0
+_READ_CHUNK_BYTES = 64 * 1024
+# Upper bound sent per poll so a client far behind does not get one huge burst.
+_MAX_BYTES_PER_POLL = 512 * 1024
+_ACTIVE_STATUSES = {TaskStatus.PENDING.value, TaskStatus.RUNNING.value}
+
+
+def resolve_task_raw_dir(task_id: str, user_id: str, test_type: TestType) -> Path:
+    """Owner check + raw directory, with a short session so the stream does not pin one."""
+    db = SessionLocal()
+    try:
+        return get_raw_task_dir(ensure_task_owner(db, task_id, user_id, test_type))
+    finally:
+        db.close()
+
+
+def locate_task_output_file(raw_task_dir: Path, rule_name: str | None) -> tuple[str, Path] | None:
+    """`(rule_name, path)` of the in-progress or saved rule txt; the first rule when none is given."""
+    try:
+        index_payload = json.loads((raw_task_dir / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    rule_files = index_payload.get("rule_files") if isinstance(index_payload, dict) else None
+    if not isinstance(rule_files, dict) or not rule_files:
+        return None
+    selected = str(rule_name or "").strip() or next(iter(rule_files))
+    file_name = str(rule_files.get(selected) or "").strip()
+    if not file_name:
+        return None
+    return selected, raw_task_dir / file_name
+
+
+def read_output_chunk(path: Path, offset: int, max_bytes: int = _MAX_BYTES_PER_POLL) -> bytes:
+    """Bytes appended after `offset`, read with one seek instead of re-reading the file."""
+    try:
+        with path.open("rb") as handle:
+            handle.seek(offset)
+            chunks: list[bytes] = []
+            remaining = max_bytes
+            while remaining > 0:
+                chunk = handle.read(min(_READ_CHUNK_BYTES, remaining))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                remaining -= len(chunk)
+            return b"".join(chunks)
+    except FileNotFoundError:
+        return b""
+
+
+def _resolve_start_offset(path: Path, offset: int) -> int:
+    """Negative offsets count from the current end of the file (`-16384` = last 16 KiB)."""
+    if offset >= 0:
+        return offset
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return 0
+    return max(0, size + offset)
+
+
+def _load_task_status(task_id: str) -> str | None:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(TestTask.status).where(TestTask.task_id == task_id))
+    finally:
+        db.close()
+
+
+def _sse(event: str, data: dict, event_id: int | None = None) -> str:
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event}\ndata: {payload}\n\n"
+
+
+async def iter_task_output_events(
+    request,
+    task_id: str,
+    raw_task_dir: Path,
+    rule_name: str | None,
+    offset: int,
+):
+    """SSE frames following one rule file of `task_id` until the task finishes."""
+    loop = asyncio.get_running_loop()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    located: tuple[str, Path] | None = None
+    position = max(0, offset)
+    status = await asyncio.to_thread(_load_task_status, task_id)
+    status_checked_at = loop.time()
+    last_sent_at = loop.time()
+
+    yield "retry: 3000\n\n"
+    while True:
+        if await request.is_disconnected():
+            return
+
+        if located is None:
+            located = await asyncio.to_thread(locate_task_output_file, raw_task_dir, rule_name)
+            if located is not None:
+                position = await asyncio.to_thread(_resolve_start_offset, located[1], offset)
+
+        data = b""
+        if located is not None:
+            data = await asyncio.to_thread(read_output_chunk, located[1], position)
+        if data:
+            start = position
+            position += len(data)
+            yield _sse(
+                "output",
+                {"rule": located[0], "offset": start, "next_offset": position, "text": decoder.decode(data)},
+                event_id=position,
+            )
+            last_sent_at = loop.time()
+            if len(data) >= _MAX_BYTES_PER_POLL:
+                continue
+
+        if status not in _ACTIVE_STATUSES and not data:
+            yield _sse("end", {"status": status, "next_offset": position})
+            return
+
+        now = loop.time()
+        if now - status_checked_at >= _STATUS_POLL_SECONDS:
+            status = await asyncio.to_thread(_load_task_status, task_id)
+            status_checked_at = now
+            if status not in _ACTIVE_STATUSES:
+                # One more read picks up output written just before the task ended.
+                continue
+        if now - last_sent_at >= _KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent_at = now
+        await asyncio.sleep(_POLL_SECONDS)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+"""
+Run order of waiting entries inside one line / module queue.
+
+`task_queue` serializes tasks per queue key; this module decides which
+waiting entry of a key runs next. Entries with a higher task `priority`
+always go first; inside one priority tier the key's policy applies:
+
+- fifo:          entry id order (the historical behaviour)
+- round_robin:   one entry per user in turn, starting with the user whose
+                 last task on the key started longest ago
+- weighted_fair: weighted fair queuing by runtime; each user's next entry
+                 gets a virtual finish time of (runtime used on the key in
+                 the last `task_queue_fair_share_window_seconds`) + (its
+                 estimated duration), so users with long tests get fewer turns
+
+Policies are set per ezDFS module (`EzdfsConfig.queue_policy`, empty means
+`task_queue_default_policy`). RTD line queue keys already include the user,
+so those queues only order by priority.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models.entities import EzdfsConfig, TaskQueueEntry, TestTask
+from app.utils.enums import ActionType, TestType
+
+settings = get_settings()
+
+QUEUE_POLICY_FIFO = "fifo"
+QUEUE_POLICY_ROUND_ROBIN = "round_robin"
+QUEUE_POLICY_WEIGHTED_FAIR = "weighted_fair"
+QUEUE_POLICIES = (QUEUE_POLICY_FIFO, QUEUE_POLICY_ROUND_ROBIN, QUEUE_POLICY_WEIGHTED_FAIR)
+
+# Estimated duration of a user's next task when the key has no finished run in the window.
+_DEFAULT_TASK_SECONDS = 60.0
+_MODULE_QUEUE_ACTIONS = (ActionType.SYNC.value, ActionType.TEST.value, ActionType.RETEST.value)
+
+
+@dataclass
+class _UserUsage:
+    last_started_at: datetime | None = None
+    used_seconds: float = 0.0
+    finished_runs: int = 0
+    finished_seconds: float = 0.0
+
+
+def resolve_queue_policy(value: str | None) -> str:
+    policy = str(value or "").strip().lower() or str(settings.task_queue_default_policy or "").strip().lower()
+    return policy if policy in QUEUE_POLICIES else QUEUE_POLICY_FIFO
+
+
+def load_ezdfs_queue_policies(db: Session, module_names: set[str]) -> dict[str, str]:
+    """`{module_name: effective policy}` for the given module queue keys."""
+    if not module_names:
+        return {}
+    configured = dict(
+        db.execute(
+            select(EzdfsConfig.module_name, EzdfsConfig.queue_policy).where(
+                EzdfsConfig.module_name.in_(module_names)
+            )
+        ).all()
+    )
+    return {module_name: resolve_queue_policy(configured.get(module_name)) for module_name in module_names}
+
+
+def order_ezdfs_entries(
+    db: Session,
+    module_name: str,
+    entries: list[TaskQueueEntry],
+    policy: str,
+) -> list[TaskQueueEntry]:
+    """Waiting entries of one module queue in the order they should run."""
+    if policy == QUEUE_POLICY_FIFO or len({entry.user_id for entry in entries}) <= 1:
+        return order_by_priority(entries)
+
+    usage = _load_module_usage(db, module_name)
+    ordered: list[TaskQueueEntry] = []
+    for tier in _priority_tiers(entries):
+        if policy == QUEUE_POLICY_ROUND_ROBIN:
+            ordered.extend(_round_robin(tier, usage))
+        else:
+            ordered.extend(_weighted_fair(tier, usage))
+    return ordered
+
+
+def order_by_priority(entries: list[TaskQueueEntry]) -> list[TaskQueueEntry]:
+    return sorted(entries, key=lambda entry: (-(entry.priority or 0), entry.id))
+
+
+def _priority_tiers(entries: list[TaskQueueEntry]) -> list[list[TaskQueueEntry]]:
+    tiers: dict[int, list[TaskQueueEntry]] = defaultdict(list)
+    for entry in entries:
+        tiers[entry.priority or 0].append(entry)
+    return [sorted(tiers[priority], key=lambda entry: entry.id) for priority in sorted(tiers, reverse=True)]
+
+
+def _entries_by_user(entries: list[TaskQueueEntry]) -> dict[str, list[TaskQueueEntry]]:
+    by_user: dict[str, list[TaskQueueEntry]] = defaultdict(list)
+    for entry in entries:
+        by_user[entry.user_id or ""].append(entry)
+    return by_user
+
+
+def _round_robin(entries: list[TaskQueueEntry], usage: dict[str, _UserUsage]) -> list[TaskQueueEntry]:
+    by_user = _entries_by_user(entries)
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+
+    def user_turn(user_id: str) -> tuple[datetime, int]:
+        last_started_at = usage[user_id].last_started_at if user_id in usage else None
+        return (_as_utc(last_started_at) or oldest, by_user[user_id][0].id)
+
+    user_order = {user_id: rank for rank, user_id in enumerate(sorted(by_user, key=user_turn))}
+    turns = {
+        entry.id: (position, user_order[user_id])
+        for user_id, user_entries in by_user.items()
+        for position, entry in enumerate(user_entries)
+    }
+    return sorted(entries, key=lambda entry: turns[entry.id])
+
+
+def _weighted_fair(entries: list[TaskQueueEntry], usage: dict[str, _UserUsage]) -> list[TaskQueueEntry]:
+    finished_runs = sum(item.finished_runs for item in usage.values())
+    key_average = (
+        sum(item.finished_seconds for item in usage.values()) / finished_runs
+        if finished_runs
+        else _DEFAULT_TASK_SECONDS
+    )
+    finish_times: dict[int, float] = {}
+    for user_id, user_entries in _entries_by_user(entries).items():
+        user_usage = usage.get(user_id, _UserUsage())
+        estimate = (
+            user_usage.finished_seconds / user_usage.finished_runs
+            if user_usage.finished_runs
+            else key_average
+        )
+        for position, entry in enumerate(user_entries, start=1):
+            finish_times[entry.id] = user_usage.used_seconds + position * max(estimate, 1.0)
+    return sorted(entries, key=lambda entry: (finish_times[entry.id], entry.id))
+
+
+def _load_module_usage(db: Session, module_name: str) -> dict[str, _UserUsage]:
+    """Per-user runs on `module_name` started within the fair-share window."""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=max(0, settings.task_queue_fair_share_window_seconds))
+    rows = db.execute(
+        select(TestTask.user_id, TestTask.started_at, TestTask.ended_at).where(
+            TestTask.test_type == TestType.EZDFS.value,
+            TestTask.module_name == module_name,
+            TestTask.action_type.in_(_MODULE_QUEUE_ACTIONS),
+            TestTask.started_at >= cutoff,
+        )
+    ).all()
+    usage: dict[str, _UserUsage] = defaultdict(_UserUsage)
+    for user_id, started_at, ended_at in rows:
+        started_at = _as_utc(started_at)
+        item = usage[user_id]
+        if item.last_started_at is None or started_at > item.last_started_at:
+            item.last_started_at = started_at
+        seconds = max(0.0, ((_as_utc(ended_at) or now) - started_at).total_seconds())
+        item.used_seconds += seconds
+        if ended_at is not None:
+            item.finished_runs += 1
+            item.finished_seconds += seconds
+    return usage
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # SQLite returns naive datetimes for timezone-aware columns.
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
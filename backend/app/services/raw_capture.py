@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+"""
+Streaming capture of remote TEST output into the raw result store.
+
+RTD / ezDFS test commands can print hundreds of MB. Instead of reading the
+whole stdout into a string and saving raw files after the task finished,
+execution hooks open one `RawOutputCapture` per rule and write channel
+chunks straight into `get_raw_task_dir(task)` while the command runs:
+
+- stdout is written as it arrives up to `raw_output_max_bytes`; beyond that
+  only the last `raw_output_tail_bytes` are kept and appended behind a
+  truncation marker when the capture closes.
+- stderr goes to `<file>.stderr` (created on the first chunk); its tail is
+  kept for the failure message.
+- `index.json` is rewritten whenever a rule file is opened, so in-progress
+  files can be found while the task is RUNNING.
+
+`generate_raw_file(raw_files_by_rule=...)` then only writes `_meta.txt` and
+the final `index.json`.
+"""
+
+import json
+import shutil
+import threading
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.models.entities import TestTask
+from app.services.file_service import (
+    _build_ezdfs_raw_file_name,
+    _build_unique_rtd_rule_raw_file_name,
+    get_raw_task_dir,
+)
+from app.utils.enums import TestType
+from app.utils.naming import normalize_target_line_name, sanitize_path_token
+
+settings = get_settings()
+
+_HEAD_BYTES = 512
+_STDERR_TAIL_BYTES = 4 * 1024
+
+
+class RawOutputCapture:
+    """Writes one command's stdout / stderr to disk with bounded memory."""
+
+    def __init__(self, path: Path, max_bytes: int, tail_bytes: int) -> None:
+        self.path = path
+        self._max_bytes = max(0, max_bytes)
+        self._tail_bytes = max(0, tail_bytes)
+        self._file = path.open("wb")
+        self._written = 0
+        self._dropped = 0
+        self._head = bytearray()
+        self._tail = bytearray()
+        self._stderr_file = None
+        self._stderr_tail = bytearray()
+
+    def write(self, data: bytes) -> None:
+        if not data:
+            return
+        if len(self._head) < _HEAD_BYTES:
+            self._head.extend(data[: _HEAD_BYTES - len(self._head)])
+
+        room = self._max_bytes - self._written
+        if room > 0:
+            self._file.write(data[:room])
+            self._file.flush()
+            self._written += min(room, len(data))
+            data = data[room:]
+        if data:
+            self._tail.extend(data)
+            overflow = len(self._tail) - self._tail_bytes
+            if overflow > 0:
+                self._dropped += overflow
+                del self._tail[:overflow]
+
+    def write_stderr(self, data: bytes) -> None:
+        if not data:
+            return
+        if self._stderr_file is None:
+            self._stderr_file = self.path.with_name(f"{self.path.name}.stderr").open("wb")
+        self._stderr_file.write(data)
+        self._stderr_file.flush()
+        self._stderr_tail.extend(data)
+        if len(self._stderr_tail) > _STDERR_TAIL_BYTES:
+            del self._stderr_tail[: len(self._stderr_tail) - _STDERR_TAIL_BYTES]
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if self._dropped:
+            self._file.write(f"\n... [{self._dropped} bytes truncated] ...\n".encode("utf-8"))
+        if self._tail:
+            self._file.write(bytes(self._tail))
+            self._tail.clear()
+        self._file.close()
+        if self._stderr_file is not None:
+            self._stderr_file.close()
+
+    def head_text(self) -> str:
+        """Beginning of stdout, for monitor summaries."""
+        return bytes(self._head).decode("utf-8", errors="ignore").strip()
+
+    def stderr_text(self) -> str:
+        return bytes(self._stderr_tail).decode("utf-8", errors="ignore").strip()
+
+    def __enter__(self) -> RawOutputCapture:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+class TaskRawCapture:
+    """Raw txt files of one task, named like `generate_raw_file()` names them."""
+
+    def __init__(self, task: TestTask) -> None:
+        self._task_id = task.task_id
+        self._test_type = task.test_type
+        self._line_name = normalize_target_line_name(task.target_name)
+        self._ezdfs_file_name = _build_ezdfs_raw_file_name(task) if task.test_type == TestType.EZDFS.value else ""
+        self.directory = get_raw_task_dir(task)
+        self._lock = threading.Lock()
+        self._used_file_names: set[str] = set()
+        self.rule_files: dict[str, str] = {}
+
+    def open(self, rule_name: str) -> RawOutputCapture:
+        with self._lock:
+            if self._test_type == TestType.EZDFS.value:
+                file_name = self._ezdfs_file_name
+            else:
+                file_name = _build_unique_rtd_rule_raw_file_name(
+                    sanitize_path_token(self._line_name),
+                    rule_name,
+                    self._used_file_names,
+                )
+            self.rule_files[rule_name] = file_name
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / "index.json").write_text(
+                json.dumps(
+                    {"task_id": self._task_id, "line_name": self._line_name, "rule_files": self.rule_files},
+                    ensure_ascii=True,
+                    indent=2,
+                ),
+                encoding="utf-8",
+            )
+        return RawOutputCapture(
+            self.directory / file_name,
+            int(settings.raw_output_max_bytes or 0),
+            int(settings.raw_output_tail_bytes or 0),
+        )
+
+
+def open_task_raw_capture(task: TestTask) -> TaskRawCapture | None:
+    """Capture for a TEST hook, or None when `raw_output_stream_enabled` is off."""
+    if not settings.raw_output_stream_enabled:
+        return None
+    return TaskRawCapture(task)
+
+
+def load_captured_rule_files(task: TestTask) -> dict[str, str]:
+    """`{rule_name: file name}` streamed so far, e.g. to keep partial output of a canceled task."""
+    try:
+        index_payload = json.loads((get_raw_task_dir(task) / "index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    rule_files = index_payload.get("rule_files") if isinstance(index_payload, dict) else None
+    if not isinstance(rule_files, dict):
+        return {}
+    return {str(rule_name): str(file_name) for rule_name, file_name in rule_files.items() if file_name}
+
+
+def discard_task_raw_capture(task: TestTask) -> None:
+    """Remove partial files of a task that failed before its raw result was saved."""
+    if task.raw_result_path:
+        return
+    shutil.rmtree(get_raw_task_dir(task), ignore_errors=True)
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+"""
+Content-addressed cache for remote rule / macro source files.
+
+Rule and macro bodies are read repeatedly (macro compare, sub rule walk,
+COPY closure, SVN upload) although they rarely change. `read_remote_files()`
+validates every requested path with one batched stat round trip and only
+transfers files whose `(size, mtime, inode)` stamp is not cached yet, all
+through the same SSH client. The remote stat / read helpers live in
+`utils/ssh_helpers`; symlinked sources are stamped by their target.
+
+- Stamps are keyed by `(host_name, login_user, path)` and point at a
+  sha256 digest; identical content copied to another line shares one blob.
+- Blobs are kept in LRU order within `remote_source_cache_max_bytes`.
+- Text readers decode the cached bytes, so text and byte readers of the
+  same file share one entry.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.core.config import get_settings
+from app.core.exceptions import CatalogError
+from app.models.entities import HostConfig
+from app.services.ssh_runtime import open_limited_ssh_client
+from app.utils.ssh_helpers import read_remote_files_over_sftp, stat_remote_files
+
+settings = get_settings()
+
+_STAT_TIMEOUT_SECONDS = 10
+
+StampKey = tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class _FileStamp:
+    size: int
+    mtime: str
+    inode: str
+
+
+class RemoteSourceCache:
+    """LRU blob store addressed by content digest, indexed by file stamp."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stamps: dict[StampKey, tuple[_FileStamp, str]] = {}
+        self._blobs: OrderedDict[str, bytes] = OrderedDict()
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def lookup(self, key: StampKey, stamp: _FileStamp) -> bytes | None:
+        with self._lock:
+            entry = self._stamps.get(key)
+            blob = self._blobs.get(entry[1]) if entry is not None and entry[0] == stamp else None
+            if blob is None:
+                self._misses += 1
+                return None
+            self._blobs.move_to_end(entry[1])
+            self._hits += 1
+            return blob
+
+    def store(self, key: StampKey, stamp: _FileStamp, data: bytes) -> None:
+        max_bytes = max(0, int(settings.remote_source_cache_max_bytes or 0))
+        if len(data) > max_bytes:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._blobs:
+                self._blobs.move_to_end(digest)
+            else:
+                self._blobs[digest] = data
+                self._total_bytes += len(data)
+            self._stamps[key] = (stamp, digest)
+            while self._total_bytes > max_bytes and self._blobs:
+                _, evicted = self._blobs.popitem(last=False)
+                self._total_bytes -= len(evicted)
+                self._evictions += 1
+            if len(self._stamps) > 4 * max(1, len(self._blobs)):
+                # Drop stamps whose blob was evicted so the index stays bounded.
+                self._stamps = {
+                    stamp_key: value for stamp_key, value in self._stamps.items() if value[1] in self._blobs
+                }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stamps.clear()
+            self._blobs.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": bool(settings.remote_source_cache_enabled),
+                "max_bytes": settings.remote_source_cache_max_bytes,
+                "cached_bytes": self._total_bytes,
+                "blobs": len(self._blobs),
+                "paths": len(self._stamps),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+_source_cache = RemoteSourceCache()
+
+
+def read_remote_files(
+    host: HostConfig,
+    login_user: str,
+    remote_paths: list[str],
+    skip_missing: bool = False,
+) -> dict[str, bytes]:
+    """
+    Read several remote files as bytes over one SSH client.
+
+    Raises CatalogError when a path does not exist or is not a regular file,
+    unless `skip_missing` is set, in which case such paths are left out.
+    SSH / SFTP failures propagate as SSHConnectionError / OSError so callers
+    keep their own error wrapping.
+    """
+    paths = list(dict.fromkeys(remote_paths))
+    if not paths:
+        return {}
+
+    with open_limited_ssh_client(host, login_user) as client:
+        if not settings.remote_source_cache_enabled and not skip_missing:
+            return read_remote_files_over_sftp(client, paths)
+
+        stamps = _stat_remote_files(client, paths)
+        missing = [path for path in paths if path not in stamps]
+        if missing and not skip_missing:
+            raise CatalogError(f"Remote file not found: {', '.join(missing)}")
+        paths = [path for path in paths if path in stamps]
+        if not settings.remote_source_cache_enabled:
+            return read_remote_files_over_sftp(client, paths)
+
+        result: dict[str, bytes] = {}
+        to_fetch: list[str] = []
+        for path in paths:
+            cached = _source_cache.lookup((host.name, login_user, path), stamps[path])
+            if cached is None:
+                to_fetch.append(path)
+            else:
+                result[path] = cached
+
+        for path, data in read_remote_files_over_sftp(client, to_fetch).items():
+            _source_cache.store((host.name, login_user, path), stamps[path], data)
+            result[path] = data
+
+    return {path: result[path] for path in paths}
+
+
+def read_changed_remote_files(
+    host: HostConfig,
+    login_user: str,
+    remote_paths: list[str],
+    known_stamps: dict[str, str],
+) -> dict[str, tuple[str, bytes | None]]:
+    """
+    Stat `remote_paths` in one round trip and read only files whose stamp
+    differs from `known_stamps` (`{path: stamp}` kept by the caller).
+
+    Returns `{path: (stamp, bytes or None when unchanged)}`; missing paths
+    are left out. Used by incremental indexers that persist stamps.
+    """
+    paths = list(dict.fromkeys(remote_paths))
+    if not paths:
+        return {}
+
+    with open_limited_ssh_client(host, login_user) as client:
+        stamps = _stat_remote_files(client, paths)
+        changed = [path for path in paths if path in stamps and known_stamps.get(path) != _format_stamp(stamps[path])]
+        contents: dict[str, bytes] = {}
+        to_fetch: list[str] = []
+        for path in changed:
+            cached = (
+                _source_cache.lookup((host.name, login_user, path), stamps[path])
+                if settings.remote_source_cache_enabled
+                else None
+            )
+            if cached is None:
+                to_fetch.append(path)
+            else:
+                contents[path] = cached
+        for path, data in read_remote_files_over_sftp(client, to_fetch).items():
+            if settings.remote_source_cache_enabled:
+                _source_cache.store((host.name, login_user, path), stamps[path], data)
+            contents[path] = data
+
+    return {
+        path: (_format_stamp(stamps[path]), contents.get(path))
+        for path in paths
+        if path in stamps
+    }
+
+
+def read_remote_file(host: HostConfig, login_user: str, remote_path: str) -> bytes:
+    return read_remote_files(host, login_user, [remote_path])[remote_path]
+
+
+def clear_remote_source_cache() -> None:
+    _source_cache.clear()
+
+
+def get_remote_source_cache_stats() -> dict[str, object]:
+    return _source_cache.stats()
+
+
+def _format_stamp(stamp: _FileStamp) -> str:
+    return f"{stamp.size}:{stamp.mtime}:{stamp.inode}"
+
+
+def _stat_remote_files(client: object, paths: list[str]) -> dict[str, _FileStamp]:
+    return {
+        path: _FileStamp(size=size, mtime=mtime, inode=inode)
+        for path, (size, mtime, inode) in stat_remote_files(client, paths, _STAT_TIMEOUT_SECONDS).items()
+    }
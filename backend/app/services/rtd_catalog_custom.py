@@ -7,19 +7,25 @@ Public API:
 1. get_rule_file_list()
    Dispatcher 디렉토리를 조회해 `{file_name, rule_name, version}` catalog row
    리스트를 1-step으로 반환한다.
-2. get_macro_file_list()
+2. get_macro_file_list() / get_macro_file_lists()
    선택한 rule report가 참조하는 전체 macro `.report` 이름 리스트를 반환한다.
+   (`get_macro_file_lists`는 여러 rule을 한 번의 원격 왕복으로 처리)
 3. get_version_from_filename()
    파일명에서 version 토큰만 추출하는 pure helper.
 4. read_rule_source_text() / read_rule_source_bytes()
    선택된 rule report 본문을 원격에서 문자열/바이트로 읽는다.
+5. scan_dependency_sources()
+   rule / macro report 의 참조 관계를 stat 기반으로 증분 스캔한다
+   (dependency index 갱신용).
 """
 
+import posixpath
 import re
 import shlex
 
 from app.core.exceptions import CatalogError, SSHConnectionError
 from app.models.entities import HostConfig
+from app.services.remote_source_cache import read_changed_remote_files, read_remote_file, read_remote_files
 from app.services.ssh_runtime import open_limited_ssh_client
 from app.utils.ssh_helpers import build_clean_bash_command
 
@@ -69,7 +75,29 @@ def get_macro_file_list(
     - list[str]: Unique dependent macro report names, first-seen order.
     """
     rule_text = read_rule_source_text(host, login_user, home_dir_path, rule_file_name)
-    return _extract_macro_list_from_text(rule_text)
+    return extract_macro_list_from_text(rule_text)
+
+
+def get_macro_file_lists(
+    host: HostConfig,
+    login_user: str,
+    home_dir_path: str,
+    rule_file_names: list[str],
+) -> dict[str, list[str]]:
+    """
+    Batched `get_macro_file_list()`: read every rule report in one remote
+    round trip (one stat + one SFTP session, served from the source cache)
+    and return `{rule_file_name: macro names}`.
+    """
+    paths = {f"{home_dir_path.rstrip('/')}/{file_name}": file_name for file_name in rule_file_names}
+    try:
+        contents = read_remote_files(host, login_user, list(paths))
+    except (SSHConnectionError, OSError) as exc:
+        raise CatalogError(f"SFTP byte read failed: {exc}") from exc
+    return {
+        paths[path]: extract_macro_list_from_text(data.decode("utf-8", errors="ignore"))
+        for path, data in contents.items()
+    }
 
 
 def get_version_from_filename(file_name: str) -> str:
@@ -91,43 +119,90 @@ def get_version_from_filename(file_name: str) -> str:
 def read_rule_source_text(
     host: HostConfig, login_user: str, home_dir_path: str, file_name: str
 ) -> str:
-    """Read one RTD `.report` file body as UTF-8 text over SSH."""
-    command = build_clean_bash_command(
-        f"cd {shlex.quote(home_dir_path)} && cat {shlex.quote(file_name)}"
-    )
-
-    try:
-        with open_limited_ssh_client(host, login_user) as client:
-            _, stdout, stderr = client.exec_command(command, timeout=10)
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode("utf-8", errors="ignore")
-            error_output = stderr.read().decode("utf-8", errors="ignore").strip()
-    except (SSHConnectionError, OSError) as exc:
-        raise CatalogError(f"SSH file read failed: {exc}") from exc
-
-    if exit_status != 0:
-        raise CatalogError(error_output or f"Failed to read remote file: {file_name}")
-
-    return output
+    """Read one RTD `.report` file body as UTF-8 text (served from the source cache)."""
+    return read_rule_source_bytes(host, login_user, home_dir_path, file_name).decode("utf-8", errors="ignore")
 
 
 def read_rule_source_bytes(
     host: HostConfig, login_user: str, home_dir_path: str, file_name: str
 ) -> bytes:
-    """Read one RTD `.report` file as raw bytes via SFTP."""
+    """Read one RTD `.report` file as raw bytes via SFTP (cached by size/mtime)."""
     remote_path = f"{home_dir_path.rstrip('/')}/{file_name}"
     try:
-        with open_limited_ssh_client(host, login_user) as client:
-            sftp = client.open_sftp()
-            try:
-                with sftp.open(remote_path, "rb") as remote_file:
-                    return remote_file.read()
-            finally:
-                sftp.close()
+        return read_remote_file(host, login_user, remote_path)
     except (SSHConnectionError, OSError) as exc:
         raise CatalogError(f"SFTP byte read failed: {exc}") from exc
 
 
+def scan_dependency_sources(
+    host: HostConfig,
+    login_user: str,
+    home_dir_path: str,
+    rule_file_names: list[str],
+    known_stamps: dict[tuple[str, str], str],
+    unresolved_macro_names: list[str] | None = None,
+) -> list[dict[str, object]]:
+    """
+    Incrementally scan rule reports and the macro reports they reach, for
+    the persistent dependency index.
+
+    Input:
+    - rule_file_names: Dispatcher `.report` file names from the catalog.
+    - known_stamps: `{(kind, file_name): stamp}` already stored in the index
+      (kind = `"rule"` | `"macro"`).
+    - unresolved_macro_names: macros referenced in the index but not found
+      by earlier scans; looked up again in the first level.
+
+    Returns:
+    - list[dict]: one row per existing file with
+      - kind / file_name / stamp
+      - references: macro names parsed with `extract_macro_list_from_text`,
+        or None when the stamp is unchanged and the file was not re-read
+
+    Macro files live in the sibling Macro directory and are discovered
+    breadth-first from newly read references; already indexed macros are
+    re-stamped on every scan. Each level costs one stat round trip plus the
+    reads of changed files only.
+    """
+    rows: list[dict[str, object]] = []
+    scanned: set[tuple[str, str]] = set()
+    frontier = [("rule", file_name) for file_name in rule_file_names]
+    frontier += [key for key in known_stamps if key[0] == "macro"]
+    frontier += [
+        ("macro", name) for name in dict.fromkeys(unresolved_macro_names or []) if ("macro", name) not in known_stamps
+    ]
+
+    while frontier:
+        scanned.update(frontier)
+        paths = {_dependency_source_path(home_dir_path, kind, name): (kind, name) for kind, name in frontier}
+        try:
+            result = read_changed_remote_files(
+                host,
+                login_user,
+                list(paths),
+                {path: known_stamps[key] for path, key in paths.items() if key in known_stamps},
+            )
+        except (SSHConnectionError, OSError) as exc:
+            raise CatalogError(f"SSH dependency scan failed: {exc}") from exc
+
+        next_frontier: list[tuple[str, str]] = []
+        for path, (stamp, data) in result.items():
+            kind, file_name = paths[path]
+            references = (
+                None
+                if data is None
+                else extract_macro_list_from_text(data.decode("utf-8", errors="ignore"))
+            )
+            rows.append({"kind": kind, "file_name": file_name, "stamp": stamp, "references": references})
+            for macro_name in references or []:
+                key = ("macro", macro_name)
+                if key not in scanned and key not in next_frontier:
+                    next_frontier.append(key)
+        frontier = next_frontier
+
+    return rows
+
+
 def _fetch_rule_source_file_names(
     host: HostConfig, login_user: str, home_dir_path: str
 ) -> list[str]:
@@ -180,7 +255,7 @@ def _parse_rule_catalog_entries(file_names: list[str]) -> list[dict[str, str]]:
     )
 
 
-def _extract_macro_list_from_text(rule_text: str) -> list[str]:
+def extract_macro_list_from_text(rule_text: str) -> list[str]:
     """
     Parse dependent Macro `.report` names from one rule report text.
 
@@ -209,3 +284,10 @@ def _extract_macro_list_from_text(rule_text: str) -> list[str]:
         seen.add(item)
         result.append(item)
     return result
+
+
+def _dependency_source_path(home_dir_path: str, kind: str, file_name: str) -> str:
+    """Remote path of one rule (Dispatcher) or macro (sibling Macro dir) report."""
+    if kind == "macro":
+        return posixpath.join(posixpath.normpath(posixpath.join(home_dir_path, "..", "Macro")), file_name)
+    return f"{home_dir_path.rstrip('/')}/{file_name}"
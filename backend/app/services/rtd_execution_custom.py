@@ -8,22 +8,66 @@ RTD execution custom flow
 3. execute_copy_action()
    선택된 rule report와 macro report를 target line으로 복사한다.
 4. execute_compile_action()
-   macro report를 우선순위 역순으로 먼저 컴파일하고, 마지막에 rule report를 컴파일한다.
+   rule/macro 참조로 의존성 DAG를 만들고, 같은 위상 layer의 report들을
+   host 병렬 제한 안에서 동시에 컴파일한다. node별 소요 시간을 결과에 남긴다.
 5. execute_test_action()
-   선택된 rule들을 같은 line task 안에서 순서대로 테스트하고, rule별 raw section을 남긴다.
+   선택된 rule들을 같은 line task 안에서 테스트하고, rule별 raw section을 남긴다.
+   line 설정의 parallel_test_enabled가 켜져 있으면 host 병렬 제한 안에서 동시에 실행한다.
+   raw_output_stream_enabled이면 stdout을 메모리에 모으지 않고 rule별 raw txt로 바로 기록한다.
 """
 
+import json
+import logging
 import posixpath
 import shlex
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from typing import Any
 
 from sqlalchemy.orm import Session
 
-from app.core.exceptions import ConfigNotFoundError, RemoteCommandError, SSHConnectionError
+from app.core.config import get_settings
+from app.core.exceptions import ConfigNotFoundError, RemoteCommandError, SSHConnectionError, TaskCanceledError
 from app.models.entities import HostConfig, RtdConfig, TestTask
-from app.services.ssh_runtime import open_limited_ssh_client
+from app.services.catalog_service import get_indexed_macro_references
+from app.services.raw_capture import TaskRawCapture, open_task_raw_capture
+from app.services.rtd_catalog_custom import extract_macro_list_from_text
+from app.services.ssh_runtime import get_host_parallel_limit, open_limited_ssh_client
+from app.services.task_cancellation import CancelToken, get_cancel_token
 from app.utils.naming import normalize_target_line_name
-from app.utils.ssh_helpers import build_clean_bash_command, extract_session_payload, run_remote_command
+from app.utils.ssh_helpers import (
+    build_clean_bash_command,
+    collect_remote_command,
+    extract_session_payload,
+    run_remote_command,
+    stream_remote_command,
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Streamed tests fail only after this long without any output.
+_TEST_IDLE_TIMEOUT_SECONDS = 1200
+
+
+@dataclass
+class _CopyGroup:
+    """One source→target directory pair and the file names copied between them."""
+
+    label: str
+    source_dir: str
+    target_dir: str
+    file_names: list[str]
+
+
+@dataclass
+class _CompileNode:
+    """One `atm_compiler` invocation and the nodes that must compile before it."""
+
+    name: str
+    kind: str
+    depends_on: set[str] = field(default_factory=set)
 
 
 def execute_copy_action(db: Session, task: TestTask, payload: dict[str, Any]) -> dict[str, str]:
@@ -46,6 +90,8 @@ def execute_copy_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
     - finds selected rule file names from the cached catalog
     - collects selected macro file names
     - copies Dispatcher files and Macro files with remote `cp`
+    - in batched mode (`rtd_copy_batch_enabled`), validates and copies every
+      rule and macro file in one generated remote script
     - returns copied counts and copied item names
 
     Current path convention:
@@ -68,10 +114,29 @@ def execute_copy_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
     if not rule_file_names:
         raise ValueError("No rule files resolved for copy action")
 
-    copied_rule_count = 0
-    copied_macro_count = 0
-
-    if rule_file_names:
+    if settings.rtd_copy_batch_enabled:
+        copied_counts = _copy_file_groups_in_one_script(
+            source_host=source_host,
+            source_login_user=source_config.login_user,
+            target_host=target_host,
+            copy_groups=[
+                _CopyGroup(
+                    label="rules",
+                    source_dir=source_config.home_dir_path,
+                    target_dir=target_config.home_dir_path,
+                    file_names=rule_file_names,
+                ),
+                _CopyGroup(
+                    label="macros",
+                    source_dir=_macro_dir_from_home(source_config.home_dir_path),
+                    target_dir=_macro_dir_from_home(target_config.home_dir_path),
+                    file_names=macro_file_names,
+                ),
+            ],
+        )
+        copied_rule_count = copied_counts.get("rules", 0)
+        copied_macro_count = copied_counts.get("macros", 0)
+    else:
         copied_rule_count = _copy_files_between_hosts(
             source_host=source_host,
             source_login_user=source_config.login_user,
@@ -80,8 +145,6 @@ def execute_copy_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
             target_dir=target_config.home_dir_path,
             file_names=rule_file_names,
         )
-
-    if macro_file_names:
         copied_macro_count = _copy_files_between_hosts(
             source_host=source_host,
             source_login_user=source_config.login_user,
@@ -138,7 +201,7 @@ def execute_sync_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
 
 def execute_compile_action(db: Session, task: TestTask, payload: dict[str, Any]) -> dict[str, str]:
     """
-    Compile selected macro reports first, then selected rule reports.
+    Compile selected macro reports and rule reports in dependency order.
 
     Input:
     - db: SQLAlchemy session used to resolve RTD config and host info.
@@ -149,12 +212,19 @@ def execute_compile_action(db: Session, task: TestTask, payload: dict[str, Any])
     - dict[str, str]:
       - message: Compile summary shown in the monitor overlay
       - raw_output: Joined remote command output for debugging/logging
+      - node_timings: one `layer kind name seconds` line per compiled report
+
+    The per-report timings are also kept in the stored task message
+    (`timings=name:seconds, ...`) and logged at INFO level.
 
     Behavior:
     - resolves one target line and host
     - gets selected rule names and selected macro names
-    - compiles macros first in reverse discovery order
-    - compiles selected rules last
+    - builds a dependency DAG (see `_build_compile_graph`):
+      rule -> macros in its closure, macro -> macros referenced by its body
+    - compiles the DAG layer by layer; reports inside one layer run
+      concurrently within the host SSH limit (`rtd_compile_parallel_enabled`)
+    - stops at the first failing layer and re-raises its first failure
     - concatenates remote outputs into both summary and raw_output
 
     Intended customization point:
@@ -167,32 +237,241 @@ def execute_compile_action(db: Session, task: TestTask, payload: dict[str, Any])
     if not rule_names:
         raise ValueError("selected_rule_targets is required for compile action")
 
+    macro_references = get_indexed_macro_references(db, config.line_name, macro_names) if macro_names else {}
+    nodes = _build_compile_graph(config, host, session_payload, rule_names, macro_names, macro_references)
+    layers = _topological_compile_layers(nodes)
+    parallelism = _resolve_compile_parallelism(config, host, max(len(layer) for layer in layers))
+
+    started_at = time.monotonic()
     outputs: list[str] = []
-    # Higher-priority macros are discovered earlier in the rule source,
-    # so compile starts from the lowest-priority end of that ordered list.
-    for macro_name in reversed(macro_names):
-        command = f"./atm_compiler {shlex.quote(macro_name)} {shlex.quote(config.line_name)}"
-        outputs.append(run_remote_command(host, config.login_user, config.home_dir_path, command))
-    for rule_name in rule_names:
-        command = f"./atm_compiler {shlex.quote(rule_name)} {shlex.quote(config.line_name)}"
-        outputs.append(run_remote_command(host, config.login_user, config.home_dir_path, command))
+    node_timings: list[tuple[int, str, str, float]] = []
+    for layer_index, layer in enumerate(layers):
+        layer_results = _compile_layer(config, host, layer, parallelism)
+        for node_name in layer:
+            output, seconds = layer_results[node_name]
+            outputs.append(output)
+            node_timings.append((layer_index, nodes[node_name].kind, node_name, seconds))
+            logger.info(
+                "Compile timing task=%s line=%s name=%s kind=%s layer=%s seconds=%.3f",
+                task.task_id,
+                config.line_name,
+                node_name,
+                nodes[node_name].kind,
+                layer_index,
+                seconds,
+            )
+    elapsed_seconds = time.monotonic() - started_at
 
     return {
         "message": (
             f"Compile completed\n"
             f"line={config.line_name}\n"
             f"rules={len(rule_names)}\n"
-            f"macros={len(macro_names)}"
+            f"macros={len(macro_names)}\n"
+            f"layers={len(layers)} elapsed={elapsed_seconds:.1f}s"
             f"{_format_compile_items_summary(rule_names)}"
+            f"{_format_compile_timings(node_timings)}"
             f"{_summarize_remote_outputs(outputs)}"
         ),
         "raw_output": "\n\n".join(outputs),
+        "node_timings": "\n".join(
+            f"{layer_index} {kind} {name} {seconds:.3f}" for layer_index, kind, name, seconds in node_timings
+        ),
     }
 
 
+def _build_compile_graph(
+    config: RtdConfig,
+    host: HostConfig,
+    session_payload: dict[str, Any],
+    rule_names: list[str],
+    macro_names: list[str],
+    macro_references: dict[str, list[str]] | None = None,
+) -> dict[str, _CompileNode]:
+    """
+    Build the COMPILE dependency DAG, keyed by report name in legacy order.
+
+    Legacy order is macros in reverse discovery order followed by rules, so
+    `_topological_compile_layers` can keep it as the tie-break inside a layer.
+
+    Edges:
+    - rule -> every macro in its `selected_macros.per_rule` closure
+      (all macros when the rule has no per-rule entry)
+    - macro -> macros named in its own body: `macro_references` from the
+      dependency index when it covers every macro, otherwise parsed with
+      `extract_macro_list_from_text` from the target Macro directory
+
+    When macro bodies cannot be read, macros fall back to a chain in legacy
+    order, which reproduces the previous sequential behavior for them.
+    """
+    macro_set = set(macro_names)
+    nodes: dict[str, _CompileNode] = {}
+    for macro_name in reversed(macro_names):
+        nodes[macro_name] = _CompileNode(name=macro_name, kind="macro")
+
+    if macro_references is None:
+        macro_bodies = _read_macro_bodies(config, host, macro_names)
+        if macro_bodies is not None:
+            macro_references = {
+                macro_name: extract_macro_list_from_text(body) for macro_name, body in macro_bodies.items()
+            }
+    if macro_references is None:
+        ordered_macros = list(reversed(macro_names))
+        for previous, current in zip(ordered_macros, ordered_macros[1:]):
+            nodes[current].depends_on.add(previous)
+    else:
+        for macro_name, references in macro_references.items():
+            nodes[macro_name].depends_on.update(
+                name for name in references if name in macro_set and name != macro_name
+            )
+
+    macros_by_rule = _collect_macro_names_by_rule(session_payload)
+    for rule_name in rule_names:
+        if rule_name in nodes:
+            # A rule and a macro sharing one report name compile once, as before.
+            continue
+        rule_macros = macros_by_rule.get(rule_name)
+        nodes[rule_name] = _CompileNode(
+            name=rule_name,
+            kind="rule",
+            depends_on=set(macro_names if rule_macros is None else rule_macros) & macro_set,
+        )
+    return nodes
+
+
+def _topological_compile_layers(nodes: dict[str, _CompileNode]) -> list[list[str]]:
+    """
+    Split the compile DAG into layers whose nodes depend only on earlier layers.
+
+    Nodes left over by a reference cycle are appended one per layer in legacy
+    order, so a cycle degrades to sequential compile instead of failing.
+    """
+    remaining = {name: set(node.depends_on) for name, node in nodes.items()}
+    layers: list[list[str]] = []
+    while remaining:
+        ready = [name for name in nodes if name in remaining and not remaining[name]]
+        if not ready:
+            layers.extend([name] for name in nodes if name in remaining)
+            break
+        layers.append(ready)
+        for name in ready:
+            del remaining[name]
+        for depends_on in remaining.values():
+            depends_on.difference_update(ready)
+    return layers
+
+
+def _resolve_compile_parallelism(config: RtdConfig, host: HostConfig, widest_layer: int) -> int:
+    """Return how many reports of one layer may compile at once (half the host limit)."""
+    if not settings.rtd_compile_parallel_enabled or widest_layer <= 1:
+        return 1
+    host_limit = max(1, get_host_parallel_limit(host, config.login_user))
+    return max(1, min(host_limit // 2, widest_layer))
+
+
+def _run_report_compile(config: RtdConfig, host: HostConfig, report_name: str) -> tuple[str, float]:
+    """Run `atm_compiler` for one report and return `(stdout, seconds)`."""
+    command = f"./atm_compiler {shlex.quote(report_name)} {shlex.quote(config.line_name)}"
+    started_at = time.monotonic()
+    output = run_remote_command(host, config.login_user, config.home_dir_path, command)
+    return output, time.monotonic() - started_at
+
+
+def _compile_layer(
+    config: RtdConfig,
+    host: HostConfig,
+    layer: list[str],
+    parallelism: int,
+) -> dict[str, tuple[str, float]]:
+    """
+    Compile every report of one DAG layer and return `(stdout, seconds)` per report.
+
+    Sequential when `parallelism` is 1 or the layer has one node. Otherwise the
+    first failure (in layer order) cancels reports that have not started and
+    is re-raised once the running ones finish.
+    """
+    if parallelism <= 1 or len(layer) <= 1:
+        return {name: _run_report_compile(config, host, name) for name in layer}
+
+    with ThreadPoolExecutor(
+        max_workers=min(parallelism, len(layer)),
+        thread_name_prefix=f"rtd-compile-{config.line_name}",
+    ) as executor:
+        futures = {name: executor.submit(_run_report_compile, config, host, name) for name in layer}
+        results: dict[str, tuple[str, float]] = {}
+        first_error: Exception | None = None
+        for name in layer:
+            future = futures[name]
+            if first_error is not None:
+                future.cancel()
+                continue
+            try:
+                results[name] = future.result()
+            except Exception as exc:  # noqa: BLE001
+                first_error = exc
+                for pending in futures.values():
+                    pending.cancel()
+
+    if first_error is not None:
+        raise first_error
+    return results
+
+
+def _read_macro_bodies(
+    config: RtdConfig,
+    host: HostConfig,
+    macro_names: list[str],
+) -> dict[str, str] | None:
+    """
+    Read every macro body from the target Macro directory in one SSH command.
+
+    Each body is preceded by a JSON marker line from `_batch_result_line`.
+    Returns None when the read fails, so the caller can fall back to the
+    legacy sequential order. Unreadable files come back as empty bodies.
+    """
+    if not macro_names:
+        return {}
+
+    macro_dir = _macro_dir_from_home(config.home_dir_path)
+    script_lines = [f"cd {shlex.quote(macro_dir)} || exit 1"]
+    for index, macro_name in enumerate(macro_names):
+        script_lines.append(_batch_result_line({"kind": "macro_body", "index": index}))
+        script_lines.append(f"cat -- {shlex.quote(macro_name)} 2>/dev/null")
+        script_lines.append("echo")
+    try:
+        output = _run_remote_shell_command(host, config.login_user, "\n".join(script_lines))
+    except RuntimeError:
+        return None
+
+    bodies: dict[str, list[str]] = {name: [] for name in macro_names}
+    current: str | None = None
+    for line in output.splitlines():
+        marker = _parse_macro_body_marker(line)
+        if marker is not None and 0 <= marker < len(macro_names):
+            current = macro_names[marker]
+            continue
+        if current is not None:
+            bodies[current].append(line)
+    return {name: "\n".join(lines) for name, lines in bodies.items()}
+
+
+def _parse_macro_body_marker(line: str) -> int | None:
+    """Return the macro index of a `_read_macro_bodies` marker line, else None."""
+    if not line.startswith("{"):
+        return None
+    try:
+        parsed = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict) or parsed.get("kind") != "macro_body":
+        return None
+    index = parsed.get("index")
+    return index if isinstance(index, int) else None
+
+
 def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) -> dict[str, str]:
     """
-    Execute RTD tests for the selected rules sequentially on one target line.
+    Execute RTD tests for the selected rules on one target line.
 
     Input:
     - db: SQLAlchemy session used to resolve RTD config and host info.
@@ -204,13 +483,19 @@ def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
       - message: Test summary shown in the monitor overlay
       - raw_output: Reserved aggregate raw text, kept for task-level logging
       - raw_outputs_by_rule: Per-rule raw text used for saved raw txt files
+      - raw_files_by_rule: Per-rule txt file names already streamed into the
+        raw result directory (replaces raw_outputs_by_rule when
+        `raw_output_stream_enabled`)
 
     Behavior:
     - resolves one target line and host
     - collects all selected rules from the payload
-    - runs `atm_testscript` once per rule in sequence
-    - returns per-rule raw output so file_service can save `line x rule` txt
-      files directly, without reparsing a large combined file later
+    - runs `atm_testscript` once per rule, in sequence by default, or
+      concurrently when the line has `parallel_test_enabled`
+      (see `_resolve_test_parallelism`)
+    - returns per-rule raw output in rule-name order either way, so
+      file_service can save `line x rule` txt files directly, without
+      reparsing a large combined file later
 
     Intended customization point:
     - command example: `atm_testscript {ReportName} {LineName}`
@@ -221,19 +506,139 @@ def execute_test_action(db: Session, task: TestTask, payload: dict[str, Any]) ->
     if not rule_names:
         raise ValueError("selected_rule_targets is required for test action")
 
-    outputs: list[str] = []
-    output_by_rule: list[tuple[str, str]] = []
-    for rule_name in rule_names:
-        command = f"./atm_testscript {shlex.quote(rule_name)} {shlex.quote(config.line_name)}"
-        output = run_remote_command(host, config.login_user, config.home_dir_path, command)
-        outputs.append(output)
-        output_by_rule.append((rule_name, output))
-
-    return {
+    capture = open_task_raw_capture(task)
+    cancel_token = get_cancel_token(task.task_id)
+    parallelism = _resolve_test_parallelism(config, host, len(rule_names))
+    if parallelism > 1:
+        output_map = _run_rule_tests_in_parallel(config, host, rule_names, parallelism, capture, cancel_token)
+    else:
+        output_map = {
+            rule_name: _run_rule_test(config, host, rule_name, capture, cancel_token)
+            for rule_name in rule_names
+        }
+
+    output_by_rule = [(rule_name, output_map[rule_name]) for rule_name in rule_names]
+    outputs = [output for _, output in output_by_rule]
+
+    result = {
         "message": _format_test_summary_message(config.line_name, rule_names, outputs),
         "raw_output": _format_test_raw_output(config.line_name, output_by_rule),
-        "raw_outputs_by_rule": {rule_name: output for rule_name, output in output_by_rule},
     }
+    if capture is not None:
+        result["raw_files_by_rule"] = dict(capture.rule_files)
+    else:
+        result["raw_outputs_by_rule"] = {rule_name: output for rule_name, output in output_by_rule}
+    return result
+
+
+def _run_rule_test(
+    config: RtdConfig,
+    host: HostConfig,
+    rule_name: str,
+    capture: TaskRawCapture | None = None,
+    cancel_token: CancelToken | None = None,
+) -> str:
+    """
+    Run `atm_testscript` for one rule on one line.
+
+    Without a capture the whole stdout is returned. With one, stdout is
+    streamed into the rule's raw txt file and only its beginning is returned
+    for the monitor summary. Either way a canceled task kills the running
+    script.
+    """
+    if cancel_token is not None and cancel_token.is_canceled():
+        raise TaskCanceledError(f"Canceled before rule={rule_name}")
+    command = f"./atm_testscript {shlex.quote(rule_name)} {shlex.quote(config.line_name)}"
+    remote_command = build_clean_bash_command(f"cd {shlex.quote(config.home_dir_path)} && {command}")
+    should_cancel = cancel_token.is_canceled if cancel_token is not None else None
+    if capture is None:
+        exit_status, output_text, error_output = collect_remote_command(
+            host,
+            config.login_user,
+            remote_command,
+            timeout=_TEST_IDLE_TIMEOUT_SECONDS,
+            should_cancel=should_cancel,
+        )
+    else:
+        with capture.open(rule_name) as output:
+            exit_status = stream_remote_command(
+                host,
+                config.login_user,
+                remote_command,
+                output.write,
+                output.write_stderr,
+                timeout=_TEST_IDLE_TIMEOUT_SECONDS,
+                should_cancel=should_cancel,
+            )
+        output_text = output.head_text()
+        error_output = output.stderr_text()
+    if exit_status != 0:
+        raise RemoteCommandError(
+            error_output or f"Remote command failed with exit status {exit_status}",
+            host=host.name,
+            exit_status=exit_status,
+        )
+    return output_text
+
+
+def _resolve_test_parallelism(config: RtdConfig, host: HostConfig, rule_count: int) -> int:
+    """
+    Decide how many rules of one TEST task may run at the same time.
+
+    Sequential (1) unless the line opted in with `parallel_test_enabled`.
+    An explicit `parallel_test_limit` is capped at the host's SSH parallel
+    limit; `0` means half of that limit, leaving slots for other users'
+    catalog / copy commands on the same host.
+    """
+    if not config.parallel_test_enabled or rule_count <= 1:
+        return 1
+
+    host_limit = max(1, get_host_parallel_limit(host, config.login_user))
+    configured_limit = int(config.parallel_test_limit or 0)
+    limit = min(configured_limit, host_limit) if configured_limit > 0 else max(1, host_limit // 2)
+    return max(1, min(limit, rule_count))
+
+
+def _run_rule_tests_in_parallel(
+    config: RtdConfig,
+    host: HostConfig,
+    rule_names: list[str],
+    parallelism: int,
+    capture: TaskRawCapture | None = None,
+    cancel_token: CancelToken | None = None,
+) -> dict[str, str]:
+    """
+    Run `atm_testscript` for several rules concurrently.
+
+    Each rule goes through `_run_rule_test` (`stream_remote_command` with a
+    raw capture, `collect_remote_command` without), so the per-host SSH
+    semaphore keeps bounding concurrency across tasks. The first failure of
+    any rule cancels the rules that have not started yet; once the running
+    ones finish, the failure of the earliest rule (by rule-name order) is
+    raised, like the sequential path.
+    """
+    with ThreadPoolExecutor(
+        max_workers=parallelism,
+        thread_name_prefix=f"rtd-test-{config.line_name}",
+    ) as executor:
+        futures = {
+            rule_name: executor.submit(_run_rule_test, config, host, rule_name, capture, cancel_token)
+            for rule_name in rule_names
+        }
+        _, not_done = wait(futures.values(), return_when=FIRST_EXCEPTION)
+        for pending in not_done:
+            pending.cancel()
+
+    outputs: dict[str, str] = {}
+    for rule_name in rule_names:
+        future = futures[rule_name]
+        if future.cancelled():
+            continue
+        error = future.exception()
+        if error is not None:
+            raise error
+        outputs[rule_name] = future.result()
+    return outputs
 
 
 def _macro_dir_from_home(home_dir_path: str) -> str:
@@ -328,6 +733,34 @@ def _collect_macro_file_names_from_payload(session_payload: dict[str, Any]) -> l
     return result
 
 
+def _collect_macro_names_by_rule(session_payload: dict[str, Any]) -> dict[str, list[str]]:
+    """
+    Map each rule name to its old/new macro union from `selected_macros.per_rule`.
+
+    Rules without a per-rule entry are absent, so callers can tell "no macros"
+    from "unknown".
+    """
+    selected_macros = session_payload.get("selected_macros")
+    per_rule = selected_macros.get("per_rule") if isinstance(selected_macros, dict) else None
+    result: dict[str, list[str]] = {}
+    if not isinstance(per_rule, list):
+        return result
+
+    for entry in per_rule:
+        if not isinstance(entry, dict):
+            continue
+        rule_name = str(entry.get("rule_name") or "").strip()
+        if not rule_name:
+            continue
+        names = result.setdefault(rule_name, [])
+        for key in ("old_macros", "new_macros"):
+            for name in entry.get(key, []) or []:
+                normalized = str(name or "").strip()
+                if normalized and normalized != "error" and normalized not in names:
+                    names.append(normalized)
+    return result
+
+
 def _collect_selected_rule_names(session_payload: dict[str, Any]) -> list[str]:
     """Return unique selected rule names sorted by rule name."""
     seen: set[str] = set()
@@ -394,6 +827,129 @@ def _copy_files_between_hosts(
     return copied_count
 
 
+def _copy_file_groups_in_one_script(
+    source_host: HostConfig,
+    source_login_user: str,
+    target_host: HostConfig,
+    copy_groups: list[_CopyGroup],
+) -> dict[str, int]:
+    """
+    Validate and copy every file of every group in a single remote round trip.
+
+    The generated script checks all directories, then all source files, and
+    only copies when every check passed. It prints one JSON line per checked
+    directory / file, referring to items by index so file names never need
+    shell-side escaping.
+
+    Returns:
+    - dict[str, int]: copied file count per `_CopyGroup.label`.
+
+    Raises RuntimeError listing every failed item with the same wording the
+    per-file copy path uses.
+    """
+    groups = [group for group in copy_groups if group.file_names]
+    if not groups:
+        return {}
+
+    _assert_cp_supported_between_hosts(source_host, target_host)
+
+    script_lines = ["failed=0"]
+    directory_checks: list[tuple[str, str]] = []
+    for group in groups:
+        for label, directory in (("source", group.source_dir), ("target", group.target_dir)):
+            normalized = posixpath.normpath(directory)
+            if (label, normalized) in directory_checks:
+                continue
+            index = len(directory_checks)
+            directory_checks.append((label, normalized))
+            script_lines.append(
+                f"if ! test -d {shlex.quote(normalized)}; then "
+                f"{_batch_result_line({'kind': 'dir', 'index': index, 'status': 'missing'})}; failed=1; fi"
+            )
+
+    file_items: list[tuple[str, str, str]] = []
+    for group in groups:
+        for file_name in group.file_names:
+            source_path = posixpath.normpath(posixpath.join(group.source_dir, file_name))
+            target_path = posixpath.normpath(
+                posixpath.join(group.target_dir, posixpath.basename(file_name))
+            )
+            file_items.append((group.label, source_path, target_path))
+
+    script_lines.append('if [ "$failed" = 0 ]; then')
+    for index, (_, source_path, _) in enumerate(file_items):
+        script_lines.append(
+            f"if ! test -f {shlex.quote(source_path)}; then "
+            f"{_batch_result_line({'kind': 'file', 'index': index, 'status': 'missing'})}; failed=1; fi"
+        )
+    script_lines.append("fi")
+
+    script_lines.append('if [ "$failed" = 0 ]; then')
+    for index, (_, source_path, target_path) in enumerate(file_items):
+        script_lines.append(
+            f"if cp -f -- {shlex.quote(source_path)} {shlex.quote(target_path)}; then "
+            f"{_batch_result_line({'kind': 'file', 'index': index, 'status': 'copied'})}; else "
+            f"{_batch_result_line({'kind': 'file', 'index': index, 'status': 'copy_failed'})}; fi"
+        )
+    script_lines.append("fi")
+
+    output = _run_remote_shell_command(
+        source_host,
+        source_login_user,
+        "\n".join(script_lines),
+        timeout=120 + len(file_items),
+    )
+
+    directory_failures: list[str] = []
+    missing_files: set[int] = set()
+    copied_files: set[int] = set()
+    for line in output.splitlines():
+        try:
+            result = json.loads(line)
+        except (json.JSONDecodeError, ValueError):
+            continue
+        if not isinstance(result, dict):
+            continue
+        index = result.get("index")
+        if not isinstance(index, int):
+            continue
+        if result.get("kind") == "dir" and 0 <= index < len(directory_checks):
+            label, directory = directory_checks[index]
+            directory_failures.append(
+                f"{label} directory not found or inaccessible on host={source_host.name}: {directory}"
+            )
+        elif result.get("kind") == "file" and 0 <= index < len(file_items):
+            status = result.get("status")
+            if status == "missing":
+                missing_files.add(index)
+            elif status == "copied":
+                copied_files.add(index)
+
+    failures = list(directory_failures)
+    if not directory_failures:
+        for index, (_, source_path, target_path) in enumerate(file_items):
+            if index in missing_files:
+                failures.append(
+                    f"source file not found or inaccessible on host={source_host.name}: {source_path}"
+                )
+            elif not missing_files and index not in copied_files:
+                failures.append(
+                    f"copy failed on host={source_host.name}: {source_path} -> {target_path}"
+                )
+    if failures:
+        raise RuntimeError("\n".join(failures))
+
+    copied_counts: dict[str, int] = {}
+    for label, _, _ in file_items:
+        copied_counts[label] = copied_counts.get(label, 0) + 1
+    return copied_counts
+
+
+def _batch_result_line(result: dict[str, object]) -> str:
+    """Return a shell `printf` statement that emits one JSON result line."""
+    return f"printf '%s\\n' {shlex.quote(json.dumps(result, separators=(',', ':')))}"
+
+
 def _run_remote_shell_command(host: HostConfig, login_user: str, command: str, timeout: int = 120) -> str:
     """Run one raw shell command without changing directories and return stdout."""
     remote_command = build_clean_bash_command(command)
@@ -509,6 +1065,13 @@ def _format_copied_items_summary(rule_file_names: list[str], macro_file_names: l
     return "\n" + "\n".join(segments)
 
 
+def _format_compile_timings(node_timings: list[tuple[int, str, str, float]]) -> str:
+    """Append per-report compile seconds, in compile order, to the COMPILE summary."""
+    if not node_timings:
+        return ""
+    return "\n" + "timings=" + ", ".join(f"{name}:{seconds:.1f}s" for _, _, name, seconds in node_timings)
+
+
 def _format_compile_items_summary(rule_names: list[str]) -> str:
     """Append compiled rule names to the COMPILE/TEST monitor summary."""
     if not rule_names:
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+"""
+Materialized RTD monitor (`rtd_monitor_entries`).
+
+One row per (target line, rule key, action group) holds the task the
+monitor shows for that cell: the newest RUNNING task, else the newest
+PENDING one (`active_task_id`), and the newest finished task
+(`latest_finished_task_id`). Rule key `"__ALL__"` covers every task of the
+target; other keys only tasks listing that rule in `test_task_rules`.
+
+- `sync_rtd_monitor()` recomputes the cells a task belongs to. Callers run it
+  after changing the task status and before `commit()`, so the recompute
+  happens under the same SQLite write lock as the transition and concurrent
+  workers cannot overwrite a newer result with an older one.
+- `get_rtd_monitor_cells()` is the read side used by `/api/rtd/monitor`.
+- `backfill_rtd_monitor()` fills an empty table once from existing tasks.
+"""
+
+from sqlalchemy import case, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.entities import RtdMonitorEntry, TestTask, TestTaskRule
+from app.utils.enums import ActionType, TaskStatus, TestType
+
+ALL_RULES_KEY = "__ALL__"
+
+ACTION_GROUPS: dict[str, tuple[str, ...]] = {
+    ActionType.COPY.value: (ActionType.COPY.value,),
+    ActionType.SYNC.value: (ActionType.SYNC.value,),
+    ActionType.COMPILE.value: (ActionType.COMPILE.value,),
+    ActionType.TEST.value: (ActionType.TEST.value, ActionType.RETEST.value),
+}
+_GROUP_BY_ACTION = {action: group for group, actions in ACTION_GROUPS.items() for action in actions}
+_ACTIVE_STATUSES = (TaskStatus.RUNNING.value, TaskStatus.PENDING.value)
+
+MonitorKey = tuple[str, str, str]
+
+
+def rtd_monitor_keys(tasks: list[TestTask]) -> set[MonitorKey]:
+    """(target_name, rule_key, action_group) cells the given tasks are shown in."""
+    keys: set[MonitorKey] = set()
+    for task in tasks:
+        group = _GROUP_BY_ACTION.get(task.action_type)
+        if task.test_type != TestType.RTD.value or group is None:
+            continue
+        keys.add((task.target_name, ALL_RULES_KEY, group))
+        keys.update((task.target_name, rule.rule_name, group) for rule in task.rules)
+    return keys
+
+
+def rtd_monitor_keys_for_task_ids(db: Session, task_ids: list[str]) -> set[MonitorKey]:
+    """Same as `rtd_monitor_keys()` from plain columns, for set-based deletes."""
+    if not task_ids:
+        return set()
+    return _collect_keys(db, TestTask.task_id.in_(task_ids))
+
+
+def sync_rtd_monitor(db: Session, tasks: list[TestTask]) -> None:
+    """Recompute the monitor cells of `tasks` inside the caller's transaction."""
+    refresh_rtd_monitor_keys(db, rtd_monitor_keys(tasks))
+
+
+def refresh_rtd_monitor_keys(db: Session, keys: set[MonitorKey]) -> None:
+    if not keys:
+        return
+    db.flush()
+    existing = {
+        (entry.target_name, entry.rule_key, entry.action_group): entry
+        for entry in db.query(RtdMonitorEntry)
+        .filter(tuple_(RtdMonitorEntry.target_name, RtdMonitorEntry.rule_key, RtdMonitorEntry.action_group).in_(list(keys)))
+        .all()
+    }
+    for key in sorted(keys):
+        active_task_id, latest_finished_task_id = _compute_cell(db, *key)
+        entry = existing.get(key)
+        if entry is None:
+            if active_task_id is None and latest_finished_task_id is None:
+                continue
+            target_name, rule_key, action_group = key
+            entry = RtdMonitorEntry(target_name=target_name, rule_key=rule_key, action_group=action_group)
+        elif active_task_id is None and latest_finished_task_id is None:
+            db.delete(entry)
+            continue
+        entry.active_task_id = active_task_id
+        entry.latest_finished_task_id = latest_finished_task_id
+        db.add(entry)
+    db.flush()
+
+
+def get_rtd_monitor_cells(
+    db: Session,
+    rule_key_by_target: dict[str, str],
+) -> dict[str, dict[str, tuple[TestTask | None, TestTask | None]]]:
+    """
+    `{target_name: {action_group: (active_task, latest_finished_task)}}` for
+    the requested (target, rule key) pairs; empty cells are left out.
+    """
+    pairs = list(rule_key_by_target.items())
+    if not pairs:
+        return {}
+    entries = (
+        db.query(RtdMonitorEntry)
+        .filter(tuple_(RtdMonitorEntry.target_name, RtdMonitorEntry.rule_key).in_(pairs))
+        .all()
+    )
+    task_ids = {
+        task_id
+        for entry in entries
+        for task_id in (entry.active_task_id, entry.latest_finished_task_id)
+        if task_id
+    }
+    tasks_by_id = (
+        {task.task_id: task for task in db.query(TestTask).filter(TestTask.task_id.in_(task_ids)).all()}
+        if task_ids
+        else {}
+    )
+
+    cells: dict[str, dict[str, tuple[TestTask | None, TestTask | None]]] = {}
+    for entry in entries:
+        cells.setdefault(entry.target_name, {})[entry.action_group] = (
+            tasks_by_id.get(entry.active_task_id or ""),
+            tasks_by_id.get(entry.latest_finished_task_id or ""),
+        )
+    return cells
+
+
+def backfill_rtd_monitor(db: Session) -> int:
+    """모니터 테이블이 비어 있고 RTD task가 있을 때만 1회 전체 계산한다."""
+    if db.query(RtdMonitorEntry.id).first() is not None:
+        return 0
+
+    keys = _collect_keys(db)
+    refresh_rtd_monitor_keys(db, keys)
+    db.commit()
+    return len(keys)
+
+
+def _collect_keys(db: Session, *conditions) -> set[MonitorKey]:
+    filters = (
+        TestTask.test_type == TestType.RTD.value,
+        TestTask.action_type.in_(list(_GROUP_BY_ACTION)),
+        *conditions,
+    )
+    keys: set[MonitorKey] = set()
+    for target_name, action_type in db.execute(
+        select(TestTask.target_name, TestTask.action_type).where(*filters).distinct()
+    ):
+        keys.add((target_name, ALL_RULES_KEY, _GROUP_BY_ACTION[action_type]))
+    for target_name, rule_name, action_type in db.execute(
+        select(TestTask.target_name, TestTaskRule.rule_name, TestTask.action_type)
+        .join(TestTaskRule, TestTaskRule.task_id == TestTask.task_id)
+        .where(*filters)
+        .distinct()
+    ):
+        keys.add((target_name, rule_name, _GROUP_BY_ACTION[action_type]))
+    return keys
+
+
+def _compute_cell(db: Session, target_name: str, rule_key: str, action_group: str) -> tuple[str | None, str | None]:
+    base = select(TestTask.task_id).where(
+        TestTask.test_type == TestType.RTD.value,
+        TestTask.target_name == target_name,
+        TestTask.action_type.in_(ACTION_GROUPS[action_group]),
+    )
+    if rule_key != ALL_RULES_KEY:
+        base = base.where(TestTask.rules.any(TestTaskRule.rule_name == rule_key))
+
+    active_task_id = db.scalar(
+        base.where(TestTask.status.in_(_ACTIVE_STATUSES))
+        .order_by(
+            case((TestTask.status == TaskStatus.RUNNING.value, 0), else_=1),
+            TestTask.requested_at.desc(),
+            TestTask.id.desc(),
+        )
+        .limit(1)
+    )
+    latest_finished_task_id = db.scalar(
+        base.where(TestTask.status.notin_(_ACTIVE_STATUSES))
+        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
+        .limit(1)
+    )
+    return active_task_id, latest_finished_task_id
@@ -2,7 +2,9 @@ from __future__ import annotations
 
 import re
 import threading
+import time
 from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from typing import Iterator
@@ -26,20 +28,246 @@ _host_semaphore_cache: dict[str, threading.BoundedSemaphore] = {}
 _cache_lock = threading.Lock()
 
 
+@dataclass
+class _PooledConnection:
+    client: object
+    last_used_at: float
+    generation: tuple[int, int] = (0, 0)
+
+
+@dataclass
+class _PoolCounters:
+    hits: int = 0
+    misses: int = 0
+    handshakes: int = 0
+    handshake_seconds: float = 0.0
+    evictions: int = 0
+
+
+class SSHConnectionPool:
+    """
+    Keep authenticated SSH transports alive per ``(host_name, login_user)``.
+
+    A checked-out client is used by exactly one caller at a time; every
+    ``exec_command`` / ``open_sftp`` opens a fresh channel on the shared
+    transport, so the expensive connect + password auth only happens on a
+    pool miss. The per-host ``BoundedSemaphore`` still bounds how many
+    clients are checked out concurrently; idle clients do not hold a slot.
+
+    ``close_host`` / ``close_all`` bump a generation number; a client checked
+    out before the bump (old address or credentials) is closed on release
+    instead of going back to the pool.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str], list[_PooledConnection]] = {}
+        self._counters: dict[str, _PoolCounters] = {}
+        self._host_generations: dict[str, int] = {}
+        self._global_generation = 0
+        # id(client) -> generation recorded at checkout
+        self._checked_out: dict[int, tuple[int, int]] = {}
+        self._reaper_started = False
+
+    def acquire(self, host: HostConfig, login_user: str) -> object:
+        key = (host.name, login_user)
+        self._ensure_reaper()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key) or []
+                pooled = idle.pop() if idle else None
+                generation = self._generation(host.name)
+            if pooled is None:
+                break
+            if pooled.generation != generation:
+                self._discard(host.name, pooled.client)
+                continue
+            if _is_client_alive(pooled.client) and not self._is_expired(pooled):
+                with self._lock:
+                    self._counter(host.name).hits += 1
+                    self._checked_out[id(pooled.client)] = generation
+                return pooled.client
+            self._discard(host.name, pooled.client, evicted=True)
+
+        started_at = time.perf_counter()
+        client = _open_raw_ssh_client(host, login_user)
+        elapsed = time.perf_counter() - started_at
+        _enable_keepalive(client)
+        with self._lock:
+            counters = self._counter(host.name)
+            counters.misses += 1
+            counters.handshakes += 1
+            counters.handshake_seconds += elapsed
+            self._checked_out[id(client)] = generation
+        return client
+
+    def release(self, host_name: str, login_user: str, client: object, reusable: bool = True) -> None:
+        with self._lock:
+            checkout_generation = self._checked_out.pop(id(client), None)
+            generation = self._generation(host_name)
+        if not reusable or not settings.ssh_pool_enabled or checkout_generation != generation:
+            self._discard(host_name, client)
+            return
+        if not _is_client_alive(client):
+            self._discard(host_name, client, evicted=True)
+            return
+
+        key = (host_name, login_user)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < max(1, int(settings.ssh_pool_max_idle_per_key or 0)):
+                idle.append(
+                    _PooledConnection(client=client, last_used_at=time.monotonic(), generation=generation)
+                )
+                return
+        self._discard(host_name, client)
+
+    def evict_idle(self) -> int:
+        """Close idle clients past the idle timeout or with a dead transport."""
+        expired: list[tuple[str, object]] = []
+        with self._lock:
+            for (host_name, login_user), idle in list(self._idle.items()):
+                kept: list[_PooledConnection] = []
+                for pooled in idle:
+                    if self._is_expired(pooled) or not _is_client_alive(pooled.client):
+                        expired.append((host_name, pooled.client))
+                    else:
+                        kept.append(pooled)
+                if kept:
+                    self._idle[(host_name, login_user)] = kept
+                else:
+                    self._idle.pop((host_name, login_user), None)
+        for host_name, client in expired:
+            self._discard(host_name, client, evicted=True)
+        return len(expired)
+
+    def close_host(self, host_name: str) -> int:
+        """
+        Drop every idle client for one host (e.g. after a credential change);
+        clients checked out right now are closed when they are released.
+        """
+        with self._lock:
+            self._host_generations[host_name] = self._host_generations.get(host_name, 0) + 1
+            keys = [key for key in self._idle if key[0] == host_name]
+            clients = [pooled.client for key in keys for pooled in self._idle.pop(key, [])]
+        for client in clients:
+            self._discard(host_name, client)
+        return len(clients)
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._global_generation += 1
+            items = [
+                (host_name, pooled.client)
+                for (host_name, _), idle in self._idle.items()
+                for pooled in idle
+            ]
+            self._idle.clear()
+        for host_name, client in items:
+            self._discard(host_name, client)
+
+    def stats(self, host_name: str) -> dict[str, object]:
+        with self._lock:
+            counters = self._counters.get(host_name, _PoolCounters())
+            idle_count = sum(len(idle) for key, idle in self._idle.items() if key[0] == host_name)
+            hits = counters.hits
+            misses = counters.misses
+            handshakes = counters.handshakes
+            handshake_seconds = counters.handshake_seconds
+            evictions = counters.evictions
+
+        avg_handshake_ms = (handshake_seconds / handshakes * 1000) if handshakes else 0.0
+        return {
+            "pool_enabled": bool(settings.ssh_pool_enabled),
+            "pool_idle_connections": idle_count,
+            "pool_hits": hits,
+            "pool_misses": misses,
+            "pool_evictions": evictions,
+            "handshake_count": handshakes,
+            "handshake_total_ms": round(handshake_seconds * 1000, 1),
+            "handshake_avg_ms": round(avg_handshake_ms, 1),
+            "handshake_saved_ms": round(avg_handshake_ms * hits, 1),
+        }
+
+    def _counter(self, host_name: str) -> _PoolCounters:
+        counters = self._counters.get(host_name)
+        if counters is None:
+            counters = _PoolCounters()
+            self._counters[host_name] = counters
+        return counters
+
+    def _generation(self, host_name: str) -> tuple[int, int]:
+        # Caller holds self._lock.
+        return (self._global_generation, self._host_generations.get(host_name, 0))
+
+    def _is_expired(self, pooled: _PooledConnection) -> bool:
+        idle_timeout = max(1, int(settings.ssh_pool_idle_timeout_seconds or 0))
+        return time.monotonic() - pooled.last_used_at > idle_timeout
+
+    def _discard(self, host_name: str, client: object, evicted: bool = False) -> None:
+        """Close a client; `evicted` counts it in `pool_evictions` (idle timeout / dead transport)."""
+        if evicted:
+            with self._lock:
+                self._counter(host_name).evictions += 1
+        try:
+            client.close()
+        except Exception:  # noqa: BLE001
+            pass
+
+    def _ensure_reaper(self) -> None:
+        with self._lock:
+            if self._reaper_started:
+                return
+            self._reaper_started = True
+
+        interval = max(5, int(settings.ssh_pool_idle_timeout_seconds or 0) // 2)
+
+        def _run() -> None:
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        thread = threading.Thread(target=_run, daemon=True, name="ssh-pool-reaper")
+        thread.start()
+
+
+_connection_pool = SSHConnectionPool()
+
+
 @contextmanager
 def open_limited_ssh_client(host: HostConfig, login_user: str) -> Iterator[object]:
     semaphore = _get_host_semaphore(host, login_user)
     semaphore.acquire()
     try:
-        client = _open_raw_ssh_client(host, login_user)
+        if not settings.ssh_pool_enabled:
+            client = _open_raw_ssh_client(host, login_user)
+            try:
+                yield client
+            finally:
+                client.close()
+            return
+
+        client = _connection_pool.acquire(host, login_user)
+        reusable = False
         try:
             yield client
+            reusable = True
         finally:
-            client.close()
+            # A client whose caller raised mid-command may have a half-read
+            # channel or a broken transport; never hand it to the next caller.
+            _connection_pool.release(host.name, login_user, client, reusable=reusable)
     finally:
         semaphore.release()
 
 
+def close_host_ssh_connections(host_name: str) -> int:
+    return _connection_pool.close_host(host_name)
+
+
+def close_all_ssh_connections() -> None:
+    _connection_pool.close_all()
+
+
 def get_host_parallel_limit(host: HostConfig, login_user: str) -> int:
     with _cache_lock:
         if host.name in _host_limit_cache:
@@ -61,6 +289,7 @@ def get_host_parallel_limit_info(host: HostConfig) -> dict[str, object]:
         "host_name": host.name,
         "parallel_limit": limit,
         "source": source,
+        **_connection_pool.stats(host.name),
     }
 
 
@@ -81,6 +310,7 @@ def probe_host_parallel_limit_info(host: HostConfig, login_user: str) -> dict[st
         "host_name": host.name,
         "parallel_limit": limit,
         "source": source,
+        **_connection_pool.stats(host.name),
     }
 
 
@@ -244,6 +474,18 @@ def _open_raw_ssh_client(host: HostConfig, login_user: str):
     return client
 
 
+def _is_client_alive(client: object) -> bool:
+    transport = client.get_transport() if hasattr(client, "get_transport") else None
+    return bool(transport is not None and transport.is_active())
+
+
+def _enable_keepalive(client: object) -> None:
+    transport = client.get_transport() if hasattr(client, "get_transport") else None
+    keepalive = int(settings.ssh_pool_keepalive_seconds or 0)
+    if transport is not None and keepalive > 0:
+        transport.set_keepalive(keepalive)
+
+
 def _append_admin_alert(message: str) -> None:
     log_dir = Path(settings.result_base_path).parent / "logs"
     log_dir.mkdir(parents=True, exist_ok=True)
@@ -21,6 +21,7 @@ from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.models.entities import EzdfsConfig, HostConfig, RtdConfig, User
+from app.services.catalog_cache import invalidate_ezdfs_catalog, invalidate_rtd_catalog
 from app.services.catalog_service import (
     find_ezdfs_rule_file_name_in_session,
     find_rule_file_name_in_session,
@@ -28,15 +29,13 @@ from app.services.catalog_service import (
 from app.services.ezdfs_catalog_custom import (
     read_rule_source_bytes as read_ezdfs_rule_source_bytes,
 )
-from app.services.rtd_catalog_custom import (
-    read_rule_source_bytes as read_rtd_rule_source_bytes,
-)
 from app.utils.ssh_helpers import build_clean_bash_command
 from app.services.session_service import (
     get_runtime_session_payload,
     upsert_runtime_session,
 )
-from app.services.ssh_runtime import open_direct_ssh_client, open_limited_ssh_client
+from app.services.remote_source_cache import read_remote_files
+from app.services.ssh_runtime import open_direct_ssh_client
 from app.utils.enums import TestType
 
 settings = get_settings()
@@ -102,7 +101,7 @@ def perform_rtd_svn_upload(
         raise ValueError("RTD host config not found")
 
     svn_host = _build_svn_upload_host()
-    file_contents: dict[str, str] = {}
+    remote_paths: dict[str, str] = {}
 
     for item in selected_rule_targets:
         rule_name = str(item.get("rule_name") or "").strip()
@@ -122,20 +121,14 @@ def perform_rtd_svn_upload(
                 f"RTD new version file not found in session cache: {rule_name} / {new_version}"
             )
 
-        file_contents[file_name] = read_rtd_rule_source_bytes(
-            host,
-            config.login_user,
-            config.home_dir_path,
-            file_name,
-        )
+        remote_paths[file_name] = f"{config.home_dir_path.rstrip('/')}/{file_name}"
 
+    macro_dir = _macro_dir_from_home(config.home_dir_path)
     for macro_file_name in _collect_new_macro_file_names_from_per_rule(macro_per_rule):
-        file_contents[macro_file_name] = _read_rtd_macro_source_bytes(
-            host,
-            config.login_user,
-            config.home_dir_path,
-            macro_file_name,
-        )
+        remote_paths[macro_file_name] = f"{macro_dir.rstrip('/')}/{macro_file_name}"
+
+    # rule / macro 파일을 한 번의 stat + SFTP 세션으로 읽는다 (변경 없는 파일은 source cache 재사용).
+    file_contents = _read_rtd_source_files(host, config.login_user, remote_paths)
 
     if not file_contents:
         raise ValueError("No RTD new version files found for SVN Upload")
@@ -148,6 +141,8 @@ def perform_rtd_svn_upload(
         ad_password,
         mode="4",
     )
+    # 체크인된 버전이 라인 디렉토리에 반영되므로 공유 카탈로그 캐시를 비운다.
+    invalidate_rtd_catalog(line_name)
     return _persist_svn_upload_result(
         db,
         current_user.user_id,
@@ -245,6 +240,7 @@ def perform_ezdfs_svn_upload(
         ad_password,
         mode="3",
     )
+    invalidate_ezdfs_catalog(module_name)
     return _persist_svn_upload_result(
         db,
         current_user.user_id,
@@ -469,23 +465,17 @@ def _collect_selected_sub_rule_names(selected_sub_rules: list[object]) -> list[s
     return result
 
 
-def _read_rtd_macro_source_bytes(
-    host: HostConfig, login_user: str, home_dir_path: str, file_name: str
-) -> bytes:
-    """Read one RTD macro/report file from the sibling Macro directory via SFTP."""
-    macro_dir = _macro_dir_from_home(home_dir_path)
-    remote_path = f"{macro_dir.rstrip('/')}/{file_name}"
-
+def _read_rtd_source_files(
+    host: HostConfig, login_user: str, remote_paths: dict[str, str]
+) -> dict[str, bytes]:
+    """Read RTD rule / macro files (`{file_name: remote_path}`) as bytes in one batch."""
+    if not remote_paths:
+        return {}
     try:
-        with open_limited_ssh_client(host, login_user) as client:
-            sftp = client.open_sftp()
-            try:
-                with sftp.open(remote_path, "rb") as remote_file:
-                    return remote_file.read()
-            finally:
-                sftp.close()
+        contents = read_remote_files(host, login_user, list(remote_paths.values()))
     except (OSError, RuntimeError) as exc:
-        raise RuntimeError(f"SFTP macro file byte read failed: {exc}") from exc
+        raise RuntimeError(f"SFTP source file byte read failed: {exc}") from exc
+    return {file_name: contents[remote_path] for file_name, remote_path in remote_paths.items()}
 
 
 def _macro_dir_from_home(home_dir_path: str) -> str:
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+"""
+In-process cancel tokens of running tasks.
+
+`task_worker.run_task()` registers a token while a task executes. A cancel
+request handled by the same process sets it at once; requests handled by
+another uvicorn worker are stored on the queue entry
+(`cancel_requested_at`) and reach the owner with its next lease heartbeat.
+
+Execution hooks pass `token.is_canceled` to `stream_remote_command()`, which
+kills the remote process group and raises `TaskCanceledError`.
+"""
+
+import threading
+
+
+class CancelToken:
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def is_canceled(self) -> bool:
+        return self._event.is_set()
+
+
+_lock = threading.Lock()
+_tokens: dict[str, CancelToken] = {}
+
+
+def register_task(task_id: str) -> CancelToken:
+    with _lock:
+        token = _tokens.setdefault(task_id, CancelToken())
+    return token
+
+
+def unregister_task(task_id: str) -> None:
+    with _lock:
+        _tokens.pop(task_id, None)
+
+
+def get_cancel_token(task_id: str) -> CancelToken | None:
+    with _lock:
+        return _tokens.get(task_id)
+
+
+def cancel_local_task(task_id: str) -> bool:
+    """Signal a task running in this process; False when it runs elsewhere (or not at all)."""
+    token = get_cancel_token(task_id)
+    if token is None:
+        return False
+    token.cancel()
+    return True
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+"""
+In-process task event broker.
+
+Task state transitions and queue position changes are published here once,
+from the worker / queue code, and fanned out to every SSE subscriber instead
+of each browser polling the status endpoints.
+
+Event kinds (`event` field of the SSE frame):
+- task:   full `serialize_task()` row, delivered to the task owner
+- queue:  `[{task_id, message}]` queue message deltas, delivered to the owner
+- target: `{test_type, target_name}` hint, broadcast so monitor pages that
+          show other users' tasks on the same line can refresh that line
+
+Each event gets a monotonically increasing id. A small ring buffer lets a
+reconnecting client resume with `Last-Event-ID`; when the gap is too old, or
+the id comes from before a backend restart, the client receives a `resync`
+event and reloads once. Publishing never blocks:
+slow subscribers drop their oldest events and are asked to resync.
+
+The broker is per process. With several uvicorn workers a client only sees
+events from the worker that ran the task, so the frontend keeps a slow
+polling fallback.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any
+
+_HISTORY_SIZE = 500
+_SUBSCRIBER_QUEUE_SIZE = 200
+
+
+@dataclass(frozen=True)
+class TaskEvent:
+    id: int
+    kind: str
+    data: dict[str, Any]
+    user_id: str | None = None
+
+    def to_sse(self) -> str:
+        payload = json.dumps(self.data, ensure_ascii=False, default=str, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {payload}\n\n"
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    user_id: str
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE))
+
+
+class TaskEventBroker:
+    """Thread-safe publisher → asyncio subscriber fan-out."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history: deque[TaskEvent] = deque(maxlen=_HISTORY_SIZE)
+        self._subscribers: set[_Subscriber] = set()
+
+    def publish(self, kind: str, data: dict[str, Any], user_id: str | None = None) -> None:
+        """Publish one event; `user_id=None` broadcasts to every subscriber."""
+        with self._lock:
+            event = TaskEvent(id=next(self._ids), kind=kind, data=data, user_id=user_id)
+            self._history.append(event)
+            targets = [
+                subscriber
+                for subscriber in self._subscribers
+                if user_id is None or subscriber.user_id == user_id
+            ]
+        for subscriber in targets:
+            try:
+                subscriber.loop.call_soon_threadsafe(_offer, subscriber.queue, event)
+            except RuntimeError:
+                # Event loop already closed; the subscriber is going away.
+                pass
+
+    def subscribe(self, user_id: str, last_event_id: int | None = None) -> tuple[_Subscriber, list[TaskEvent]]:
+        """
+        Register one subscriber on the running event loop.
+
+        Returns the subscriber and the events it missed since `last_event_id`
+        (a single `resync` event when the gap is no longer in history or the
+        id was issued by a previous process).
+        """
+        subscriber = _Subscriber(user_id=user_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+            backlog: list[TaskEvent] = []
+            if last_event_id is not None:
+                latest_id = self._history[-1].id if self._history else 0
+                oldest_id = self._history[0].id if self._history else 1
+                # Ids past the latest one come from a previous process (ids restart at 1).
+                if last_event_id > latest_id or last_event_id < oldest_id - 1:
+                    backlog = [_resync_event(latest_id)]
+                else:
+                    backlog = [
+                        event
+                        for event in self._history
+                        if event.id > last_event_id and (event.user_id is None or event.user_id == user_id)
+                    ]
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber: _Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def _offer(queue: asyncio.Queue, event: TaskEvent) -> None:
+    """Enqueue without blocking; on overflow drop backlog and ask for a resync."""
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_resync_event(event.id))
+
+
+def _resync_event(event_id: int) -> TaskEvent:
+    return TaskEvent(id=event_id, kind="resync", data={})
+
+
+task_event_broker = TaskEventBroker()
+
+
+def publish_task_event(task_payload: dict[str, Any], user_id: str) -> None:
+    """Publish a task row to its owner and a monitor hint for its target."""
+    task_event_broker.publish("task", task_payload, user_id=user_id)
+    task_event_broker.publish(
+        "target",
+        {"test_type": task_payload.get("test_type"), "target_name": task_payload.get("target_name")},
+    )
+
+
+def publish_queue_messages(items: list[dict[str, str]]) -> None:
+    """Publish queue message deltas grouped by task owner (`user_id` key)."""
+    by_user: dict[str, list[dict[str, str]]] = {}
+    for item in items:
+        by_user.setdefault(item["user_id"], []).append(
+            {"task_id": item["task_id"], "message": item["message"]}
+        )
+    for user_id, user_items in by_user.items():
+        task_event_broker.publish("queue", {"items": user_items}, user_id=user_id)
@@ -7,35 +7,43 @@ Task history aggregation + retention.
 태스크 카운트를 누적한다. Dashboard / MyPage 차트는 이 집계 테이블만
 조회하므로 원본 `TestTask` 행이 보존 정책에 의해 삭제되어도 차트는
 영향받지 않는다.
+
+증분은 `AggregateWriter`가 메모리에서 합산한 뒤
+`task_history_flush_interval_seconds` 주기와 종료 시점에 한 번의 upsert로
+기록한다.
 """
 
 import logging
+import queue
 import shutil
 import threading
 import time
+from collections import deque
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 
-from sqlalchemy import func
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
-from app.db.session import SessionLocal
-from app.models.entities import TaskHistoryDaily, TestTask
+from app.db.session import SessionLocal, engine
+from app.models.entities import TaskHistoryDaily, TestTask, TestTaskRule
+from app.services.rtd_monitor import refresh_rtd_monitor_keys, rtd_monitor_keys_for_task_ids
+from app.utils.enums import TaskStatus
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
-def record_task_requested(db: Session, task: TestTask) -> None:
-    """태스크 생성 시점에 일별 집계를 +1 한다."""
+def record_task_requested(task: TestTask) -> None:
+    """태스크 생성 시점에 일별 집계를 +1 한다 (buffered, see `AggregateWriter`)."""
     requested_at = task.requested_at or datetime.now(timezone.utc)
-    bump_aggregate(db, requested_at.date(), task.user_id, task.test_type, 1)
+    bump_aggregate(requested_at.date(), task.user_id, task.test_type, 1)
 
 
 def bump_aggregate(
-    db: Session,
     aggregate_date: date,
     user_id: str,
     test_type: str,
@@ -43,43 +51,103 @@ def bump_aggregate(
 ) -> None:
     if delta == 0:
         return
-    row = (
-        db.query(TaskHistoryDaily)
-        .filter(
-            TaskHistoryDaily.date == aggregate_date,
-            TaskHistoryDaily.user_id == user_id,
-            TaskHistoryDaily.test_type == test_type,
-        )
-        .first()
-    )
-    if row is None:
-        row = TaskHistoryDaily(
-            date=aggregate_date,
-            user_id=user_id,
-            test_type=test_type,
-            count=max(0, delta),
-        )
-        db.add(row)
-        try:
-            db.commit()
-            return
-        except IntegrityError:
-            # 동시성 경합 시: 기존 row 재조회 후 누적
-            db.rollback()
-            row = (
-                db.query(TaskHistoryDaily)
-                .filter(
-                    TaskHistoryDaily.date == aggregate_date,
-                    TaskHistoryDaily.user_id == user_id,
-                    TaskHistoryDaily.test_type == test_type,
-                )
-                .first()
+    _aggregate_writer.add((aggregate_date, user_id, test_type), delta)
+
+
+AggregateKey = tuple[date, str, str]
+
+
+class AggregateWriter:
+    """In-memory (date, user_id, test_type) 증분 버퍼.
+
+    Why: 요청 경로에서 태스크마다 SELECT + INSERT/UPDATE + commit 하던 것을
+    메모리에 합산해 두고, 주기적으로 / 종료 시 `INSERT ... ON CONFLICT DO
+    UPDATE` 한 번으로 누적한다. 누적(count + excluded.count) 방식이라 여러
+    uvicorn worker가 각자 flush 해도 값이 덮어써지지 않는다. flush 실패 시
+    증분은 버퍼로 되돌려 다음 flush에서 재시도한다.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[AggregateKey, int] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, key: AggregateKey, delta: int) -> None:
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + delta
+
+    def flush(self) -> int:
+        """Write buffered increments in one batch; returns the number of keys written."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            rows = [
+                {"date": key[0], "user_id": key[1], "test_type": key[2], "count": delta}
+                for key, delta in pending.items()
+                if delta
+            ]
+            if not rows:
+                return 0
+
+            statement = sqlite_insert(TaskHistoryDaily)
+            statement = statement.on_conflict_do_update(
+                index_elements=["date", "user_id", "test_type"],
+                set_={"count": func.max(0, TaskHistoryDaily.count + statement.excluded.count)},
             )
-            if row is None:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(statement, rows)
+            except Exception:
+                with self._lock:
+                    for key, delta in pending.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                raise
+            return len(rows)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
                 return
-    row.count = max(0, (row.count or 0) + delta)
-    db.add(row)
-    db.commit()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name="task-history-writer")
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write whatever is still buffered."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=max(1.0, settings.task_history_flush_interval_seconds * 2))
+        self.flush()
+
+    def _run(self) -> None:
+        interval = max(0.5, float(settings.task_history_flush_interval_seconds or 0))
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("task history flush failed: %s", exc)
+
+
+_aggregate_writer = AggregateWriter()
+
+
+def start_task_history_writer() -> None:
+    """애플리케이션 lifespan에서 호출. 주기 flush 스레드를 시작한다."""
+    _aggregate_writer.start()
+
+
+def stop_task_history_writer() -> None:
+    """Lifespan 종료 시 호출. 남은 증분을 flush 해 clean restart에서 유실이 없게 한다."""
+    _aggregate_writer.stop()
+
+
+def flush_task_history() -> int:
+    """Flush this process's buffered increments now (chart reads call it for read-your-writes)."""
+    return _aggregate_writer.flush()
 
 
 def backfill_from_test_tasks(db: Session) -> int:
@@ -123,77 +191,223 @@ def backfill_from_test_tasks(db: Session) -> int:
 # ─── Retention ────────────────────────────────────────────────────────────────
 
 
-def _delete_task_files(task: TestTask) -> None:
-    if not settings.task_retention_delete_files:
-        return
-    for path_str in (task.raw_result_path, task.summary_result_path):
-        if not path_str:
-            continue
+@dataclass
+class RetentionRun:
+    started_at: datetime
+    finished_at: datetime | None = None
+    deleted_by_age: int = 0
+    deleted_by_count: int = 0
+    chunks: int = 0
+    # write transaction 보유 시간 (DELETE ~ commit) 합계 / 최대 chunk
+    lock_seconds: float = 0.0
+    max_chunk_lock_seconds: float = 0.0
+    # 파일 삭제는 별도 queue에서 진행되므로 run 종료 후에도 증가할 수 있다.
+    files_deleted: int = 0
+    bytes_freed: int = 0
+    file_errors: int = 0
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "deleted_by_age": self.deleted_by_age,
+            "deleted_by_count": self.deleted_by_count,
+            "chunks": self.chunks,
+            "lock_seconds": round(self.lock_seconds, 4),
+            "max_chunk_lock_seconds": round(self.max_chunk_lock_seconds, 4),
+            "files_deleted": self.files_deleted,
+            "bytes_freed": self.bytes_freed,
+            "file_errors": self.file_errors,
+        }
+
+
+class FileDeletionQueue:
+    """Removes result files of swept tasks on a background thread, outside any DB transaction."""
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue[tuple[RetentionRun, str, list[str]]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, run: RetentionRun, task_id: str, paths: list[str]) -> None:
+        if not paths:
+            return
+        self._ensure_started()
+        self._queue.put((run, task_id, paths))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Wait until every submitted path is handled; False when `timeout` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="task-retention-files")
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            run, task_id, paths = self._queue.get()
+            try:
+                files, freed, errors = _delete_task_files(task_id, paths)
+                with _retention_lock:
+                    run.files_deleted += files
+                    run.bytes_freed += freed
+                    run.file_errors += errors
+            finally:
+                self._queue.task_done()
+
+
+def _delete_task_files(task_id: str, paths: list[str]) -> tuple[int, int, int]:
+    """Returns (files removed, bytes freed, errors)."""
+    files = freed = errors = 0
+    for path_str in paths:
         path = Path(path_str)
+        # raw 결과는 `<task_id>/` 디렉토리(_meta.txt, index.json, rule txt)째로 정리
+        if path.parent.name == task_id:
+            path = path.parent
         try:
             if path.is_dir():
+                for child in path.rglob("*"):
+                    if child.is_file():
+                        files += 1
+                        freed += child.stat().st_size
                 shutil.rmtree(path, ignore_errors=True)
             elif path.exists():
+                files += 1
+                freed += path.stat().st_size
                 path.unlink(missing_ok=True)
-            # raw 파일은 task_id 디렉토리 하위에 있으므로 디렉토리 정리
-            parent = path.parent
-            if parent.exists() and parent.name == task.task_id and not any(parent.iterdir()):
-                parent.rmdir()
         except OSError as exc:
+            errors += 1
             logger.warning("retention: failed to remove %s: %s", path, exc)
+    return files, freed, errors
+
+
+_retention_lock = threading.Lock()
+_retention_runs: deque[RetentionRun] = deque(maxlen=10)
+_file_deletion_queue = FileDeletionQueue()
 
 
 def sweep_retention(db: Session) -> dict[str, int]:
     """보존 정책에 따라 오래된/초과분 TestTask를 삭제한다.
 
     - 나이 초과: requested_at < now - retention_days
-    - 사용자별 최대 개수 초과: 오래된 순으로 삭제
+    - 사용자별 최대 개수 초과: ROW_NUMBER() OVER (PARTITION BY user_id) 기준 오래된 순
+    - PENDING/RUNNING task는 삭제하지 않는다.
+
+    대상 id를 먼저 읽은 뒤 `task_retention_chunk_size` 단위의 짧은
+    transaction으로 지우므로, 첫 sweep이 커도 다른 writer를 오래 막지 않는다.
+    결과 파일은 commit 이후 `FileDeletionQueue`에서 지운다.
     """
-    deleted_by_age = 0
-    deleted_by_count = 0
+    run = RetentionRun(started_at=datetime.now(timezone.utc))
+    with _retention_lock:
+        _retention_runs.append(run)
 
+    finished_filter = TestTask.status.notin_([TaskStatus.PENDING.value, TaskStatus.RUNNING.value])
     retention_days = max(1, int(settings.task_retention_days or 0))
     cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
-    aged_tasks = (
-        db.query(TestTask)
-        .filter(TestTask.requested_at < cutoff)
-        .all()
-    )
-    for task in aged_tasks:
-        _delete_task_files(task)
-        db.delete(task)
-        deleted_by_age += 1
-    if deleted_by_age:
-        db.commit()
+    aged_ids = db.scalars(
+        select(TestTask.id).where(TestTask.requested_at < cutoff, finished_filter).order_by(TestTask.id)
+    ).all()
+    run.deleted_by_age = _delete_tasks_in_chunks(db, list(aged_ids), run)
 
     max_per_user = int(settings.task_retention_max_per_user or 0)
     if max_per_user > 0:
-        user_ids = [row[0] for row in db.query(TestTask.user_id).distinct().all()]
-        for user_id in user_ids:
-            total = (
-                db.query(func.count(TestTask.id))
-                .filter(TestTask.user_id == user_id)
-                .scalar()
-                or 0
+        ranked = (
+            select(
+                TestTask.id,
+                TestTask.status,
+                func.row_number()
+                .over(
+                    partition_by=TestTask.user_id,
+                    order_by=(TestTask.requested_at.desc(), TestTask.id.desc()),
+                )
+                .label("rank"),
             )
-            overflow = int(total) - max_per_user
-            if overflow <= 0:
-                continue
-            stale = (
-                db.query(TestTask)
-                .filter(TestTask.user_id == user_id)
-                .order_by(TestTask.requested_at.asc(), TestTask.id.asc())
-                .limit(overflow)
-                .all()
+            .subquery()
+        )
+        overflow_ids = db.scalars(
+            select(ranked.c.id)
+            .where(
+                ranked.c.rank > max_per_user,
+                ranked.c.status.notin_([TaskStatus.PENDING.value, TaskStatus.RUNNING.value]),
             )
-            for task in stale:
-                _delete_task_files(task)
-                db.delete(task)
-                deleted_by_count += 1
-        if deleted_by_count:
-            db.commit()
-
-    return {"deleted_by_age": deleted_by_age, "deleted_by_count": deleted_by_count}
+            .order_by(ranked.c.id)
+        ).all()
+        run.deleted_by_count = _delete_tasks_in_chunks(db, list(overflow_ids), run)
+
+    run.finished_at = datetime.now(timezone.utc)
+    return {"deleted_by_age": run.deleted_by_age, "deleted_by_count": run.deleted_by_count}
+
+
+def _delete_tasks_in_chunks(db: Session, ids: list[int], run: RetentionRun) -> int:
+    chunk_size = max(1, int(settings.task_retention_chunk_size or 0))
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = db.execute(
+            select(TestTask.task_id, TestTask.raw_result_path, TestTask.summary_result_path).where(
+                TestTask.id.in_(chunk)
+            )
+        ).all()
+        task_ids = [row.task_id for row in rows]
+        if not task_ids:
+            continue
+        monitor_keys = rtd_monitor_keys_for_task_ids(db, task_ids)
+
+        lock_started = time.perf_counter()
+        db.execute(delete(TestTaskRule).where(TestTaskRule.task_id.in_(task_ids)))
+        result = db.execute(delete(TestTask).where(TestTask.id.in_(chunk)))
+        refresh_rtd_monitor_keys(db, monitor_keys)
+        db.commit()
+        lock_seconds = time.perf_counter() - lock_started
+
+        deleted += int(result.rowcount or 0)
+        with _retention_lock:
+            run.chunks += 1
+            run.lock_seconds += lock_seconds
+            run.max_chunk_lock_seconds = max(run.max_chunk_lock_seconds, lock_seconds)
+        if settings.task_retention_delete_files:
+            for row in rows:
+                _file_deletion_queue.submit(
+                    run,
+                    row.task_id,
+                    [path for path in (row.raw_result_path, row.summary_result_path) if path],
+                )
+    return deleted
+
+
+def drain_file_deletions() -> None:
+    """Lifespan 종료 시 호출. DB에서 이미 지운 task의 결과 파일이 남지 않게 큐를 비운다."""
+    timeout = max(0.0, float(settings.task_retention_shutdown_drain_seconds or 0))
+    if not _file_deletion_queue.join(timeout):
+        logger.warning(
+            "retention: %s result file batches left undeleted at shutdown",
+            _file_deletion_queue.pending(),
+        )
+
+
+def get_retention_stats() -> dict[str, object]:
+    with _retention_lock:
+        runs = [run.as_dict() for run in reversed(_retention_runs)]
+    return {
+        "retention_days": settings.task_retention_days,
+        "max_per_user": settings.task_retention_max_per_user,
+        "chunk_size": settings.task_retention_chunk_size,
+        "pending_file_deletions": _file_deletion_queue.pending(),
+        "last_run": runs[0] if runs else None,
+        "recent_runs": runs,
+    }
 
 
 _sweeper_started = False
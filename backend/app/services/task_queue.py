@@ -3,33 +3,69 @@ from __future__ import annotations
 """
 RTD line / ezDFS module queue primitives.
 
-Background workers call the queue functions to serialize task execution against
-a shared remote host. RTD tasks are serialized per user+line, ezDFS tasks per
-module name. Pending tasks' `message` field is kept in sync with their queue
-position so the UI can render the wait state.
+Queue state lives in `task_queue_entries` so it survives backend restarts and
+serialization holds even if several processes claim from it (the rest of the
+runtime state is per process; see the backend README). RTD tasks are serialized per
+user+line, ezDFS tasks per module name. Within a queue, higher task priority
+runs first, then entry id (FIFO) order or the module's fair-share policy
+(`queue_policy`).
+
+- enqueue_task(): insert an entry; label and position message are set once
+- claim_next_task(): atomically lease the next entry of a queue whose keys are
+  free, together with equivalent SYNC entries it can run for (coalescing)
+- heartbeat_tasks(): extend leases of tasks this process is running and
+  report which of them were asked to cancel
+- complete_task(): drop the entry and push new positions to the waiters
+- cancel_waiting_entry() / request_entry_cancel(): user cancellation of a
+  queued / leased task
+- recover_expired_leases(): requeue or fail entries whose owner stopped
+  heartbeating (`task_queue_expired_lease_policy`)
+
+Pending tasks' `message` field is refreshed only when a queue changes, with
+one batched UPDATE per queue, so the UI can render the wait state.
 """
 
-import json
-import threading
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, delete, exists, false, func, or_, select, update
+from sqlalchemy.orm import Session, aliased
 
+from app.core.config import get_settings
 from app.db.session import SessionLocal
-from app.models.entities import TestTask
+from app.models.entities import TaskQueueEntry, TestTask
+from app.services.queue_policy import load_ezdfs_queue_policies, order_by_priority, order_ezdfs_entries
+from app.services.rtd_monitor import sync_rtd_monitor
+from app.services.task_events import publish_queue_messages
+from app.services.task_service import get_task_primary_rule_name, publish_task_update
 from app.utils.enums import ActionType, TaskStatus, TaskStep, TestType
 from app.utils.naming import normalize_target_line_name
 
-_EZDFS_QUEUE_CONDITION = threading.Condition()
-_EZDFS_MODULE_QUEUES: dict[str, list[str]] = {}
-_RTD_QUEUE_CONDITION = threading.Condition()
-_RTD_LINE_QUEUES: dict[str, list[str]] = {}
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
+ENTRY_WAITING = "WAITING"
+ENTRY_LEASED = "LEASED"
 
-def requires_ezdfs_module_queue(task: TestTask, payload: dict) -> bool:
+# Actions that may simply run again after their worker died mid-run.
+_REQUEUE_SAFE_ACTIONS = {ActionType.TEST.value, ActionType.RETEST.value, ActionType.SYNC.value}
+
+
+@dataclass(frozen=True)
+class ClaimedTask:
+    task_id: str
+    step: str
+    attempts: int
+    coalesced_task_ids: tuple[str, ...] = ()
+
+
+def requires_ezdfs_module_queue(task: TestTask) -> bool:
     return (
         task.test_type == TestType.EZDFS.value
         and task.action_type in {ActionType.SYNC.value, ActionType.TEST.value, ActionType.RETEST.value}
-        and bool(extract_ezdfs_module_name(payload))
+        and bool(task.module_name)
     )
 
 
@@ -47,212 +83,728 @@ def build_rtd_queue_key(user_id: str, target_name: str) -> str:
     return f"{user_id}::{normalize_target_line_name(target_name)}"
 
 
-def enter_ezdfs_module_queue(db: Session, task: TestTask, module_name: str) -> None:
-    with _EZDFS_QUEUE_CONDITION:
-        queue = _EZDFS_MODULE_QUEUES.setdefault(module_name, [])
-        if task.task_id not in queue:
-            queue.append(task.task_id)
-        position = queue.index(task.task_id) + 1
-        current_head_task_id = queue[0] if queue else ""
+def build_sync_coalesce_key(task: TestTask) -> str | None:
+    """
+    Key shared by SYNC tasks one `class_sync_file.sh` run can complete.
+
+    The script only depends on the line / module home directory, so the
+    request payload and the requesting user do not matter.
+    """
+    if not settings.sync_coalesce_enabled or task.action_type != ActionType.SYNC.value:
+        return None
+    if task.test_type == TestType.RTD.value:
+        return f"rtd-sync:{normalize_target_line_name(task.target_name)}"
+    if task.test_type == TestType.EZDFS.value and task.module_name:
+        return f"ezdfs-sync:{task.module_name}"
+    return None
+
+
+def enqueue_task(
+    db: Session,
+    task: TestTask,
+    step: str,
+    rtd_queue_key: str | None,
+    ezdfs_module_name: str | None,
+) -> None:
+    """
+    Persist one queue entry for `task` and show its initial queue position.
+
+    A higher priority or a fair-share policy can place the new entry ahead of
+    tasks already waiting, so the other waiters' positions are refreshed too.
+    A task canceled before its entry was inserted is left out.
+    """
+    label = _build_ezdfs_task_label(task) if ezdfs_module_name else _build_rtd_task_label(task)
+    entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == task.task_id).first()
+    if entry is None:
+        entry = TaskQueueEntry(
+            task_id=task.task_id,
+            step=step,
+            rtd_queue_key=rtd_queue_key or None,
+            ezdfs_queue_key=ezdfs_module_name or None,
+            label=label,
+            user_id=task.user_id,
+            priority=task.priority or 0,
+            coalesce_key=build_sync_coalesce_key(task),
+            state=ENTRY_WAITING,
+        )
+        db.add(entry)
+        db.flush()
+    # Re-read after the insert: a cancel committed before it must win (see cancel_waiting_entry).
+    db.refresh(task)
+    if task.status != TaskStatus.PENDING.value:
+        db.rollback()
+        return
 
-    task.status = TaskStatus.PENDING.value
     task.current_step = task.current_step or TaskStep.TESTING.value
-    task.message = (
-        f"Queue: {_get_ezdfs_task_rule_name(db, current_head_task_id) or module_name} ({position})"
-        if position > 1
-        else f"Queued: {_get_ezdfs_task_rule_name(db, task.task_id) or task.target_name}"
-    )
+    task.message = _build_initial_wait_message(db, entry)
     db.add(task)
+    sync_rtd_monitor(db, [task])
     db.commit()
     db.refresh(task)
+    publish_task_update(task)
+    _refresh_wait_messages(db, entry.rtd_queue_key, entry.ezdfs_queue_key)
+
+
+def claim_next_task(owner: str) -> ClaimedTask | None:
+    """
+    Lease the next WAITING entry of a queue whose serialization keys are free.
+
+    A key is busy while any LEASED entry holds it, and an entry may only start
+    when it is the head of every queue it belongs to (priority, then FIFO or
+    the module's fair-share policy). The final UPDATE re-checks that no key is
+    leased — and, when the head is also the oldest waiter, that no older entry
+    waits — so concurrent claimers (threads or other uvicorn processes) cannot
+    lease conflicting entries.
+
+    A SYNC `coalesce_key` is busy the same way: RTD queue keys are per user,
+    so without it another user's SYNC of the same line would run next to the
+    leased one. A leased SYNC also leases the equivalent SYNC entries that
+    could start right now (see `_absorb_equivalent_syncs`); its run completes
+    them all.
+    """
+    # Entries are a snapshot; the conditional UPDATEs are the source of truth, so
+    # commits need not reload every row (and `attempts` stays the pre-lease value).
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        entries = (
+            db.query(TaskQueueEntry)
+            .order_by(TaskQueueEntry.id.asc())
+            .all()
+        )
+        blocked: set[tuple[str, str]] = set()
+        busy_syncs: set[str] = set()
+        waiting_by_key: dict[tuple[str, str], list[TaskQueueEntry]] = {}
+        for entry in entries:
+            if entry.state == ENTRY_LEASED:
+                blocked.update(_entry_keys(entry))
+                if entry.coalesce_key:
+                    busy_syncs.add(entry.coalesce_key)
+            elif entry.state == ENTRY_WAITING:
+                for key in _entry_keys(entry):
+                    waiting_by_key.setdefault(key, []).append(entry)
+
+        orders = _queue_orders(db, {key: queue for key, queue in waiting_by_key.items() if key not in blocked})
+        for entry in entries:
+            if entry.state != ENTRY_WAITING:
+                continue
+            keys = _entry_keys(entry)
+            if not blocked.isdisjoint(keys) or any(orders[key][0] is not entry for key in keys):
+                continue
+            if entry.coalesce_key in busy_syncs:
+                continue
+            oldest_first = all(waiting_by_key[key][0] is entry for key in keys)
+            if _try_lease_entry(db, entry, owner, oldest_first):
+                coalesced_task_ids = (
+                    _absorb_equivalent_syncs(db, entry, owner, entries, blocked, orders)
+                    if entry.coalesce_key
+                    else ()
+                )
+                return ClaimedTask(
+                    task_id=entry.task_id,
+                    step=entry.step,
+                    attempts=entry.attempts + 1,
+                    coalesced_task_ids=coalesced_task_ids,
+                )
+            blocked.update(keys)
+            if entry.coalesce_key:
+                busy_syncs.add(entry.coalesce_key)
+        return None
+    finally:
+        db.close()
 
 
-def wait_for_ezdfs_module_turn(task_id: str, module_name: str) -> None:
-    with _EZDFS_QUEUE_CONDITION:
-        while True:
-            queue = _EZDFS_MODULE_QUEUES.get(module_name, [])
-            if queue and queue[0] == task_id:
-                return
-            _refresh_ezdfs_wait_message(task_id, module_name, queue[0] if queue else "")
-            _EZDFS_QUEUE_CONDITION.wait(timeout=1.0)
-
-
-def leave_ezdfs_module_queue(task_id: str, module_name: str) -> None:
-    with _EZDFS_QUEUE_CONDITION:
-        queue = _EZDFS_MODULE_QUEUES.get(module_name, [])
-        if task_id in queue:
-            queue.remove(task_id)
-        if not queue:
-            _EZDFS_MODULE_QUEUES.pop(module_name, None)
-        _EZDFS_QUEUE_CONDITION.notify_all()
-
+def heartbeat_tasks(owner: str, task_ids: list[str]) -> list[str]:
+    """Extend the leases this process holds; returns those with a pending cancel request."""
+    if not task_ids:
+        return []
+    now = _now()
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(TaskQueueEntry)
+            .where(
+                or_(TaskQueueEntry.task_id.in_(task_ids), TaskQueueEntry.coalesced_into.in_(task_ids)),
+                TaskQueueEntry.lease_owner == owner,
+                TaskQueueEntry.state == ENTRY_LEASED,
+            )
+            .values(
+                heartbeat_at=now,
+                lease_expires_at=now + timedelta(seconds=settings.task_queue_lease_seconds),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return list(
+            db.scalars(
+                select(TaskQueueEntry.task_id).where(
+                    TaskQueueEntry.task_id.in_(task_ids),
+                    TaskQueueEntry.lease_owner == owner,
+                    TaskQueueEntry.cancel_requested_at.is_not(None),
+                )
+            )
+        )
+    finally:
+        db.close()
 
-def enter_rtd_line_queue(db: Session, task: TestTask, queue_key: str) -> None:
-    with _RTD_QUEUE_CONDITION:
-        queue = _RTD_LINE_QUEUES.setdefault(queue_key, [])
-        if task.task_id not in queue:
-            queue.append(task.task_id)
-        position = queue.index(task.task_id) + 1
-        current_head_task_id = queue[0] if queue else ""
 
-    task.status = TaskStatus.PENDING.value
-    task.current_step = task.current_step or TaskStep.TESTING.value
-    task.message = (
-        f"Queue: {_get_rtd_task_display_name(db, current_head_task_id)} ({position})"
-        if position > 1
-        else f"Queued: {_get_rtd_task_display_name(db, task.task_id)}"
+def cancel_waiting_entry(db: Session, task: TestTask) -> bool:
+    """
+    Remove a task that has not been leased yet from its queues and mark it
+    CANCELED. False when a worker leased it in the meantime.
+
+    A new task is committed before its entry is inserted (by a BackgroundTask
+    of the request); cancelled in that window it is marked CANCELED directly
+    and `enqueue_task` skips it.
+    """
+    entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == task.task_id).first()
+    if entry is None:
+        if _cancel_unqueued_task(db, task):
+            return True
+        # Enqueued in the meantime.
+        entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == task.task_id).first()
+        if entry is None:
+            return False
+    rtd_queue_key, ezdfs_queue_key = entry.rtd_queue_key, entry.ezdfs_queue_key
+    result = db.execute(
+        delete(TaskQueueEntry)
+        .where(TaskQueueEntry.id == entry.id, TaskQueueEntry.state == ENTRY_WAITING)
+        .execution_options(synchronize_session=False)
     )
+    if result.rowcount != 1:
+        db.rollback()
+        return False
+
+    now = _now()
+    task.status = TaskStatus.CANCELED.value
+    task.started_at = task.started_at or now
+    task.ended_at = now
+    task.message = "Canceled before start"
     db.add(task)
+    sync_rtd_monitor(db, [task])
     db.commit()
     db.refresh(task)
+    publish_task_update(task)
+    _refresh_wait_messages(db, rtd_queue_key, ezdfs_queue_key)
+    return True
+
+
+def _cancel_unqueued_task(db: Session, task: TestTask) -> bool:
+    """Mark a PENDING task without a queue entry CANCELED; False once its entry exists."""
+    now = _now()
+    result = db.execute(
+        update(TestTask)
+        .where(
+            TestTask.task_id == task.task_id,
+            TestTask.status == TaskStatus.PENDING.value,
+            ~exists().where(TaskQueueEntry.task_id == TestTask.task_id),
+        )
+        .values(
+            status=TaskStatus.CANCELED.value,
+            started_at=func.coalesce(TestTask.started_at, now),
+            ended_at=now,
+            message="Canceled before start",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        db.rollback()
+        return False
 
+    db.refresh(task)
+    sync_rtd_monitor(db, [task])
+    db.commit()
+    db.refresh(task)
+    publish_task_update(task)
+    return True
 
-def wait_for_rtd_line_turn(task_id: str, queue_key: str) -> None:
-    with _RTD_QUEUE_CONDITION:
-        while True:
-            queue = _RTD_LINE_QUEUES.get(queue_key, [])
-            if queue and queue[0] == task_id:
-                return
-            _refresh_rtd_wait_message(task_id, queue_key, queue[0] if queue else "")
-            _RTD_QUEUE_CONDITION.wait(timeout=1.0)
-
-
-def leave_rtd_line_queue(task_id: str, queue_key: str) -> None:
-    with _RTD_QUEUE_CONDITION:
-        queue = _RTD_LINE_QUEUES.get(queue_key, [])
-        if task_id in queue:
-            queue.remove(task_id)
-        if not queue:
-            _RTD_LINE_QUEUES.pop(queue_key, None)
-        _RTD_QUEUE_CONDITION.notify_all()
-
-
-def extract_ezdfs_module_name(payload: dict) -> str:
-    nested_payload = payload.get("payload")
-    if isinstance(nested_payload, dict):
-        return str(
-            payload.get("module_name")
-            or nested_payload.get("selected_module")
-            or ""
-        ).strip()
-    return str(payload.get("module_name") or "").strip()
-
-
-def _extract_ezdfs_rule_name(payload: dict) -> str:
-    nested_payload = payload.get("payload")
-    if isinstance(nested_payload, dict):
-        return str(
-            payload.get("rule_name")
-            or nested_payload.get("selected_rule")
-            or ""
-        ).strip()
-    return str(payload.get("rule_name") or "").strip()
-
-
-def _extract_rtd_primary_rule_name(requested_payload: dict) -> str:
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    selected_rule = str(
-        nested_payload.get("selected_rule")
-        or requested_payload.get("rule_name")
-        or ""
-    ).strip()
-    if selected_rule:
-        return selected_rule
-
-    selected_rule_targets = (
-        nested_payload.get("selected_rule_targets")
-        if isinstance(nested_payload.get("selected_rule_targets"), list)
-        else []
+
+def request_entry_cancel(db: Session, task_id: str) -> bool:
+    """Flag a leased task so its owner process stops it; False when it is not leased."""
+    result = db.execute(
+        update(TaskQueueEntry)
+        .where(TaskQueueEntry.task_id == task_id, TaskQueueEntry.state == ENTRY_LEASED)
+        .values(cancel_requested_at=_now())
+        .execution_options(synchronize_session=False)
     )
-    for item in selected_rule_targets:
-        rule_name = str(item.get("rule_name", "")).strip()
-        if rule_name:
-            return rule_name
-    return ""
+    db.commit()
+    return result.rowcount == 1
 
 
-def _refresh_ezdfs_wait_message(task_id: str, module_name: str, current_head_task_id: str) -> None:
+def is_cancel_requested(task_id: str) -> bool:
     db = SessionLocal()
     try:
-        task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
-        if task is None or task.status != TaskStatus.PENDING.value:
-            return
-
-        rule_name = _get_ezdfs_task_rule_name(db, current_head_task_id) or module_name
-        with _EZDFS_QUEUE_CONDITION:
-            queue = _EZDFS_MODULE_QUEUES.get(module_name, [])
-            position = queue.index(task_id) + 1 if task_id in queue else 0
-
-        next_message = f"Queue: {rule_name} ({position})" if position > 1 else f"Queued: {rule_name}"
-        if task.message == next_message:
-            return
-
-        task.message = next_message
-        db.add(task)
-        db.commit()
+        return db.scalar(
+            select(TaskQueueEntry.id).where(
+                TaskQueueEntry.task_id == task_id,
+                TaskQueueEntry.cancel_requested_at.is_not(None),
+            )
+        ) is not None
     finally:
         db.close()
 
 
-def _refresh_rtd_wait_message(task_id: str, queue_key: str, current_head_task_id: str) -> None:
+def list_coalesced_task_ids(db: Session, task_id: str) -> list[str]:
+    """Tasks leased together with SYNC `task_id`, to be completed by its run."""
+    return list(
+        db.scalars(
+            select(TaskQueueEntry.task_id)
+            .where(TaskQueueEntry.coalesced_into == task_id)
+            .order_by(TaskQueueEntry.id.asc())
+        )
+    )
+
+
+def complete_task(task_id: str) -> None:
+    """Remove a finished task (and tasks coalesced into it) from its queues and refresh the remaining waiters."""
     db = SessionLocal()
     try:
-        task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
-        if task is None or task.status != TaskStatus.PENDING.value:
+        entries = (
+            db.query(TaskQueueEntry)
+            .filter(or_(TaskQueueEntry.task_id == task_id, TaskQueueEntry.coalesced_into == task_id))
+            .all()
+        )
+        if not entries:
             return
+        touched_keys = {(entry.rtd_queue_key, entry.ezdfs_queue_key) for entry in entries}
+        for entry in entries:
+            db.delete(entry)
+        db.commit()
+        for rtd_queue_key, ezdfs_queue_key in touched_keys:
+            _refresh_wait_messages(db, rtd_queue_key, ezdfs_queue_key)
+    finally:
+        db.close()
 
-        current_label = _get_rtd_task_display_name(db, current_head_task_id) or normalize_target_line_name(task.target_name)
-        with _RTD_QUEUE_CONDITION:
-            queue = _RTD_LINE_QUEUES.get(queue_key, [])
-            position = queue.index(task_id) + 1 if task_id in queue else 0
 
-        next_message = f"Queue: {current_label} ({position})" if position > 1 else f"Queued: {_get_rtd_task_display_name(db, task_id)}"
-        if task.message == next_message:
-            return
+def recover_expired_leases(db: Session) -> int:
+    """
+    Handle LEASED entries whose owner stopped heartbeating.
+
+    With the `requeue` policy the entry goes back to WAITING (keeping its FIFO
+    id) until it has been leased `task_queue_max_attempts` times; otherwise,
+    and with the `fail` policy, the task is marked FAIL and the entry removed.
+    Only actions that are safe to run twice (TEST / RETEST / SYNC) are
+    requeued; a COPY or COMPILE interrupted halfway is always failed.
+    Returns the number of recovered entries.
+    """
+    now = _now()
+    expired = (
+        db.query(TaskQueueEntry)
+        .filter(
+            TaskQueueEntry.state == ENTRY_LEASED,
+            TaskQueueEntry.lease_expires_at < now,
+        )
+        .all()
+    )
+    if not expired:
+        return 0
 
-        task.message = next_message
+    requeue = settings.task_queue_expired_lease_policy == "requeue"
+    tasks_by_id = {
+        task.task_id: task
+        for task in db.query(TestTask).filter(TestTask.task_id.in_([entry.task_id for entry in expired])).all()
+    }
+    touched_keys: list[tuple[str | None, str | None]] = []
+    for entry in expired:
+        task = tasks_by_id.get(entry.task_id)
+        touched_keys.append((entry.rtd_queue_key, entry.ezdfs_queue_key))
+        if task is None:
+            db.delete(entry)
+            continue
+        if entry.cancel_requested_at is not None:
+            task.status = TaskStatus.CANCELED.value
+            task.ended_at = now
+            task.started_at = task.started_at or now
+            task.message = "Canceled: worker stopped before completion"
+            db.delete(entry)
+        elif (
+            requeue
+            and task.action_type in _REQUEUE_SAFE_ACTIONS
+            and entry.attempts < settings.task_queue_max_attempts
+        ):
+            entry.state = ENTRY_WAITING
+            entry.lease_owner = None
+            entry.lease_expires_at = None
+            entry.coalesced_into = None
+            task.coalesced_into = None
+            task.status = TaskStatus.PENDING.value
+            task.message = "Requeued: previous worker stopped before completion"
+            logger.warning("Requeued task %s after lease expiry (attempt %s)", entry.task_id, entry.attempts)
+        else:
+            task.status = TaskStatus.FAIL.value
+            task.ended_at = now
+            task.started_at = task.started_at or now
+            task.message = "Marked as FAIL: worker stopped before completion"
+            db.delete(entry)
+            logger.warning("Failed task %s after lease expiry", entry.task_id)
         db.add(task)
-        db.commit()
-    finally:
-        db.close()
+    sync_rtd_monitor(db, list(tasks_by_id.values()))
+    db.commit()
 
+    for task in tasks_by_id.values():
+        publish_task_update(task)
+    for rtd_queue_key, ezdfs_queue_key in touched_keys:
+        _refresh_wait_messages(db, rtd_queue_key, ezdfs_queue_key)
+    return len(expired)
 
-def _get_rtd_task_display_name(db: Session, task_id: str) -> str:
-    task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
-    if task is None:
-        return ""
 
+def get_queue_stats(db: Session) -> dict[str, object]:
+    """Entry counts by state and waiting depth per queue key."""
+    state_counts = dict(
+        db.query(TaskQueueEntry.state, func.count(TaskQueueEntry.id))
+        .group_by(TaskQueueEntry.state)
+        .all()
+    )
+    depth_by_key: dict[str, int] = {}
+    for column, prefix in (
+        (TaskQueueEntry.rtd_queue_key, "rtd:"),
+        (TaskQueueEntry.ezdfs_queue_key, "ezdfs:"),
+    ):
+        rows = (
+            db.query(column, func.count(TaskQueueEntry.id))
+            .filter(column.is_not(None), TaskQueueEntry.state == ENTRY_WAITING)
+            .group_by(column)
+            .all()
+        )
+        depth_by_key.update({f"{prefix}{key}": count for key, count in rows})
+    return {
+        "waiting_tasks": state_counts.get(ENTRY_WAITING, 0),
+        "leased_tasks": state_counts.get(ENTRY_LEASED, 0),
+        "queue_depth_by_key": depth_by_key,
+        "wait_seconds_by_user": get_wait_time_percentiles(db),
+    }
+
+
+def get_wait_time_percentiles(db: Session) -> dict[str, dict[str, float]]:
+    """
+    Per-user queue wait (`requested_at` → `started_at`) of tasks started within
+    `task_queue_wait_stats_window_seconds`, as count / p50 / p90 / p99 / max
+    seconds, so the effect of priority and fair-share policies can be measured.
+    Tasks canceled before they started are left out.
+    """
+    cutoff = _now() - timedelta(seconds=max(0, settings.task_queue_wait_stats_window_seconds))
+    rows = db.execute(
+        select(TestTask.user_id, TestTask.requested_at, TestTask.started_at).where(
+            TestTask.started_at >= cutoff,
+            TestTask.status != TaskStatus.CANCELED.value,
+        )
+    ).all()
+    waits_by_user: dict[str, list[float]] = {}
+    for user_id, requested_at, started_at in rows:
+        if requested_at is None or started_at is None:
+            continue
+        waits_by_user.setdefault(user_id, []).append(max(0.0, (started_at - requested_at).total_seconds()))
+
+    stats: dict[str, dict[str, float]] = {}
+    for user_id, waits in sorted(waits_by_user.items()):
+        waits.sort()
+        stats[user_id] = {
+            "count": len(waits),
+            "p50": round(_percentile(waits, 0.50), 3),
+            "p90": round(_percentile(waits, 0.90), 3),
+            "p99": round(_percentile(waits, 0.99), 3),
+            "max": round(waits[-1], 3),
+        }
+    return stats
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _entry_keys(entry: TaskQueueEntry) -> set[tuple[str, str]]:
+    keys: set[tuple[str, str]] = set()
+    if entry.rtd_queue_key:
+        keys.add(("rtd", entry.rtd_queue_key))
+    if entry.ezdfs_queue_key:
+        keys.add(("ezdfs", entry.ezdfs_queue_key))
+    return keys
+
+
+def _queue_orders(
+    db: Session,
+    waiting_by_key: dict[tuple[str, str], list[TaskQueueEntry]],
+) -> dict[tuple[str, str], list[TaskQueueEntry]]:
+    """Run order of the waiting entries of each free queue."""
+    policies = load_ezdfs_queue_policies(db, {key for kind, key in waiting_by_key if kind == "ezdfs"})
+    return {
+        (kind, key): _order_waiting_entries(db, kind, key, queue, policies.get(key))
+        for (kind, key), queue in waiting_by_key.items()
+    }
+
+
+def _absorb_equivalent_syncs(
+    db: Session,
+    leader: TaskQueueEntry,
+    owner: str,
+    entries: list[TaskQueueEntry],
+    blocked: set[tuple[str, str]],
+    orders: dict[tuple[str, str], list[TaskQueueEntry]],
+) -> tuple[str, ...]:
+    """
+    Lease the WAITING entries with the leader's coalesce key that may start now.
+
+    On a queue shared with the leader, only the entries directly behind it
+    qualify (nothing else would have run in between). On any other queue the
+    entry must be that queue's head and the queue must be free, like a normal
+    claim — so a SYNC never overtakes a COPY / COMPILE its requester queued
+    before it. A SYNC requested while an equivalent one already runs stays
+    queued: that run may have started before the requester's files changed,
+    so it is merged into the next run instead.
+    """
+    leader_keys = _entry_keys(leader)
+    behind_leader: set[int] = set()
+    for key in leader_keys:
+        for entry in orders[key][1:]:
+            if entry.coalesce_key != leader.coalesce_key:
+                break
+            behind_leader.add(entry.id)
+
+    absorbed: list[str] = []
+    for entry in entries:
+        if entry is leader or entry.state != ENTRY_WAITING or entry.coalesce_key != leader.coalesce_key:
+            continue
+        keys = _entry_keys(entry)
+        own_keys = keys - leader_keys
+        if any(key in leader_keys and entry.id not in behind_leader for key in keys):
+            continue
+        if any(key in blocked or key not in orders or orders[key][0] is not entry for key in own_keys):
+            continue
+        if _try_absorb_entry(db, entry, owner, leader.task_id, own_keys):
+            absorbed.append(entry.task_id)
+            blocked.update(own_keys)
+    if absorbed:
+        logger.info("Coalesced SYNC tasks %s into %s", absorbed, leader.task_id)
+    return tuple(absorbed)
+
+
+def _try_absorb_entry(
+    db: Session,
+    entry: TaskQueueEntry,
+    owner: str,
+    leader_task_id: str,
+    own_keys: set[tuple[str, str]],
+) -> bool:
+    """
+    Lease `entry` as a follower of `leader_task_id`; its own queues must still
+    be free and no other run of its coalesce key may have started.
+    """
+    other = aliased(TaskQueueEntry)
+    conditions = [
+        TaskQueueEntry.id == entry.id,
+        TaskQueueEntry.state == ENTRY_WAITING,
+        ~exists().where(
+            other.coalesce_key == entry.coalesce_key,
+            other.state == ENTRY_LEASED,
+            other.task_id != leader_task_id,
+            or_(other.coalesced_into.is_(None), other.coalesced_into != leader_task_id),
+        ),
+    ]
+    key_matches = [
+        other.rtd_queue_key == key if kind == "rtd" else other.ezdfs_queue_key == key
+        for kind, key in own_keys
+    ]
+    if key_matches:
+        conditions.append(
+            ~exists().where(other.id != entry.id, or_(*key_matches), other.state == ENTRY_LEASED)
+        )
+
+    now = _now()
+    result = db.execute(
+        update(TaskQueueEntry)
+        .where(*conditions)
+        .values(
+            state=ENTRY_LEASED,
+            lease_owner=owner,
+            coalesced_into=leader_task_id,
+            heartbeat_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.task_queue_lease_seconds),
+            attempts=TaskQueueEntry.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _order_waiting_entries(
+    db: Session,
+    kind: str,
+    key: str,
+    entries: list[TaskQueueEntry],
+    policy: str | None,
+) -> list[TaskQueueEntry]:
+    if kind == "ezdfs" and policy:
+        return order_ezdfs_entries(db, key, entries, policy)
+    return order_by_priority(entries)
+
+
+def _ordered_queue(db: Session, kind: str, key: str) -> list[TaskQueueEntry]:
+    """Entries of one queue in run order: leased first, then waiting ones by policy."""
+    column = TaskQueueEntry.ezdfs_queue_key if kind == "ezdfs" else TaskQueueEntry.rtd_queue_key
+    entries = db.query(TaskQueueEntry).filter(column == key).order_by(TaskQueueEntry.id.asc()).all()
+    leased = [entry for entry in entries if entry.state == ENTRY_LEASED]
+    waiting = [entry for entry in entries if entry.state != ENTRY_LEASED]
+    if not waiting:
+        return leased
+    policy = load_ezdfs_queue_policies(db, {key}).get(key) if kind == "ezdfs" else None
+    return leased + _order_waiting_entries(db, kind, key, waiting, policy)
+
+
+def _try_lease_entry(db: Session, entry: TaskQueueEntry, owner: str, oldest_first: bool = True) -> bool:
+    """
+    Conditionally flip one entry to LEASED; False when another claimer won.
+
+    `oldest_first` also requires that no older entry waits on the same keys
+    (plain FIFO); entries chosen by priority or fair-share policy only require
+    their keys to be free. A SYNC additionally requires that no equivalent
+    SYNC (same `coalesce_key`) is leased.
+    """
+    other = aliased(TaskQueueEntry)
+    key_matches = []
+    if entry.rtd_queue_key:
+        key_matches.append(other.rtd_queue_key == entry.rtd_queue_key)
+    if entry.ezdfs_queue_key:
+        key_matches.append(other.ezdfs_queue_key == entry.ezdfs_queue_key)
+
+    conditions = [TaskQueueEntry.id == entry.id, TaskQueueEntry.state == ENTRY_WAITING]
+    if key_matches:
+        conditions.append(
+            ~exists().where(
+                other.id != entry.id,
+                or_(*key_matches),
+                or_(
+                    other.state == ENTRY_LEASED,
+                    and_(other.state == ENTRY_WAITING, other.id < entry.id) if oldest_first else false(),
+                ),
+            )
+        )
+    if entry.coalesce_key:
+        conditions.append(
+            ~exists().where(
+                other.id != entry.id,
+                other.coalesce_key == entry.coalesce_key,
+                other.state == ENTRY_LEASED,
+            )
+        )
+
+    now = _now()
+    result = db.execute(
+        update(TaskQueueEntry)
+        .where(*conditions)
+        .values(
+            state=ENTRY_LEASED,
+            lease_owner=owner,
+            heartbeat_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.task_queue_lease_seconds),
+            attempts=TaskQueueEntry.attempts + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _build_initial_wait_message(db: Session, entry: TaskQueueEntry) -> str:
+    kind, fallback_label = (
+        ("ezdfs", entry.ezdfs_queue_key or "")
+        if entry.ezdfs_queue_key
+        else ("rtd", (entry.rtd_queue_key or "").split("::", 1)[-1])
+    )
+    key = entry.ezdfs_queue_key or entry.rtd_queue_key
+    if not key:
+        return f"Queued: {entry.label}"
+
+    rows = _ordered_queue(db, kind, key)
+    position = next((index for index, row in enumerate(rows, start=1) if row.id == entry.id), 1)
+    if position > 1:
+        return f"Queue: {rows[0].label or fallback_label} ({position})"
+    return f"Queued: {entry.label}"
+
+
+def _refresh_wait_messages(db: Session, rtd_queue_key: str | None, ezdfs_queue_key: str | None) -> None:
+    """Recompute queue position messages for every entry in the affected queues."""
+    messages: dict[str, str] = {}
+    for kind, key, fallback_label in (
+        ("rtd", rtd_queue_key, (rtd_queue_key or "").split("::", 1)[-1]),
+        ("ezdfs", ezdfs_queue_key, ezdfs_queue_key or ""),
+    ):
+        if not key:
+            continue
+        rows = _ordered_queue(db, kind, key)
+        if not rows:
+            continue
+        head_label = rows[0].label or fallback_label
+        for position, row in enumerate(rows, start=1):
+            messages[row.task_id] = (
+                f"Queue: {head_label} ({position})"
+                if position > 1
+                else f"Queued: {row.label or fallback_label}"
+            )
+    _apply_pending_wait_messages(db, messages)
+
+
+def _apply_pending_wait_messages(db: Session, messages: dict[str, str]) -> None:
+    """
+    Write queue messages for many tasks with one UPDATE statement.
+
+    Only PENDING rows whose message actually changes are touched, so the
+    running head keeps its progress message. The changed rows are pushed to
+    the task stream as one `queue` delta per owner.
+    """
+    if not messages:
+        return
+
+    changed_rows = db.execute(
+        select(TestTask.task_id, TestTask.user_id, TestTask.message).where(
+            TestTask.task_id.in_(list(messages)),
+            TestTask.status == TaskStatus.PENDING.value,
+        )
+    ).all()
+    changed = {
+        row.task_id: row.user_id
+        for row in changed_rows
+        if row.message != messages[row.task_id]
+    }
+    if not changed:
+        return
+
+    changed_messages = {task_id: messages[task_id] for task_id in changed}
+    next_message = case(changed_messages, value=TestTask.task_id, else_=TestTask.message)
+    db.execute(
+        update(TestTask)
+        .where(
+            TestTask.task_id.in_(list(changed_messages)),
+            TestTask.status == TaskStatus.PENDING.value,
+        )
+        .values(message=next_message)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    publish_queue_messages(
+        [
+            {"task_id": task_id, "user_id": user_id, "message": changed_messages[task_id]}
+            for task_id, user_id in changed.items()
+        ]
+    )
+
+
+def _build_rtd_task_label(task: TestTask) -> str:
     action_label = "테스트" if task.action_type == ActionType.RETEST.value else {
         ActionType.COPY.value: "복사",
         ActionType.COMPILE.value: "컴파일",
         ActionType.TEST.value: "테스트",
     }.get(task.action_type, task.action_type)
-    rule_name = _extract_rtd_task_primary_rule_name(task)
+    rule_name = get_task_primary_rule_name(task)
     if rule_name:
         return f"{action_label} {rule_name}"
     return f"{action_label} {normalize_target_line_name(task.target_name)}"
 
 
-def _extract_rtd_task_primary_rule_name(task: TestTask) -> str:
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return ""
-    return _extract_rtd_primary_rule_name(requested_payload)
-
-
-def _get_ezdfs_task_rule_name(db: Session, task_id: str) -> str:
-    task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
-    if task is None:
-        return ""
-
-    try:
-        payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return task.target_name
-
-    return _extract_ezdfs_rule_name(payload) or task.target_name
+def _build_ezdfs_task_label(task: TestTask) -> str:
+    return task.rule_name or task.target_name
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+"""
+Bounded task scheduler.
+
+A fixed number of worker threads execute queued tasks. One dispatcher thread
+per process calls the `claim` callable, which leases the next task whose
+serialization keys (RTD user+line, ezDFS module) are free, and hands it to an
+idle worker, so tasks sharing a key still run in queue order while tasks on
+other keys never sit on a worker thread just to wait. The dispatcher only
+claims while a worker is free, and sleeps until `notify()` (new task /
+finished task) or the poll interval, which also picks up work enqueued by
+other processes; idle workers block on an in-memory hand-off queue and never
+touch the DB themselves.
+
+A maintenance thread renews the leases of running tasks and periodically runs
+the recovery hook for leases abandoned by dead workers.
+
+The scheduler knows nothing about the DB; `task_worker` supplies the claim,
+run, release, heartbeat and recovery callables.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _RunningTask:
+    task_id: str
+    step: str
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class TaskScheduler:
+    """Fixed-size worker pool fed by a lease-based `claim` callable."""
+
+    def __init__(
+        self,
+        claim: Callable[[], tuple[str, str] | None],
+        run: Callable[[str, str], None],
+        on_finished: Callable[[str], None],
+        heartbeat: Callable[[list[str]], None],
+        recover: Callable[[], None],
+        pool_size: int,
+        poll_interval: float,
+        heartbeat_interval: float,
+    ) -> None:
+        self._claim = claim
+        self._run = run
+        self._on_finished = on_finished
+        self._heartbeat = heartbeat
+        self._recover = recover
+        self._pool_size = max(1, pool_size)
+        self._poll_interval = max(0.1, poll_interval)
+        self._heartbeat_interval = max(0.1, heartbeat_interval)
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._running: dict[str, _RunningTask] = {}
+        self._workers: list[threading.Thread] = []
+        self._handoff: queue.SimpleQueue[_RunningTask | None] = queue.SimpleQueue()
+        self._dispatcher_thread: threading.Thread | None = None
+        self._maintenance_thread: threading.Thread | None = None
+        self._accepting = True
+        self._wakeups = 0
+        self._completed = 0
+
+    def start(self) -> None:
+        """Start workers, the dispatcher and the maintenance thread (idempotent)."""
+        with self._condition:
+            if not self._accepting:
+                return
+            while len(self._workers) < self._pool_size:
+                worker = threading.Thread(
+                    target=self._worker_loop,
+                    daemon=True,
+                    name=f"task-worker-{len(self._workers) + 1}",
+                )
+                self._workers.append(worker)
+                worker.start()
+            if self._dispatcher_thread is None:
+                self._dispatcher_thread = threading.Thread(
+                    target=self._dispatch_loop,
+                    daemon=True,
+                    name="task-dispatcher",
+                )
+                self._dispatcher_thread.start()
+            if self._maintenance_thread is None:
+                self._maintenance_thread = threading.Thread(
+                    target=self._maintenance_loop,
+                    daemon=True,
+                    name="task-lease-heartbeat",
+                )
+                self._maintenance_thread.start()
+
+    def notify(self) -> bool:
+        """Wake the dispatcher to claim new work. Returns False when draining."""
+        with self._condition:
+            if not self._accepting:
+                return False
+            self.start()
+            self._wakeups += 1
+            self._condition.notify_all()
+            return True
+
+    def shutdown(self, timeout: float) -> bool:
+        """
+        Stop claiming and wait up to `timeout` seconds for running tasks.
+
+        Unclaimed tasks stay queued in the DB and resume on the next start.
+        Returns True when every running task finished.
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._condition:
+            self._accepting = False
+            self._condition.notify_all()
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(timeout=remaining)
+        self._stopped.set()
+        return True
+
+    def stats(self) -> dict[str, object]:
+        """Snapshot of local pool usage."""
+        with self._condition:
+            now = time.monotonic()
+            return {
+                "pool_size": self._pool_size,
+                "busy_workers": len(self._running),
+                "idle_workers": sum(worker.is_alive() for worker in self._workers) - len(self._running),
+                "completed_tasks": self._completed,
+                "accepting": self._accepting,
+                "running_task_ids": sorted(self._running),
+                "longest_running_seconds": round(
+                    max((now - item.started_at for item in self._running.values()), default=0.0), 1
+                ),
+            }
+
+    def _dispatch_loop(self) -> None:
+        """Claim one task per free worker; the only thread that polls the queue table."""
+        try:
+            while True:
+                with self._condition:
+                    while self._accepting and len(self._running) >= self._pool_size:
+                        self._condition.wait()
+                    if not self._accepting:
+                        return
+                    wakeups = self._wakeups
+                try:
+                    claimed = self._claim()
+                except Exception:  # noqa: BLE001
+                    logger.exception("Task claim failed")
+                    claimed = None
+                with self._condition:
+                    if claimed is not None:
+                        task_id, step = claimed
+                        item = _RunningTask(task_id=task_id, step=step)
+                        self._running[task_id] = item
+                        self._handoff.put(item)
+                        continue
+                    if not self._accepting:
+                        return
+                    # Skip the sleep when someone notified while we were claiming.
+                    if wakeups == self._wakeups:
+                        self._condition.wait(timeout=self._poll_interval)
+        finally:
+            for _ in self._workers:
+                self._handoff.put(None)
+
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._handoff.get()
+            if item is None:
+                return
+            try:
+                self._run(item.task_id, item.step)
+            except Exception:  # noqa: BLE001
+                logger.exception("Task %s crashed in scheduler worker", item.task_id)
+            finally:
+                try:
+                    self._on_finished(item.task_id)
+                except Exception:  # noqa: BLE001
+                    logger.exception("Failed to release queue entry for task %s", item.task_id)
+                finally:
+                    with self._condition:
+                        self._running.pop(item.task_id, None)
+                        self._completed += 1
+                        self._wakeups += 1
+                        self._condition.notify_all()
+
+    def _maintenance_loop(self) -> None:
+        while not self._stopped.wait(timeout=self._heartbeat_interval):
+            with self._condition:
+                running_ids = list(self._running)
+            try:
+                self._heartbeat(running_ids)
+                self._recover()
+            except Exception:  # noqa: BLE001
+                logger.exception("Task lease maintenance failed")
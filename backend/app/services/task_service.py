@@ -2,14 +2,21 @@ from __future__ import annotations
 
 import json
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from fastapi import HTTPException
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 
-from app.models.entities import TestTask, User
+from app.core.config import get_settings
+from app.models.entities import TaskQueueEntry, TestTask, TestTaskRule, User
+from app.services.rtd_monitor import ALL_RULES_KEY, get_rtd_monitor_cells, sync_rtd_monitor
+from app.services.task_events import publish_task_event
 from app.services.task_history import record_task_requested
 from app.utils.enums import ActionType, TaskStatus, TaskStep, TestType
+from app.utils.task_payload import TaskPayloadFields, extract_task_payload_fields
+
+settings = get_settings()
 
 
 def _now() -> datetime:
@@ -24,7 +31,9 @@ def create_test_task(
     target_name: str,
     requested_payload: dict,
     current_step: TaskStep,
+    priority: int = 0,
 ) -> TestTask:
+    fields = extract_task_payload_fields(requested_payload)
     duplicate_candidates = (
         db.query(TestTask)
         .filter(
@@ -40,7 +49,7 @@ def create_test_task(
         (
             candidate
             for candidate in duplicate_candidates
-            if _is_same_task_scope(test_type, action_type, requested_payload, candidate.requested_payload_json)
+            if _is_same_task_scope(test_type, action_type, fields, candidate)
         ),
         None,
     )
@@ -57,19 +66,53 @@ def create_test_task(
         current_step=current_step.value,
         message="Task queued",
         requested_payload_json=json.dumps(requested_payload),
+        rule_name=fields.rule_name,
+        rule_file_name=fields.rule_file_name,
+        module_name=fields.module_name,
+        priority=priority,
+        rules=[
+            TestTaskRule(rule_name=rule_name, position=position)
+            for position, rule_name in enumerate(fields.rule_names)
+        ],
         requested_at=_now(),
     )
     db.add(task)
+    sync_rtd_monitor(db, [task])
     db.commit()
     db.refresh(task)
-    record_task_requested(db, task)
+    record_task_requested(task)
     return task
 
 
+def resolve_task_priority(user: User, requested_priority: int) -> int:
+    """Only admins may raise a task above the default priority; anyone may lower theirs."""
+    return requested_priority if user.is_admin else min(requested_priority, 0)
+
+
 def fail_inflight_tasks_on_startup(db: Session) -> int:
+    """Startup pass of `fail_orphaned_tasks()`."""
+    return fail_orphaned_tasks(db, "Marked as FAIL on server startup: backend restarted before completion")
+
+
+def fail_orphaned_tasks(db: Session, message: str = "Marked as FAIL: task lost its queue entry") -> int:
+    """
+    Fail PENDING/RUNNING tasks that lost their durable queue entry.
+
+    Tasks that still have a `task_queue_entries` row are left alone: WAITING
+    ones resume in FIFO order and expired leases go through
+    `recover_expired_leases`. A new task is committed before its entry is
+    inserted (by a BackgroundTask of the request), so only tasks untouched
+    for longer than `task_queue_lease_seconds` count as orphaned; otherwise
+    a second uvicorn worker starting up would fail tasks just being queued.
+    """
+    cutoff = _now() - timedelta(seconds=settings.task_queue_lease_seconds)
     inflight_tasks = (
         db.query(TestTask)
-        .filter(TestTask.status.in_([TaskStatus.PENDING.value, TaskStatus.RUNNING.value]))
+        .filter(
+            TestTask.status.in_([TaskStatus.PENDING.value, TaskStatus.RUNNING.value]),
+            TestTask.updated_at < cutoff,
+            ~exists().where(TaskQueueEntry.task_id == TestTask.task_id),
+        )
         .all()
     )
     if not inflight_tasks:
@@ -82,9 +125,12 @@ def fail_inflight_tasks_on_startup(db: Session) -> int:
         task.ended_at = ended_at
         if was_pending:
             task.started_at = task.started_at or ended_at
-        task.message = "Marked as FAIL on server startup: backend restarted before completion"
+        task.message = message
         db.add(task)
+    sync_rtd_monitor(db, inflight_tasks)
     db.commit()
+    for task in inflight_tasks:
+        publish_task_update(task)
     return len(inflight_tasks)
 
 
@@ -124,52 +170,52 @@ def list_rtd_target_monitor_items(
     if not normalized_targets:
         return []
 
-    tasks = (
-        db.query(TestTask)
-        .filter(
-            TestTask.test_type == TestType.RTD.value,
-            TestTask.target_name.in_(normalized_targets),
-        )
-        .order_by(TestTask.requested_at.desc(), TestTask.id.desc())
-        .all()
+    selected_rules = {
+        target_name: str((rule_selection_map or {}).get(target_name, ALL_RULES_KEY) or "").strip() or ALL_RULES_KEY
+        for target_name in normalized_targets
+    }
+    cells_by_target = get_rtd_monitor_cells(db, selected_rules)
+    raw_download_tasks = _latest_user_rtd_test_tasks(db, current_user_id, selected_rules)
+
+    owner_user_ids = sorted(
+        {
+            active_task.user_id
+            for cells in cells_by_target.values()
+            for active_task, _ in cells.values()
+            if active_task is not None
+        }
     )
-
-    owner_user_ids = sorted({task.user_id for task in tasks})
     user_name_map = {
         user.user_id: user.user_name
         for user in db.query(User).filter(User.user_id.in_(owner_user_ids)).all()
     }
 
-    items: list[dict] = []
-    for target_name in normalized_targets:
-        target_tasks = [task for task in tasks if task.target_name == target_name]
-        selected_rule = (rule_selection_map or {}).get(target_name, "__ALL__")
-        items.append(
-            _build_rtd_target_monitor_item(
-                target_name,
-                target_tasks,
-                current_user_id,
-                user_name_map,
-                selected_rule,
-            )
+    return [
+        _build_rtd_target_monitor_item(
+            target_name,
+            cells_by_target.get(target_name, {}),
+            raw_download_tasks.get(target_name),
+            user_name_map,
+            selected_rules[target_name],
         )
-    return items
+        for target_name in normalized_targets
+    ]
 
 
 def serialize_task(task: TestTask) -> dict:
-    requested_payload = json.loads(task.requested_payload_json or "{}")
-    payload = requested_payload.get("payload") if isinstance(requested_payload.get("payload"), dict) else requested_payload
     return {
         "task_id": task.task_id,
         "test_type": task.test_type,
         "action_type": task.action_type,
         "target_name": task.target_name,
-        "module_name": payload.get("selected_module") or requested_payload.get("module_name"),
-        "rule_name": payload.get("selected_rule") or requested_payload.get("rule_name"),
-        "rule_file_name": payload.get("selected_rule_file_name"),
+        "module_name": task.module_name or None,
+        "rule_name": task.rule_name or None,
+        "rule_file_name": task.rule_file_name or None,
         "status": task.status,
         "current_step": task.current_step,
         "message": task.message,
+        "priority": task.priority or 0,
+        "coalesced_into": task.coalesced_into,
         "requested_at": task.requested_at,
         "started_at": task.started_at,
         "ended_at": task.ended_at,
@@ -178,87 +224,54 @@ def serialize_task(task: TestTask) -> dict:
     }
 
 
+def publish_task_update(task: TestTask) -> None:
+    """Push the current task row to the owner's task stream."""
+    publish_task_event(serialize_task(task), task.user_id)
+
+
+def get_task_rule_names(task: TestTask) -> list[str]:
+    """Rules covered by the task, in selected_rule_targets order."""
+    return [rule.rule_name for rule in task.rules]
+
+
+def get_task_primary_rule_name(task: TestTask) -> str:
+    """selected_rule if set, otherwise the first selected rule target."""
+    if task.rule_name:
+        return task.rule_name
+    return task.rules[0].rule_name if task.rules else ""
+
+
 def _is_same_task_scope(
     test_type: TestType,
     action_type: ActionType,
-    requested_payload: dict,
-    existing_requested_payload_json: str,
+    fields: TaskPayloadFields,
+    existing_task: TestTask,
 ) -> bool:
     if test_type != TestType.RTD or action_type not in {ActionType.TEST, ActionType.RETEST}:
         return True
 
-    try:
-        existing_requested_payload = json.loads(existing_requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return False
-
-    return _extract_rtd_primary_rule_name(requested_payload) == _extract_rtd_primary_rule_name(existing_requested_payload)
-
-
-def _extract_rtd_primary_rule_name(requested_payload: dict) -> str:
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    selected_rule = str(
-        nested_payload.get("selected_rule")
-        or requested_payload.get("rule_name")
-        or ""
-    ).strip()
-    if selected_rule:
-        return selected_rule
-
-    selected_rule_targets = (
-        nested_payload.get("selected_rule_targets")
-        if isinstance(nested_payload.get("selected_rule_targets"), list)
-        else []
-    )
-    for item in selected_rule_targets:
-        rule_name = str(item.get("rule_name", "")).strip()
-        if rule_name:
-            return rule_name
-    return ""
+    requested_primary_rule_name = fields.rule_name or (fields.rule_names[0] if fields.rule_names else "")
+    return requested_primary_rule_name == get_task_primary_rule_name(existing_task)
 
 
 def _build_rtd_target_monitor_item(
     target_name: str,
-    target_tasks: list[TestTask],
-    current_user_id: str,
+    cells: dict[str, tuple[TestTask | None, TestTask | None]],
+    latest_user_test_task: TestTask | None,
     user_name_map: dict[str, str],
-    selected_rule: str = "__ALL__",
+    selected_rule: str = ALL_RULES_KEY,
 ) -> dict:
-    filtered_tasks = _filter_rtd_tasks_by_selected_rule(target_tasks, selected_rule)
-
-    active_task = next((task for task in filtered_tasks if task.status == TaskStatus.RUNNING.value), None)
-    if active_task is None:
-        active_task = next((task for task in filtered_tasks if task.status == TaskStatus.PENDING.value), None)
-
-    latest_copy_task = _select_latest_task_for_actions(
-        filtered_tasks,
-        [ActionType.COPY.value],
-        include_finished=True,
-    )
-    latest_sync_task = _select_latest_task_for_actions(
-        filtered_tasks,
-        [ActionType.SYNC.value],
-        include_finished=True,
-    )
-    latest_compile_task = _select_latest_task_for_actions(filtered_tasks, [ActionType.COMPILE.value])
-    latest_test_task = _select_latest_task_for_actions(
-        filtered_tasks,
-        [ActionType.TEST.value, ActionType.RETEST.value],
+    active_tasks = [active_task for active_task, _ in cells.values() if active_task is not None]
+    active_task = max(
+        active_tasks,
+        key=lambda task: (task.status == TaskStatus.RUNNING.value, task.requested_at, task.id),
+        default=None,
     )
 
-    latest_user_test_task = next(
-        (
-            task
-            for task in filtered_tasks
-            if task.user_id == current_user_id
-            and task.action_type in {ActionType.TEST.value, ActionType.RETEST.value}
-        ),
-        None,
-    )
+    def shown_task(action_group: str) -> TestTask | None:
+        cell_active_task, latest_finished_task = cells.get(action_group, (None, None))
+        return cell_active_task or latest_finished_task
+
     raw_download_task = (
         latest_user_test_task
         if latest_user_test_task is not None and bool(latest_user_test_task.raw_result_path)
@@ -269,10 +282,10 @@ def _build_rtd_target_monitor_item(
         "target_name": target_name,
         "status": active_task.status if active_task else "IDLE",
         "status_text": _build_current_status_text(active_task, user_name_map),
-        "copy": _serialize_monitor_action(latest_copy_task, "복사"),
-        "sync": _serialize_monitor_action(latest_sync_task, "Sync"),
-        "compile": _serialize_monitor_action(latest_compile_task, "컴파일"),
-        "test": _serialize_monitor_action(latest_test_task, "테스트"),
+        "copy": _serialize_monitor_action(shown_task(ActionType.COPY.value), "복사"),
+        "sync": _serialize_monitor_action(shown_task(ActionType.SYNC.value), "Sync"),
+        "compile": _serialize_monitor_action(shown_task(ActionType.COMPILE.value), "컴파일"),
+        "test": _serialize_monitor_action(shown_task(ActionType.TEST.value), "테스트"),
         "selected_rule": selected_rule,
         "raw_download": {
             "enabled": bool(raw_download_task),
@@ -282,40 +295,26 @@ def _build_rtd_target_monitor_item(
     }
 
 
-def _filter_rtd_tasks_by_selected_rule(target_tasks: list[TestTask], selected_rule: str) -> list[TestTask]:
-    normalized_selected_rule = str(selected_rule or "").strip()
-    if not normalized_selected_rule or normalized_selected_rule == "__ALL__":
-        return target_tasks
-
-    filtered: list[TestTask] = []
-    for task in target_tasks:
-        rule_names = _extract_rtd_task_rule_names(task)
-        if normalized_selected_rule in rule_names:
-            filtered.append(task)
-    return filtered
-
-
-def _extract_rtd_task_rule_names(task: TestTask) -> set[str]:
-    try:
-        requested_payload = json.loads(task.requested_payload_json or "{}")
-    except (json.JSONDecodeError, ValueError):
-        return set()
-
-    nested_payload = (
-        requested_payload.get("payload")
-        if isinstance(requested_payload.get("payload"), dict)
-        else requested_payload
-    )
-    selected_rule_targets = nested_payload.get("selected_rule_targets", [])
-    rule_names = {
-        str(item.get("rule_name", "")).strip()
-        for item in selected_rule_targets
-        if str(item.get("rule_name", "")).strip()
-    }
-    fallback_rule_name = str(requested_payload.get("rule_name", "")).strip()
-    if fallback_rule_name:
-        rule_names.add(fallback_rule_name)
-    return rule_names
+def _latest_user_rtd_test_tasks(
+    db: Session,
+    user_id: str,
+    selected_rules: dict[str, str],
+) -> dict[str, TestTask]:
+    """The current user's newest TEST/RETEST task per target (raw download button)."""
+    result: dict[str, TestTask] = {}
+    for target_name, selected_rule in selected_rules.items():
+        query = db.query(TestTask).filter(
+            TestTask.user_id == user_id,
+            TestTask.test_type == TestType.RTD.value,
+            TestTask.target_name == target_name,
+            TestTask.action_type.in_([ActionType.TEST.value, ActionType.RETEST.value]),
+        )
+        if selected_rule != ALL_RULES_KEY:
+            query = query.filter(TestTask.rules.any(TestTaskRule.rule_name == selected_rule))
+        task = query.order_by(TestTask.requested_at.desc(), TestTask.id.desc()).first()
+        if task is not None:
+            result[target_name] = task
+    return result
 
 
 def _build_current_status_text(task: TestTask | None, user_name_map: dict[str, str]) -> str:
@@ -333,31 +332,6 @@ def _build_current_status_text(task: TestTask | None, user_name_map: dict[str, s
     return f"{action_label} {suffix} ({owner_name})"
 
 
-def _select_latest_task_for_actions(
-    target_tasks: list[TestTask],
-    action_types: list[str],
-    include_finished: bool = True,
-) -> TestTask | None:
-    running_task = next(
-        (task for task in target_tasks if task.action_type in action_types and task.status == TaskStatus.RUNNING.value),
-        None,
-    )
-    if running_task is not None:
-        return running_task
-
-    pending_task = next(
-        (task for task in target_tasks if task.action_type in action_types and task.status == TaskStatus.PENDING.value),
-        None,
-    )
-    if pending_task is not None:
-        return pending_task
-
-    if not include_finished:
-        return None
-
-    return next((task for task in target_tasks if task.action_type in action_types), None)
-
-
 def _serialize_monitor_action(task: TestTask | None, label: str) -> dict:
     if task is None:
         return {
@@ -384,4 +358,6 @@ def _task_status_text(status: str) -> str:
         return "성공"
     if status == TaskStatus.FAIL.value:
         return "실패"
+    if status == TaskStatus.CANCELED.value:
+        return "취소"
     return status
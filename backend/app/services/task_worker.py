@@ -3,41 +3,62 @@ from __future__ import annotations
 """
 Background task worker.
 
-Tasks run in daemon threads. Each worker opens its own SQLAlchemy session,
-acquires any required serialization queues (per RTD line / ezDFS module),
-dispatches to the appropriate `*_custom.py` action, persists the result,
-and writes a raw result file when applicable.
+Queued tasks are persisted as `task_queue_entries` rows (per RTD line / ezDFS
+module serialization) and executed by a bounded `TaskScheduler`. A pool worker
+leases a task only once its queue keys are free, then opens its own
+SQLAlchemy session, dispatches to the appropriate `*_custom.py` action,
+persists the result, and writes a raw result file when applicable. SYNC
+tasks leased together with it (coalesced) get the same result.
 """
 
 import json
-import threading
+import os
+import socket
+import uuid
 from datetime import datetime, timezone
 
-from fastapi import BackgroundTasks
+from fastapi import BackgroundTasks, HTTPException
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.core.exceptions import TaskCanceledError
 from app.db.session import SessionLocal
 from app.models.entities import TestTask
 from app.services import ezdfs_execution_custom, rtd_execution_custom
+from app.services.catalog_cache import invalidate_ezdfs_catalog, invalidate_rtd_catalog
 from app.services.file_service import generate_raw_file
+from app.services.raw_capture import discard_task_raw_capture, load_captured_rule_files
 from app.services.rtd_execution_custom import (
     execute_compile_action,
     execute_copy_action,
     execute_sync_action,
 )
+from app.services.rtd_monitor import sync_rtd_monitor
 from app.services.task_queue import (
     build_rtd_queue_key,
-    enter_ezdfs_module_queue,
-    enter_rtd_line_queue,
-    extract_ezdfs_module_name,
-    leave_ezdfs_module_queue,
-    leave_rtd_line_queue,
+    cancel_waiting_entry,
+    claim_next_task,
+    complete_task,
+    enqueue_task,
+    get_queue_stats,
+    heartbeat_tasks,
+    is_cancel_requested,
+    list_coalesced_task_ids,
+    recover_expired_leases,
+    request_entry_cancel,
     requires_ezdfs_module_queue,
     requires_rtd_line_queue,
-    wait_for_ezdfs_module_turn,
-    wait_for_rtd_line_turn,
 )
+from app.services.task_cancellation import cancel_local_task, register_task, unregister_task
+from app.services.task_scheduler import TaskScheduler
+from app.services.task_service import fail_orphaned_tasks, publish_task_update
 from app.utils.enums import ActionType, TaskStatus, TaskStep, TestType
+from app.utils.naming import normalize_target_line_name
+
+settings = get_settings()
+
+# Identifies this process as lease owner; unique across uvicorn workers and restarts.
+_WORKER_OWNER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 
 
 def queue_task(
@@ -46,61 +67,139 @@ def queue_task(
     step: TaskStep,
     test_type: TestType,
 ) -> None:
-    background_tasks.add_task(_start_task_thread, task_id, step.value, test_type.value)
+    background_tasks.add_task(_schedule_task, task_id, step.value)
 
 
-def _start_task_thread(task_id: str, step: str, test_type: str) -> None:
-    worker = threading.Thread(
-        target=run_task,
-        args=(task_id, step),
-        daemon=True,
-        name=f"{test_type.lower()}-task-{task_id[:8]}",
-    )
-    worker.start()
+def start_task_scheduler() -> None:
+    """Start the worker pool; queued entries left by a previous run resume in FIFO order."""
+    _scheduler.start()
+    _scheduler.notify()
 
 
-def run_task(task_id: str, step: str) -> None:
+def get_task_scheduler_stats(db: Session) -> dict[str, object]:
+    """Pool usage and per-queue depth, for the admin monitoring API."""
+    return {
+        **_scheduler.stats(),
+        **get_queue_stats(db),
+        "owner": _WORKER_OWNER_ID,
+    }
+
+
+def shutdown_task_scheduler() -> bool:
+    """Stop claiming and let running tasks finish (bounded by settings)."""
+    return _scheduler.shutdown(settings.task_worker_drain_timeout_seconds)
+
+
+def cancel_task(db: Session, task: TestTask) -> TestTask:
+    """
+    Cancel a task on behalf of its owner.
+
+    A task still waiting in its line / module queue (or not queued yet) is
+    removed and marked CANCELED at once, so the tasks behind it can be claimed. A running TEST /
+    RETEST is flagged on its queue entry and, when it runs in this process,
+    signalled directly; its worker kills the remote process group and records
+    CANCELED with the output captured so far.
+    """
+    if task.status == TaskStatus.PENDING.value and cancel_waiting_entry(db, task):
+        _scheduler.notify()
+        return task
+    if task.status not in {TaskStatus.PENDING.value, TaskStatus.RUNNING.value}:
+        raise HTTPException(status_code=409, detail="Task is already finished")
+    if task.action_type not in {ActionType.TEST.value, ActionType.RETEST.value}:
+        raise HTTPException(status_code=409, detail="Only TEST / RETEST tasks can be canceled while running")
+    if not request_entry_cancel(db, task.task_id):
+        raise HTTPException(status_code=409, detail="Task is already finished")
+
+    cancel_local_task(task.task_id)
+    db.refresh(task)
+    if task.status in {TaskStatus.PENDING.value, TaskStatus.RUNNING.value}:
+        task.message = "Cancel requested"
+        db.add(task)
+        db.commit()
+        db.refresh(task)
+        publish_task_update(task)
+    return task
+
+
+def _schedule_task(task_id: str, step: str) -> None:
+    """Persist the task's queue entry and wake the worker pool."""
     db = SessionLocal()
-    ezdfs_module_name = ""
-    ezdfs_queue_acquired = False
-    rtd_queue_key = ""
-    rtd_queue_acquired = False
     try:
         task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
         if task is None:
             return
 
-        payload = json.loads(task.requested_payload_json or "{}")
-        if requires_rtd_line_queue(task):
-            rtd_queue_key = build_rtd_queue_key(task.user_id, task.target_name)
-            enter_rtd_line_queue(db, task, rtd_queue_key)
-            wait_for_rtd_line_turn(task.task_id, rtd_queue_key)
-            rtd_queue_acquired = True
-        if requires_ezdfs_module_queue(task, payload):
-            ezdfs_module_name = extract_ezdfs_module_name(payload)
-            enter_ezdfs_module_queue(db, task, ezdfs_module_name)
-            wait_for_ezdfs_module_turn(task.task_id, ezdfs_module_name)
-            ezdfs_queue_acquired = True
+        rtd_queue_key = build_rtd_queue_key(task.user_id, task.target_name) if requires_rtd_line_queue(task) else None
+        ezdfs_module_name = task.module_name if requires_ezdfs_module_queue(task) else None
+        enqueue_task(db, task, step, rtd_queue_key, ezdfs_module_name)
+    finally:
+        db.close()
+    # While draining the entry simply stays queued for the next start.
+    _scheduler.notify()
+
 
+def _claim_task() -> tuple[str, str] | None:
+    claimed = claim_next_task(_WORKER_OWNER_ID)
+    return (claimed.task_id, claimed.step) if claimed else None
+
+
+def _heartbeat_tasks(task_ids: list[str]) -> None:
+    # Cancel requests handled by another uvicorn worker arrive with the heartbeat.
+    for task_id in heartbeat_tasks(_WORKER_OWNER_ID, task_ids):
+        cancel_local_task(task_id)
+
+
+def _recover_expired_leases() -> None:
+    db = SessionLocal()
+    try:
+        recovered = recover_expired_leases(db)
+        # Tasks whose enqueue never ran (the process died between commit and BackgroundTask).
+        fail_orphaned_tasks(db)
+    finally:
+        db.close()
+    if recovered:
+        _scheduler.notify()
+
+
+def run_task(task_id: str, step: str) -> None:
+    """Execute one task whose queue entry this process has leased."""
+    cancel_token = register_task(task_id)
+    db = SessionLocal()
+    try:
         task = db.query(TestTask).filter(TestTask.task_id == task_id).first()
         if task is None:
             return
 
+        payload = json.loads(task.requested_payload_json or "{}")
         task.status = TaskStatus.RUNNING.value
         task.current_step = step
         task.started_at = datetime.now(timezone.utc)
         task.message = f"{task.action_type.title()} in progress"
         db.add(task)
+        coalesced_tasks = _start_coalesced_tasks(db, task)
+        sync_rtd_monitor(db, [task, *coalesced_tasks])
         db.commit()
         db.refresh(task)
+        publish_task_update(task)
+        for coalesced_task in coalesced_tasks:
+            publish_task_update(coalesced_task)
+        if is_cancel_requested(task_id):
+            cancel_token.cancel()
 
         try:
-            execution_result = _run_custom_action(db, task, payload)
+            try:
+                execution_result = _run_custom_action(db, task, payload)
+            finally:
+                # Before DONE/FAIL is published, so clients reloading on the event see fresh files.
+                _invalidate_touched_catalog(task)
             task.message = execution_result["message"]
+            if coalesced_tasks:
+                task.message += f"\ncoalesced_tasks={len(coalesced_tasks)}"
             task.status = TaskStatus.DONE.value
             task.current_step = step
             task.ended_at = datetime.now(timezone.utc)
             db.add(task)
+            sync_rtd_monitor(db, [task])
             db.commit()
             db.refresh(task)
 
@@ -114,20 +213,80 @@ def run_task(task_id: str, step: str) -> None:
                     task,
                     raw_output,
                     execution_result.get("raw_outputs_by_rule"),
+                    execution_result.get("raw_files_by_rule"),
                 )
+            publish_task_update(task)
+        except TaskCanceledError:
+            task.status = TaskStatus.CANCELED.value
+            task.current_step = step
+            task.ended_at = datetime.now(timezone.utc)
+            task.message = "Canceled by user"
+            db.add(task)
+            sync_rtd_monitor(db, [task])
+            db.commit()
+            db.refresh(task)
+            captured_rule_files = load_captured_rule_files(task)
+            if captured_rule_files:
+                # Keep what the test printed before it was stopped.
+                generate_raw_file(db, task, "", None, captured_rule_files)
+            publish_task_update(task)
         except Exception as exc:  # noqa: BLE001
+            discard_task_raw_capture(task)
             task.status = TaskStatus.FAIL.value
             task.current_step = step
             task.ended_at = datetime.now(timezone.utc)
             task.message = str(exc)
             db.add(task)
+            sync_rtd_monitor(db, [task])
             db.commit()
+            publish_task_update(task)
+        _finish_coalesced_tasks(db, task, coalesced_tasks)
     finally:
-        if rtd_queue_acquired and rtd_queue_key:
-            leave_rtd_line_queue(task_id, rtd_queue_key)
-        if ezdfs_queue_acquired and ezdfs_module_name:
-            leave_ezdfs_module_queue(task_id, ezdfs_module_name)
         db.close()
+        unregister_task(task_id)
+
+
+def _start_coalesced_tasks(db: Session, task: TestTask) -> list[TestTask]:
+    """Mark the SYNC tasks leased together with `task` as running on its execution."""
+    coalesced_task_ids = list_coalesced_task_ids(db, task.task_id)
+    if not coalesced_task_ids:
+        return []
+    coalesced_tasks = db.query(TestTask).filter(TestTask.task_id.in_(coalesced_task_ids)).all()
+    for coalesced_task in coalesced_tasks:
+        coalesced_task.status = TaskStatus.RUNNING.value
+        coalesced_task.current_step = task.current_step
+        coalesced_task.started_at = task.started_at
+        coalesced_task.coalesced_into = task.task_id
+        coalesced_task.message = f"{task.action_type.title()} in progress (coalesced)"
+        db.add(coalesced_task)
+    return coalesced_tasks
+
+
+def _finish_coalesced_tasks(db: Session, task: TestTask, coalesced_tasks: list[TestTask]) -> None:
+    """Give coalesced tasks the result of the one remote run that completed them."""
+    if not coalesced_tasks:
+        return
+    shared_message = (task.message or "").removesuffix(f"\ncoalesced_tasks={len(coalesced_tasks)}")
+    for coalesced_task in coalesced_tasks:
+        coalesced_task.status = task.status
+        coalesced_task.ended_at = task.ended_at
+        coalesced_task.message = f"{shared_message}\ncoalesced_into={task.task_id}"
+        db.add(coalesced_task)
+    sync_rtd_monitor(db, coalesced_tasks)
+    db.commit()
+    for coalesced_task in coalesced_tasks:
+        db.refresh(coalesced_task)
+        publish_task_update(coalesced_task)
+
+
+def _invalidate_touched_catalog(task: TestTask) -> None:
+    """Drop the shared catalog of a directory a COPY / SYNC may have changed (even on failure)."""
+    if task.action_type not in {ActionType.COPY.value, ActionType.SYNC.value}:
+        return
+    if task.test_type == TestType.RTD.value:
+        invalidate_rtd_catalog(normalize_target_line_name(task.target_name))
+    elif task.test_type == TestType.EZDFS.value:
+        invalidate_ezdfs_catalog(task.module_name)
 
 
 def _run_custom_action(db: Session, task: TestTask, payload: dict) -> dict[str, str]:
@@ -148,3 +307,15 @@ def _run_custom_action(db: Session, task: TestTask, payload: dict) -> dict[str,
             return ezdfs_execution_custom.execute_test_action(db, task, payload)
 
     return {"message": f"{task.action_type.title()} completed", "raw_output": ""}
+
+
+_scheduler = TaskScheduler(
+    claim=_claim_task,
+    run=run_task,
+    on_finished=complete_task,
+    heartbeat=_heartbeat_tasks,
+    recover=_recover_expired_leases,
+    pool_size=settings.task_worker_pool_size,
+    poll_interval=settings.task_queue_poll_interval_seconds,
+    heartbeat_interval=max(1.0, settings.task_queue_lease_seconds / 3),
+)
@@ -3,6 +3,8 @@ from __future__ import annotations
 """Shared SSH helper functions used across custom execution/catalog modules."""
 
 import shlex
+import time
+from collections.abc import Callable
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -46,6 +48,190 @@ def run_remote_command(
     return output
 
 
+_PGID_MARKER = b"__ATM_PGID__="
+
+
+def stream_remote_command(
+    host: HostConfig,
+    login_user: str,
+    remote_command: str,
+    on_stdout: Callable[[bytes], None],
+    on_stderr: Callable[[bytes], None],
+    timeout: int = 1200,
+    chunk_size: int = 32 * 1024,
+    should_cancel: Callable[[], bool] | None = None,
+) -> int:
+    """
+    Run an already-built remote command and hand stdout / stderr chunks to
+    the callbacks as they arrive, instead of buffering the whole output.
+
+    Returns the exit status. SSH failures and ``timeout`` seconds without any
+    output or exit raise SSHConnectionError; a non-zero exit status is left
+    to the caller.
+
+    The command first reports its process group id on stderr (filtered out
+    before ``on_stderr``). On the idle timeout, and once ``should_cancel()``
+    is true, the whole remote process group is killed over the same
+    transport and the channel is closed, so nothing keeps running after the
+    line / module queue is released; a cancel raises TaskCanceledError.
+    """
+    from app.core.exceptions import SSHConnectionError, TaskCanceledError
+    from app.services.ssh_runtime import open_limited_ssh_client
+
+    remote_command = build_clean_bash_command(
+        f"echo {_PGID_MARKER.decode()}$(ps -o pgid= -p $$ | tr -d ' ') >&2; exec {remote_command}"
+    )
+    stderr_filter = _PgidStderrFilter(on_stderr)
+    on_stderr = stderr_filter.write
+
+    deadline = time.monotonic() + timeout
+    try:
+        with open_limited_ssh_client(host, login_user) as client:
+            _, stdout, _ = client.exec_command(remote_command, timeout=timeout)
+            channel = stdout.channel
+            while True:
+                if should_cancel is not None and should_cancel():
+                    _kill_remote_process_group(client, stderr_filter.pgid)
+                    channel.close()
+                    raise TaskCanceledError(f"Canceled on host={host.name}")
+                # One chunk per stream and pass, so a chatty command still sees the cancel check.
+                received = False
+                if channel.recv_ready():
+                    on_stdout(channel.recv(chunk_size))
+                    received = True
+                if channel.recv_stderr_ready():
+                    on_stderr(channel.recv_stderr(chunk_size))
+                    received = True
+                if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                    break
+                if received:
+                    deadline = time.monotonic() + timeout
+                elif time.monotonic() > deadline:
+                    _kill_remote_process_group(client, stderr_filter.pgid)
+                    channel.close()
+                    raise TimeoutError(f"no output for {timeout}s")
+                else:
+                    time.sleep(0.05)
+            return channel.recv_exit_status()
+    except (SSHConnectionError, OSError) as exc:
+        raise SSHConnectionError(f"Remote command failed on host={host.name}: {exc}") from exc
+
+
+def collect_remote_command(
+    host: HostConfig,
+    login_user: str,
+    remote_command: str,
+    timeout: int = 1200,
+    should_cancel: Callable[[], bool] | None = None,
+) -> tuple[int, str, str]:
+    """
+    ``stream_remote_command`` that keeps stdout / stderr in memory.
+
+    Returns ``(exit_status, stdout, stderr)`` with both texts trimmed. Used
+    when raw output streaming is off, so a canceled task still kills the
+    remote process group instead of running to the end.
+    """
+    stdout_buffer = bytearray()
+    stderr_buffer = bytearray()
+    exit_status = stream_remote_command(
+        host,
+        login_user,
+        remote_command,
+        stdout_buffer.extend,
+        stderr_buffer.extend,
+        timeout=timeout,
+        should_cancel=should_cancel,
+    )
+    return (
+        exit_status,
+        stdout_buffer.decode("utf-8", errors="ignore").strip(),
+        stderr_buffer.decode("utf-8", errors="ignore").strip(),
+    )
+
+
+class _PgidStderrFilter:
+    """Strips the leading process group marker line from stderr and remembers the id."""
+
+    def __init__(self, on_stderr: Callable[[bytes], None]) -> None:
+        self._on_stderr = on_stderr
+        self._pending = bytearray()
+        self._done = False
+        self.pgid: int | None = None
+
+    def write(self, data: bytes) -> None:
+        if self._done:
+            self._on_stderr(data)
+            return
+        self._pending.extend(data)
+        line, newline, rest = bytes(self._pending).partition(b"\n")
+        if not newline and len(self._pending) < 128:
+            return
+        self._done = True
+        self._pending.clear()
+        if line.startswith(_PGID_MARKER) and line[len(_PGID_MARKER):].strip().isdigit():
+            self.pgid = int(line[len(_PGID_MARKER):].strip())
+            if rest:
+                self._on_stderr(rest)
+        else:
+            self._on_stderr(line + newline + rest)
+
+
+def _kill_remote_process_group(client: object, pgid: int | None) -> None:
+    """TERM, then KILL after a grace period, the remote process group (best effort)."""
+    if not pgid or pgid <= 1:
+        return
+    command = build_clean_bash_command(
+        f"kill -TERM -- -{pgid} 2>/dev/null; sleep 2; kill -KILL -- -{pgid} 2>/dev/null; true"
+    )
+    try:
+        _, stdout, _ = client.exec_command(command, timeout=10)
+        stdout.channel.recv_exit_status()
+    except OSError:
+        pass
+
+
+def stat_remote_files(client: object, paths: list[str], timeout: int = 10) -> dict[str, tuple[int, str, str]]:
+    """
+    `{path: (size, mtime, inode)}` of the paths that are regular files, in one round trip.
+
+    Symlinks are followed (`find -L`), so a source that links to a regular
+    file is reported with its target's stamp; missing paths are left out.
+    """
+    if not paths:
+        return {}
+    quoted_paths = " ".join(shlex.quote(path) for path in paths)
+    command = build_clean_bash_command(
+        f"find -L {quoted_paths} -maxdepth 0 -type f -printf '%s %T@ %i %p\\n' 2>/dev/null; true"
+    )
+    _, stdout, _ = client.exec_command(command, timeout=timeout)
+    stdout.channel.recv_exit_status()
+    output = stdout.read().decode("utf-8", errors="ignore")
+
+    stamps: dict[str, tuple[int, str, str]] = {}
+    for line in output.splitlines():
+        parts = line.split(" ", 3)
+        if len(parts) != 4 or not parts[0].isdigit():
+            continue
+        size, mtime, inode, path = parts
+        stamps[path] = (int(size), mtime, inode)
+    return stamps
+
+
+def read_remote_files_over_sftp(client: object, paths: list[str]) -> dict[str, bytes]:
+    """Read whole remote files as bytes over one SFTP session of `client`."""
+    if not paths:
+        return {}
+    sftp = client.open_sftp()
+    try:
+        result: dict[str, bytes] = {}
+        for path in paths:
+            with sftp.open(path, "rb") as remote_file:
+                result[path] = remote_file.read()
+        return result
+    finally:
+        sftp.close()
+
+
 def extract_session_payload(payload: dict) -> dict:
     """Return the nested session payload when the API wrapper uses a ``payload`` key."""
     nested_payload = payload.get("payload")
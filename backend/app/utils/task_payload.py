@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+"""
+Extraction of the indexed fields of a task request payload.
+
+RTD requests look like `{"target_lines": [...], "payload": {<session>}}` and
+ezDFS requests like `{"module_name", "rule_name", "payload": {<session>}}`.
+`create_test_task()` stores the result on `test_tasks` / `test_task_rules`
+once, and the legacy backfill in `app.db.session` reuses the same rules, so
+listing code never has to parse `requested_payload_json` again.
+"""
+
+import json
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class TaskPayloadFields:
+    rule_name: str
+    rule_file_name: str
+    module_name: str
+    # selected_rule_targets 순서, 없으면 [rule_name]
+    rule_names: tuple[str, ...]
+
+
+def parse_requested_payload(requested_payload_json: str | None) -> dict:
+    try:
+        requested_payload = json.loads(requested_payload_json or "{}")
+    except (json.JSONDecodeError, ValueError):
+        return {}
+    return requested_payload if isinstance(requested_payload, dict) else {}
+
+
+def extract_task_payload_fields(requested_payload: dict) -> TaskPayloadFields:
+    nested_payload = (
+        requested_payload.get("payload")
+        if isinstance(requested_payload.get("payload"), dict)
+        else requested_payload
+    )
+    rule_name = str(nested_payload.get("selected_rule") or requested_payload.get("rule_name") or "").strip()
+    module_name = str(requested_payload.get("module_name") or nested_payload.get("selected_module") or "").strip()
+    rule_file_name = str(nested_payload.get("selected_rule_file_name") or "").strip()
+
+    selected_rule_targets = (
+        nested_payload.get("selected_rule_targets")
+        if isinstance(nested_payload.get("selected_rule_targets"), list)
+        else []
+    )
+    rule_names = list(
+        dict.fromkeys(
+            str(item.get("rule_name") or "").strip()
+            for item in selected_rule_targets
+            if isinstance(item, dict) and str(item.get("rule_name") or "").strip()
+        )
+    )
+    if not rule_names and rule_name:
+        rule_names = [rule_name]
+
+    return TaskPayloadFields(
+        rule_name=rule_name,
+        rule_file_name=rule_file_name,
+        module_name=module_name,
+        rule_names=tuple(rule_names),
+    )
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+"""Streaming ZIP writer for download endpoints."""
+
+import zipfile
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+ZIP_READ_CHUNK_SIZE = 64 * 1024
+
+ZipEntry = tuple[str, Path | bytes]
+
+
+class _ChunkSink:
+    """Non-seekable file object collecting what `ZipFile` writes until it is drained.
+
+    Because `tell()` / `seek()` are unavailable, `ZipFile` writes sizes and CRC
+    in data descriptors after each member instead of seeking back.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def write(self, data: bytes) -> int:
+        self._buffer.extend(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_zip_stream(entries: Iterable[ZipEntry], chunk_size: int = ZIP_READ_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield a deflated ZIP archive of `(arcname, path or bytes)` entries piece by piece.
+
+    Files are read in `chunk_size` blocks and compressed output is yielded as
+    soon as it is produced, so memory stays bounded by one chunk plus the
+    deflate window regardless of archive size. Paths that vanished before
+    being read (e.g. removed by retention) are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, source in entries:
+            if isinstance(source, bytes):
+                archive.writestr(arcname, source)
+            else:
+                try:
+                    source_file = source.open("rb")
+                except FileNotFoundError:
+                    continue
+                with source_file:
+                    info = zipfile.ZipInfo.from_file(source, arcname)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                    with archive.open(info, mode="w") as member:
+                        while chunk := source_file.read(chunk_size):
+                            member.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
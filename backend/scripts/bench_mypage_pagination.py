@@ -0,0 +1,213 @@
+"""
+MyPage result list benchmark.
+
+Builds a synthetic SQLite DB (default 100k tasks over 10 users; the heaviest
+user owns half of them and every RTD task covers 3 rules), then times each
+paginated MyPage list endpoint for that user. Exits 1 when the median of any
+list goes over the response-time budget (default 100 ms).
+
+    cd backend
+    python scripts/bench_mypage_pagination.py
+    python scripts/bench_mypage_pagination.py --db /tmp/mypage-bench.db  # reuse between runs
+
+The DB is created from the app models, so it always has the indexes the
+running backend would have.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", help="SQLite file to use; generated when missing (default: temp file)")
+    parser.add_argument("--tasks", type=int, default=100_000, help="total tasks to generate")
+    parser.add_argument("--users", type=int, default=10, help="users to spread the tasks over")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="per-list median budget")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per list")
+    return parser.parse_args()
+
+
+args = _parse_args()
+db_path = Path(args.db) if args.db else Path(tempfile.mkdtemp(prefix="mypage-bench-")) / "bench.db"
+# Settings are read at import time, so the DB has to be chosen before importing app.
+os.environ["DB_PATH"] = str(db_path)
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.api import mypage  # noqa: E402
+from app.db.session import SessionLocal, engine, init_db  # noqa: E402
+from app.models.entities import TestTask, TestTaskRule, User  # noqa: E402
+from app.utils.enums import ActionType, TaskStatus, TaskStep, TestType  # noqa: E402
+
+_INSERT_CHUNK = 5_000
+_RULES_PER_RTD_TASK = 3
+_LINES = [f"LINE{index:02d}" for index in range(8)]
+_RULES = [f"RULE_{index:03d}" for index in range(60)]
+_MODULES = [f"MODULE{index:02d}" for index in range(6)]
+
+
+def _task_counts(total: int, users: int) -> list[int]:
+    """The first user owns half of the tasks; the rest share the other half."""
+    if users <= 1:
+        return [total]
+    heavy = total // 2
+    rest, extra = divmod(total - heavy, users - 1)
+    return [heavy] + [rest + (1 if index < extra else 0) for index in range(users - 1)]
+
+
+def _generate(total: int, users: int) -> None:
+    now = datetime.now(timezone.utc)
+    user_ids = [f"bench{index:02d}" for index in range(users)]
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [
+                {
+                    "user_id": user_id,
+                    "password_hash": "-",
+                    "user_name": user_id,
+                    "module_name": "BENCH",
+                    "is_admin": False,
+                    "is_approved": True,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for user_id in user_ids
+            ],
+        )
+
+    serial = 0
+    for user_id, count in zip(user_ids, _task_counts(total, users)):
+        for start in range(0, count, _INSERT_CHUNK):
+            tasks: list[dict] = []
+            rules: list[dict] = []
+            for _ in range(start, min(count, start + _INSERT_CHUNK)):
+                serial += 1
+                task_id = f"bench-{serial:07d}"
+                requested_at = now - timedelta(minutes=serial % (90 * 24 * 60))
+                is_rtd = serial % 10 < 7
+                action = ActionType.RETEST if serial % 7 == 0 else ActionType.TEST
+                if serial % 13 == 0:
+                    action = ActionType.COPY if is_rtd else ActionType.SYNC
+                rule_names = (
+                    [_RULES[(serial + step) % len(_RULES)] for step in range(_RULES_PER_RTD_TASK)]
+                    if is_rtd
+                    else [_RULES[serial % len(_RULES)]]
+                )
+                test_type = TestType.RTD if is_rtd else TestType.EZDFS
+                tasks.append(
+                    {
+                        "task_id": task_id,
+                        "test_type": test_type.value,
+                        "action_type": action.value,
+                        "user_id": user_id,
+                        "target_name": _LINES[serial % len(_LINES)] if is_rtd else _MODULES[serial % len(_MODULES)],
+                        "status": TaskStatus.FAIL.value if serial % 17 == 0 else TaskStatus.DONE.value,
+                        "current_step": TaskStep.TESTING.value,
+                        "message": "",
+                        "requested_payload_json": "{}",
+                        "rule_name": rule_names[0],
+                        "rule_file_name": "",
+                        "module_name": "" if is_rtd else _MODULES[serial % len(_MODULES)],
+                        "priority": 0,
+                        "raw_result_path": f"/bench/{task_id}/raw.txt",
+                        "summary_result_path": None,
+                        "requested_at": requested_at,
+                        "started_at": requested_at,
+                        "ended_at": requested_at + timedelta(seconds=30),
+                        "created_at": requested_at,
+                        "updated_at": requested_at,
+                    }
+                )
+                rules.extend(
+                    {"task_id": task_id, "rule_name": rule_name, "position": position}
+                    for position, rule_name in enumerate(rule_names)
+                )
+            with engine.begin() as connection:
+                connection.execute(insert(TestTask), tasks)
+                connection.execute(insert(TestTaskRule), rules)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("ANALYZE")
+    # Pooled connections keep the plans they prepared before ANALYZE; start fresh like a restarted server.
+    engine.dispose()
+
+
+def _cases(user: User) -> list[tuple[str, object]]:
+    def rtd_raw(page: int, line: str | None = None, rule: str | None = None):
+        return lambda db: mypage.rtd_raw_list(line=line, rule=rule, page=page, current_user=user, db=db)
+
+    def listing(endpoint, page: int):
+        return lambda db: endpoint(page=page, current_user=user, db=db)
+
+    return [
+        ("rtd raw options", lambda db: mypage.rtd_raw_options(current_user=user, db=db)),
+        ("rtd raw page 1", rtd_raw(1)),
+        ("rtd raw page 2000", rtd_raw(2000)),
+        ("rtd raw line+rule", rtd_raw(1, line=_LINES[1], rule=_RULES[1])),
+        ("rtd summary page 1", listing(mypage.rtd_summary_list, 1)),
+        ("rtd summary page 200", listing(mypage.rtd_summary_list, 200)),
+        ("ezdfs raw page 1", listing(mypage.ezdfs_raw_list, 1)),
+        ("ezdfs summary page 200", listing(mypage.ezdfs_summary_list, 200)),
+    ]
+
+
+def _time_case(call, repeat: int) -> float:
+    """Median milliseconds of `repeat` calls, each on a fresh session like a request."""
+    samples: list[float] = []
+    for attempt in range(repeat + 1):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            call(db)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+        if attempt:  # the first call only warms the page cache
+            samples.append(elapsed)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    init_db()
+    db = SessionLocal()
+    try:
+        generated = db.query(TestTask.id).first() is None
+        if generated:
+            started = time.perf_counter()
+            _generate(args.tasks, args.users)
+            print(f"generated {args.tasks} tasks in {time.perf_counter() - started:.1f}s -> {db_path}")
+        user = db.query(User).order_by(User.id.asc()).first()
+        task_count = db.query(TestTask.id).filter(TestTask.user_id == user.user_id).count()
+    finally:
+        db.close()
+
+    print(f"user {user.user_id}: {task_count} tasks, budget {args.budget_ms:.0f} ms (median of {args.repeat})")
+    over_budget: list[str] = []
+    for name, call in _cases(user):
+        median_ms = _time_case(call, max(1, args.repeat))
+        flag = "" if median_ms <= args.budget_ms else "  OVER BUDGET"
+        print(f"  {name:<24} {median_ms:8.1f} ms{flag}")
+        if flag:
+            over_budget.append(name)
+
+    if over_budget:
+        print(f"FAIL: {', '.join(over_budget)} over {args.budget_ms:.0f} ms")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Settings are read once at import time, so point the app at a throwaway DB and
+# result directory first (never the developer's data/ directory).
+_TEST_DIR = tempfile.mkdtemp(prefix="atm-tests-")
+os.environ["DB_PATH"] = str(Path(_TEST_DIR) / "test.db")
+os.environ["RESULT_BASE_PATH"] = str(Path(_TEST_DIR) / "results")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import pytest  # noqa: E402
+
+from app.db.session import Base, SessionLocal, init_db  # noqa: E402
+from app.models import entities  # noqa: E402
+
+init_db()
+
+
+@pytest.fixture()
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        for table in reversed(Base.metadata.sorted_tables):
+            session.execute(table.delete())
+        session.commit()
+        session.close()
+
+
+@pytest.fixture()
+def result_dir() -> Path:
+    return Path(os.environ["RESULT_BASE_PATH"])
+
+
+def make_task(db, task_id: str, **values) -> entities.TestTask:
+    """Insert one TestTask with defaults for the columns a test does not care about."""
+    values.setdefault("test_type", "RTD")
+    values.setdefault("action_type", "TEST")
+    values.setdefault("user_id", "u1")
+    values.setdefault("target_name", "LINE_A")
+    values.setdefault("status", "PENDING")
+    values.setdefault("current_step", "TESTING")
+    values.setdefault("requested_payload_json", "{}")
+    task = entities.TestTask(task_id=task_id, **values)
+    db.add(task)
+    db.flush()
+    return task
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from conftest import make_task
+
+from app.api.mypage import rtd_raw_list, rtd_raw_options
+from app.models import entities
+from app.services.file_service import generate_raw_file
+from app.services.raw_capture import TaskRawCapture, load_captured_rule_files
+from app.utils.enums import TaskStatus
+
+RULES = ["RULE_A", "RULE_B", "RULE_C"]
+
+
+def test_canceled_task_lists_only_rules_with_raw_output(db):
+    task = make_task(
+        db,
+        "cancel-1",
+        rules=[
+            entities.TestTaskRule(rule_name=rule_name, position=position)
+            for position, rule_name in enumerate(RULES)
+        ],
+    )
+    with TaskRawCapture(task).open("RULE_A") as capture:
+        capture.write(b"partial output\n")
+
+    # As run_task does once the second rule was stopped before its capture opened.
+    task.status = TaskStatus.CANCELED.value
+    task.ended_at = datetime.now(timezone.utc)
+    db.commit()
+    generate_raw_file(db, task, "", None, load_captured_rule_files(task))
+
+    user = entities.User(user_id="u1")
+    listed = rtd_raw_list(line=None, rule=None, page=1, current_user=user, db=db)["data"]
+    assert listed["total"] == 1
+    assert [item["rule"] for item in listed["items"]] == ["RULE_A"]
+    assert rtd_raw_options(current_user=user, db=db)["data"]["rules"] == ["RULE_A"]
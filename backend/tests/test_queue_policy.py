@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from conftest import make_task
+
+from app.models import entities
+from app.models.entities import TaskQueueEntry
+from app.services.queue_policy import (
+    QUEUE_POLICY_FIFO,
+    QUEUE_POLICY_ROUND_ROBIN,
+    QUEUE_POLICY_WEIGHTED_FAIR,
+    order_ezdfs_entries,
+)
+from app.services.task_queue import build_rtd_queue_key, enqueue_task
+
+MODULE = "MOD_A"
+
+
+def _entries(*specs: tuple[int, str, int]) -> list[TaskQueueEntry]:
+    return [
+        TaskQueueEntry(id=entry_id, task_id=f"t{entry_id}", step="TESTING", user_id=user_id, priority=priority)
+        for entry_id, user_id, priority in specs
+    ]
+
+
+def _ids(entries: list[TaskQueueEntry]) -> list[int]:
+    return [entry.id for entry in entries]
+
+
+def _finished_run(db, task_id: str, user_id: str, started_minutes_ago: int, seconds: int) -> None:
+    started_at = datetime.now(timezone.utc) - timedelta(minutes=started_minutes_ago)
+    make_task(
+        db,
+        task_id,
+        test_type="EZDFS",
+        user_id=user_id,
+        target_name=MODULE,
+        module_name=MODULE,
+        status="DONE",
+        started_at=started_at,
+        ended_at=started_at + timedelta(seconds=seconds),
+    )
+    db.commit()
+
+
+def test_fifo_orders_by_priority_then_id(db):
+    entries = _entries((1, "u1", 0), (2, "u1", 0), (3, "u2", 5), (4, "u2", 0))
+    assert _ids(order_ezdfs_entries(db, MODULE, entries, QUEUE_POLICY_FIFO)) == [3, 1, 2, 4]
+
+
+def test_round_robin_alternates_users_starting_with_the_longest_idle(db):
+    _finished_run(db, "old-u1", "u1", started_minutes_ago=5, seconds=30)
+    _finished_run(db, "old-u2", "u2", started_minutes_ago=30, seconds=30)
+    entries = _entries((1, "u1", 0), (2, "u1", 0), (3, "u1", 0), (4, "u2", 0), (5, "u2", 0))
+
+    assert _ids(order_ezdfs_entries(db, MODULE, entries, QUEUE_POLICY_ROUND_ROBIN)) == [4, 1, 5, 2, 3]
+
+
+def test_round_robin_keeps_priority_tiers(db):
+    entries = _entries((1, "u1", 0), (2, "u1", 0), (3, "u2", 0), (4, "u2", 1))
+    assert _ids(order_ezdfs_entries(db, MODULE, entries, QUEUE_POLICY_ROUND_ROBIN)) == [4, 1, 3, 2]
+
+
+def test_weighted_fair_gives_heavy_users_fewer_turns(db):
+    _finished_run(db, "heavy", "u1", started_minutes_ago=20, seconds=600)
+    _finished_run(db, "light", "u2", started_minutes_ago=20, seconds=60)
+    entries = _entries((1, "u1", 0), (2, "u1", 0), (3, "u2", 0), (4, "u2", 0), (5, "u2", 0))
+
+    # u1: 600 + n*600, u2: 60 + n*60 -> every u2 entry finishes before u1's first.
+    assert _ids(order_ezdfs_entries(db, MODULE, entries, QUEUE_POLICY_WEIGHTED_FAIR)) == [3, 4, 5, 1, 2]
+
+
+def test_enqueue_refreshes_positions_of_waiters_it_overtakes(db):
+    queue_key = build_rtd_queue_key("u1", "LINE_A")
+    for task_id, priority in (("first", 0), ("second", 0), ("urgent", 5)):
+        task = make_task(db, task_id, priority=priority, rule_name=task_id)
+        enqueue_task(db, task, "TESTING", queue_key, None)
+
+    db.expire_all()
+    messages = dict(db.query(entities.TestTask.task_id, entities.TestTask.message).all())
+    assert messages == {
+        "urgent": "Queued: 테스트 urgent",
+        "first": "Queue: 테스트 urgent (2)",
+        "second": "Queue: 테스트 urgent (3)",
+    }
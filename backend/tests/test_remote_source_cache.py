@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import subprocess
+
+import pytest
+
+from app.core.exceptions import CatalogError
+from app.models.entities import HostConfig
+from app.services import remote_source_cache
+from app.utils.ssh_helpers import stat_remote_files
+
+
+class _LocalChannel:
+    def __init__(self, returncode: int) -> None:
+        self._returncode = returncode
+
+    def recv_exit_status(self) -> int:
+        return self._returncode
+
+
+class _LocalStream(io.BytesIO):
+    def __init__(self, data: bytes, returncode: int) -> None:
+        super().__init__(data)
+        self.channel = _LocalChannel(returncode)
+
+
+class _LocalSftp:
+    def open(self, path: str, mode: str):
+        return open(path, mode)
+
+    def close(self) -> None:
+        pass
+
+
+class LocalClient:
+    """Runs the remote helpers' commands on this machine instead of over SSH."""
+
+    def exec_command(self, command: str, timeout: int | None = None):
+        completed = subprocess.run(command, shell=True, capture_output=True, timeout=timeout)
+        return (
+            None,
+            _LocalStream(completed.stdout, completed.returncode),
+            _LocalStream(completed.stderr, completed.returncode),
+        )
+
+    def open_sftp(self) -> _LocalSftp:
+        return _LocalSftp()
+
+
+@pytest.fixture()
+def sources(tmp_path):
+    (tmp_path / "RULE.report").write_text("MACRO_A\n")
+    (tmp_path / "linked.report").symlink_to(tmp_path / "RULE.report")
+    (tmp_path / "dangling.report").symlink_to(tmp_path / "gone.report")
+    (tmp_path / "subdir").mkdir()
+    return tmp_path
+
+
+@pytest.fixture()
+def local_ssh(monkeypatch):
+    remote_source_cache.clear_remote_source_cache()
+    monkeypatch.setattr(
+        remote_source_cache,
+        "open_limited_ssh_client",
+        lambda host, login_user: contextlib.nullcontext(LocalClient()),
+    )
+    yield
+    remote_source_cache.clear_remote_source_cache()
+
+
+def test_stat_follows_symlinks_and_skips_non_files(sources):
+    paths = [str(sources / name) for name in ("RULE.report", "linked.report", "dangling.report", "subdir", "none")]
+    stamps = stat_remote_files(LocalClient(), paths)
+
+    assert set(stamps) == {str(sources / "RULE.report"), str(sources / "linked.report")}
+    # A symlink is stamped by its target, so editing the target invalidates both.
+    assert stamps[str(sources / "linked.report")] == stamps[str(sources / "RULE.report")]
+
+
+def test_read_remote_files_reads_symlinked_sources(sources, local_ssh):
+    host = HostConfig(name="local", ip="127.0.0.1", modifier="")
+    linked = str(sources / "linked.report")
+
+    assert remote_source_cache.read_remote_files(host, "u", [linked]) == {linked: b"MACRO_A\n"}
+    with pytest.raises(CatalogError):
+        remote_source_cache.read_remote_files(host, "u", [str(sources / "dangling.report")])
+
+
+def test_read_changed_remote_files_skips_unchanged_stamps(sources, local_ssh):
+    host = HostConfig(name="local", ip="127.0.0.1", modifier="")
+    path = str(sources / "RULE.report")
+
+    first = remote_source_cache.read_changed_remote_files(host, "u", [path], {})
+    stamp, data = first[path]
+    assert data == b"MACRO_A\n"
+    assert remote_source_cache.read_changed_remote_files(host, "u", [path], {path: stamp}) == {path: (stamp, None)}
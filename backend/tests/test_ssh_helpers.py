@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import contextlib
+
+import pytest
+
+from app.core.exceptions import SSHConnectionError
+from app.models.entities import HostConfig
+from app.services import ssh_runtime
+from app.utils.ssh_helpers import stream_remote_command
+
+
+class _SilentChannel:
+    """A remote command that reported its process group and then hangs."""
+
+    def __init__(self) -> None:
+        self._stderr = bytearray(b"__ATM_PGID__=4242\n")
+        self.closed = False
+
+    def recv_ready(self) -> bool:
+        return False
+
+    def recv_stderr_ready(self) -> bool:
+        return bool(self._stderr)
+
+    def recv_stderr(self, size: int) -> bytes:
+        data = bytes(self._stderr[:size])
+        del self._stderr[:size]
+        return data
+
+    def exit_status_ready(self) -> bool:
+        return False
+
+    def recv_exit_status(self) -> int:
+        return 0
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _Stream:
+    def __init__(self, channel: object) -> None:
+        self.channel = channel
+
+
+class _Exited:
+    def recv_exit_status(self) -> int:
+        return 0
+
+
+class _RecordingClient:
+    def __init__(self) -> None:
+        self.commands: list[str] = []
+        self.channel = _SilentChannel()
+
+    def exec_command(self, command: str, timeout: int | None = None):
+        self.commands.append(command)
+        if len(self.commands) == 1:
+            return None, _Stream(self.channel), None
+        return None, _Stream(_Exited()), None
+
+
+def test_idle_timeout_kills_the_remote_process_group(monkeypatch):
+    client = _RecordingClient()
+    monkeypatch.setattr(
+        ssh_runtime,
+        "open_limited_ssh_client",
+        lambda host, login_user: contextlib.nullcontext(client),
+    )
+    stderr = bytearray()
+
+    with pytest.raises(SSHConnectionError, match="no output"):
+        stream_remote_command(
+            HostConfig(name="h1"),
+            "u1",
+            "./atm_testscript RULE LINE_A",
+            bytearray().extend,
+            stderr.extend,
+            timeout=0,
+        )
+
+    assert client.channel.closed
+    assert "kill -TERM -- -4242" in client.commands[-1]
+    assert stderr == b""
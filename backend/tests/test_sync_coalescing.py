@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+
+from conftest import make_task
+
+from app.models import entities
+from app.models.entities import TaskQueueEntry
+from app.services.task_queue import build_rtd_queue_key, claim_next_task, complete_task, enqueue_task
+from app.utils.enums import ActionType, TaskStep
+
+LINE = "LINE_A"
+
+
+def _enqueue_rtd(db, task_id: str, user_id: str, action_type: ActionType) -> entities.TestTask:
+    task = make_task(
+        db,
+        task_id,
+        user_id=user_id,
+        action_type=action_type.value,
+        requested_payload_json=json.dumps({"target_lines": [LINE]}),
+    )
+    enqueue_task(db, task, TaskStep.TESTING.value, build_rtd_queue_key(user_id, LINE), None)
+    return task
+
+
+def _leased_syncs(db) -> list[TaskQueueEntry]:
+    db.expire_all()
+    return [
+        entry
+        for entry in db.query(TaskQueueEntry).filter(TaskQueueEntry.state == "LEASED").all()
+        if entry.coalesce_key
+    ]
+
+
+def test_cross_user_rtd_syncs_wait_for_running_sync_and_merge(db):
+    _enqueue_rtd(db, "copy-u1", "u1", ActionType.COPY)
+    assert claim_next_task("w1").task_id == "copy-u1"
+
+    _enqueue_rtd(db, "sync-u1", "u1", ActionType.SYNC)
+    _enqueue_rtd(db, "sync-u2", "u2", ActionType.SYNC)
+    first = claim_next_task("w1")
+    assert first.task_id == "sync-u2"
+    assert first.coalesced_task_ids == ()
+
+    # u3's queue is free, but an equivalent SYNC of the line is already running.
+    _enqueue_rtd(db, "sync-u3", "u3", ActionType.SYNC)
+    assert claim_next_task("w1") is None
+    assert [entry.task_id for entry in _leased_syncs(db)] == ["sync-u2"]
+
+    complete_task("copy-u1")
+    assert claim_next_task("w1") is None
+
+    complete_task("sync-u2")
+    second = claim_next_task("w1")
+    assert second.task_id == "sync-u1"
+    assert second.coalesced_task_ids == ("sync-u3",)
+
+    leased = {entry.task_id: entry.coalesced_into for entry in _leased_syncs(db)}
+    assert leased == {"sync-u1": None, "sync-u3": "sync-u1"}
+
+
+def test_equivalent_syncs_waiting_together_run_once(db):
+    for user_id in ("u1", "u2", "u3"):
+        _enqueue_rtd(db, f"sync-{user_id}", user_id, ActionType.SYNC)
+
+    claimed = claim_next_task("w1")
+    assert claimed.task_id == "sync-u1"
+    assert claimed.coalesced_task_ids == ("sync-u2", "sync-u3")
+    assert claim_next_task("w1") is None
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import asyncio
+
+from app.services.task_events import TaskEventBroker
+
+
+def _backlog(broker: TaskEventBroker, last_event_id: int | None) -> list[tuple[int, str]]:
+    async def subscribe():
+        subscriber, backlog = broker.subscribe("u1", last_event_id)
+        broker.unsubscribe(subscriber)
+        return backlog
+
+    return [(event.id, event.kind) for event in asyncio.run(subscribe())]
+
+
+def test_resume_replays_missed_events_of_the_same_process():
+    broker = TaskEventBroker()
+    broker.publish("task", {"task_id": "t1"}, user_id="u1")
+    broker.publish("task", {"task_id": "t2"}, user_id="u2")
+    broker.publish("target", {"target_name": "LINE_A"})
+
+    assert _backlog(broker, 1) == [(3, "target")]
+    assert _backlog(broker, 3) == []
+
+
+def test_id_from_a_previous_process_asks_for_resync_on_an_empty_broker():
+    assert _backlog(TaskEventBroker(), 742) == [(0, "resync")]
+
+
+def test_id_from_a_previous_process_asks_for_resync_after_new_events():
+    broker = TaskEventBroker()
+    broker.publish("task", {"task_id": "t1"}, user_id="u1")
+
+    assert _backlog(broker, 742) == [(1, "resync")]
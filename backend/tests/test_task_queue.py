@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from conftest import make_task
+
+from app.models import entities
+from app.models.entities import TaskQueueEntry
+from app.services.task_queue import (
+    ENTRY_LEASED,
+    ENTRY_WAITING,
+    build_rtd_queue_key,
+    cancel_waiting_entry,
+    claim_next_task,
+    complete_task,
+    enqueue_task,
+    recover_expired_leases,
+)
+from app.services.task_service import fail_orphaned_tasks
+
+
+def _enqueue(db, task_id: str, user_id: str = "u1", line: str = "LINE_A", **values) -> entities.TestTask:
+    task = make_task(db, task_id, user_id=user_id, target_name=line, **values)
+    enqueue_task(db, task, "TESTING", build_rtd_queue_key(user_id, line), None)
+    return task
+
+
+def _enqueue_module(db, task_id: str, module: str, user_id: str = "u1", **values) -> entities.TestTask:
+    task = make_task(db, task_id, test_type="EZDFS", user_id=user_id, target_name=module, module_name=module, **values)
+    enqueue_task(db, task, "TESTING", None, module)
+    return task
+
+
+def _expire_lease(db, task_id: str) -> None:
+    entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == task_id).one()
+    entry.lease_expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.commit()
+
+
+def _task(db, task_id: str) -> entities.TestTask:
+    db.expire_all()
+    return db.query(entities.TestTask).filter(entities.TestTask.task_id == task_id).one()
+
+
+def test_claim_serializes_one_queue_key_in_fifo_order(db):
+    _enqueue(db, "a1")
+    _enqueue(db, "a2")
+    _enqueue(db, "b1", user_id="u2")
+
+    claimed = [claim_next_task("w1").task_id, claim_next_task("w1").task_id]
+    assert claimed == ["a1", "b1"]
+    assert claim_next_task("w1") is None
+
+    complete_task("a1")
+    assert claim_next_task("w1").task_id == "a2"
+
+
+def test_claim_runs_higher_priority_first(db):
+    _enqueue(db, "low")
+    _enqueue(db, "high", priority=3)
+    assert claim_next_task("w1").task_id == "high"
+
+
+def test_claim_counts_attempts_and_records_owner(db):
+    _enqueue_module(db, "m1", "MOD_A")
+    claimed = claim_next_task("owner-1")
+    assert (claimed.task_id, claimed.attempts) == ("m1", 1)
+
+    db.expire_all()
+    entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == "m1").one()
+    assert (entry.state, entry.lease_owner) == (ENTRY_LEASED, "owner-1")
+
+
+def test_expired_test_lease_is_requeued_and_claimed_again(db):
+    _enqueue(db, "t1")
+    claim_next_task("dead-worker")
+    _expire_lease(db, "t1")
+
+    assert recover_expired_leases(db) == 1
+    db.expire_all()
+    entry = db.query(TaskQueueEntry).filter(TaskQueueEntry.task_id == "t1").one()
+    assert (entry.state, entry.lease_owner) == (ENTRY_WAITING, None)
+    assert _task(db, "t1").status == "PENDING"
+
+    claimed = claim_next_task("w2")
+    assert (claimed.task_id, claimed.attempts) == ("t1", 2)
+
+
+def test_expired_lease_fails_after_max_attempts(db, monkeypatch):
+    from app.services import task_queue
+
+    monkeypatch.setattr(task_queue.settings, "task_queue_max_attempts", 1)
+    _enqueue(db, "t1")
+    claim_next_task("dead-worker")
+    _expire_lease(db, "t1")
+
+    assert recover_expired_leases(db) == 1
+    assert db.query(TaskQueueEntry).count() == 0
+    assert _task(db, "t1").status == "FAIL"
+
+
+def test_expired_copy_lease_is_never_requeued(db):
+    _enqueue(db, "copy", action_type="COPY")
+    claim_next_task("dead-worker")
+    _expire_lease(db, "copy")
+
+    recover_expired_leases(db)
+    assert db.query(TaskQueueEntry).count() == 0
+    assert _task(db, "copy").status == "FAIL"
+
+
+def test_orphan_sweep_skips_tasks_whose_enqueue_may_still_run(db):
+    make_task(db, "fresh")
+    stale = make_task(db, "stale")
+    stale.updated_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    _enqueue(db, "queued")
+    db.commit()
+    db.query(entities.TestTask).filter(entities.TestTask.task_id == "queued").update(
+        {"updated_at": datetime.now(timezone.utc) - timedelta(hours=1)}
+    )
+    db.commit()
+
+    assert fail_orphaned_tasks(db) == 1
+    assert _task(db, "stale").status == "FAIL"
+    assert _task(db, "fresh").status == "PENDING"
+    assert _task(db, "queued").status == "PENDING"
+
+
+def test_cancel_before_enqueue_marks_canceled_and_skips_the_entry(db):
+    task = make_task(db, "early")
+    db.commit()
+
+    # The request's BackgroundTask has not inserted the queue entry yet.
+    assert cancel_waiting_entry(db, task)
+    assert _task(db, "early").status == "CANCELED"
+
+    enqueue_task(db, _task(db, "early"), "TESTING", build_rtd_queue_key("u1", "LINE_A"), None)
+    assert db.query(TaskQueueEntry).count() == 0
+    assert _task(db, "early").status == "CANCELED"
+    assert claim_next_task("w1") is None
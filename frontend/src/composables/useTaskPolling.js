@@ -1,18 +1,53 @@
 import { onBeforeUnmount, onMounted } from 'vue'
 
+import { isTaskStreamConnected, subscribeTaskStream, waitForTaskStreamEvent } from './useTaskStream'
+
 const TERMINAL_TASK_STATUSES = new Set(['DONE', 'FAIL', 'CANCELED'])
+const STREAM_DEBOUNCE_MS = 300
 
 export function isTerminalTaskStatus(status) {
   return TERMINAL_TASK_STATUSES.has(String(status || '').toUpperCase())
 }
 
+// Task updates arrive over the SSE task stream. `onEvent` applies deltas
+// directly; without it (or on `resync`) an event triggers a debounced tickFn.
+// Polling stays as a fallback: every `intervalMs` while the stream is down,
+// every `streamFallbackIntervalMs` while it is connected.
 export function useTaskPolling(tickFn, options = {}) {
   const intervalMs = options.intervalMs ?? 3000
+  const streamFallbackIntervalMs = options.streamFallbackIntervalMs ?? 30000
+  const onEvent = options.onEvent ?? null
   let timerId = null
+  let debounceId = null
+  let unsubscribe = null
+  let lastTickAt = Date.now()
+
+  function runTick() {
+    lastTickAt = Date.now()
+    tickFn()
+  }
+
+  function scheduleTick() {
+    if (debounceId) return
+    debounceId = window.setTimeout(() => {
+      debounceId = null
+      runTick()
+    }, STREAM_DEBOUNCE_MS)
+  }
 
   onMounted(() => {
+    unsubscribe = subscribeTaskStream((event) => {
+      if (onEvent && event.kind !== 'resync') {
+        onEvent(event)
+        return
+      }
+      scheduleTick()
+    })
     timerId = window.setInterval(() => {
-      tickFn()
+      const dueMs = isTaskStreamConnected() ? streamFallbackIntervalMs : intervalMs
+      if (Date.now() - lastTickAt >= dueMs) {
+        runTick()
+      }
     }, intervalMs)
   })
 
@@ -21,12 +56,19 @@ export function useTaskPolling(tickFn, options = {}) {
       window.clearInterval(timerId)
       timerId = null
     }
+    if (debounceId) {
+      window.clearTimeout(debounceId)
+      debounceId = null
+    }
+    unsubscribe?.()
+    unsubscribe = null
   })
 }
 
 export async function waitForTaskTerminalStatus(tickFn, getMatchedTasks, taskIds, options = {}) {
   const timeoutMs = options.timeoutMs ?? 15 * 60 * 1000
   const intervalMs = options.intervalMs ?? 1500
+  const streamFallbackIntervalMs = options.streamFallbackIntervalMs ?? 10000
   const timeoutMessage = options.timeoutMessage ?? '작업 완료 대기 시간이 초과되었습니다.'
   const startedAt = Date.now()
 
@@ -43,7 +85,12 @@ export async function waitForTaskTerminalStatus(tickFn, getMatchedTasks, taskIds
       return matched
     }
 
-    await new Promise((resolve) => window.setTimeout(resolve, intervalMs))
+    if (isTaskStreamConnected()) {
+      // Re-check as soon as any task event arrives; the timeout is only a safety net.
+      await waitForTaskStreamEvent(streamFallbackIntervalMs)
+    } else {
+      await new Promise((resolve) => window.setTimeout(resolve, intervalMs))
+    }
   }
 
   throw new Error(timeoutMessage)
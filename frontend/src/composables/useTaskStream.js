@@ -0,0 +1,114 @@
+import { ref } from 'vue'
+
+import { API_BASE_URL } from '../api'
+import { useAuthStore } from '../stores/auth'
+
+const EVENT_KINDS = ['task', 'queue', 'target', 'resync']
+const RECONNECT_DELAYS_MS = [1000, 3000, 10000, 30000]
+
+const connected = ref(false)
+const listeners = new Set()
+let source = null
+let sourceToken = ''
+let reconnectTimer = null
+let reconnectAttempt = 0
+
+function notify(event) {
+  for (const listener of listeners) {
+    listener(event)
+  }
+}
+
+function closeSource() {
+  if (source) {
+    source.close()
+    source = null
+  }
+  connected.value = false
+}
+
+function scheduleReconnect() {
+  if (reconnectTimer || !listeners.size) return
+  const delay = RECONNECT_DELAYS_MS[Math.min(reconnectAttempt, RECONNECT_DELAYS_MS.length - 1)]
+  reconnectAttempt += 1
+  reconnectTimer = window.setTimeout(() => {
+    reconnectTimer = null
+    connect()
+  }, delay)
+}
+
+function connect() {
+  if (typeof window === 'undefined' || !('EventSource' in window)) return
+  const token = useAuthStore().token
+  if (!token) return
+  if (source && sourceToken === token) return
+
+  closeSource()
+  sourceToken = token
+  // A fresh connection has no Last-Event-ID, so listeners reload once.
+  const needsResync = reconnectAttempt > 0
+  source = new EventSource(`${API_BASE_URL}/api/events/tasks?token=${encodeURIComponent(token)}`)
+
+  source.onopen = () => {
+    connected.value = true
+    reconnectAttempt = 0
+  }
+  source.onerror = () => {
+    connected.value = false
+    // CONNECTING means the browser retries by itself and resumes with Last-Event-ID.
+    if (source?.readyState === EventSource.CLOSED) {
+      closeSource()
+      scheduleReconnect()
+    }
+  }
+  for (const kind of EVENT_KINDS) {
+    source.addEventListener(kind, (rawEvent) => {
+      let data = {}
+      try {
+        data = JSON.parse(rawEvent.data || '{}')
+      } catch {
+        return
+      }
+      notify({ kind, data })
+    })
+  }
+  if (needsResync) {
+    notify({ kind: 'resync', data: {} })
+  }
+}
+
+export function isTaskStreamConnected() {
+  return connected.value
+}
+
+export function subscribeTaskStream(listener) {
+  listeners.add(listener)
+  connect()
+  return () => {
+    listeners.delete(listener)
+    if (!listeners.size) {
+      if (reconnectTimer) {
+        window.clearTimeout(reconnectTimer)
+        reconnectTimer = null
+      }
+      closeSource()
+    }
+  }
+}
+
+export function waitForTaskStreamEvent(timeoutMs) {
+  return new Promise((resolve) => {
+    let settled = false
+    let timerId = null
+    const finish = (event) => {
+      if (settled) return
+      settled = true
+      window.clearTimeout(timerId)
+      // Unsubscribe after the current dispatch so listener iteration is not disturbed.
+      window.setTimeout(() => unsubscribe(), 0)
+      resolve(event)
+    }
+    timerId = window.setTimeout(() => finish(null), timeoutMs)
+    const unsubscribe = subscribeTaskStream(finish)
+  })
+}
@@ -419,6 +419,28 @@ export const useEzdfsStore = defineStore("ezdfs", () => {
     }
   }
 
+  // Apply one task stream delta (see composables/useTaskStream.js) without refetching /status.
+  function applyTaskEvent({ kind, data }) {
+    if (kind === "task" && data.test_type === "EZDFS") {
+      const index = tasks.value.findIndex((task) => task.task_id === data.task_id);
+      if (index >= 0) {
+        tasks.value.splice(index, 1, data);
+      } else {
+        tasks.value.unshift(data);
+      }
+      if (currentTask.value?.task_id === data.task_id) {
+        currentTask.value = data;
+      }
+      return;
+    }
+    if (kind === "queue") {
+      for (const item of data.items || []) {
+        const task = tasks.value.find((entry) => entry.task_id === item.task_id);
+        if (task) task.message = item.message;
+      }
+    }
+  }
+
   async function generateSummary(taskId) {
     await apiPost(`/api/ezdfs/results/${taskId}/summary`, {});
     await refreshTasks();
@@ -525,6 +547,7 @@ export const useEzdfsStore = defineStore("ezdfs", () => {
     runAllRules,
     waitForTasks,
     refreshTasks,
+    applyTaskEvent,
     generateSummary,
     generateAndDownloadSummary,
     generateReportsForTasks,
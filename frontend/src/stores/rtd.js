@@ -378,6 +378,47 @@ export const useRtdStore = defineStore('rtd', () => {
     tasks.value = (await apiGet('/api/rtd/status')).items
   }
 
+  let monitorRefreshTimer = null
+
+  function scheduleMonitorRefresh() {
+    if (monitorRefreshTimer) return
+    monitorRefreshTimer = window.setTimeout(async () => {
+      monitorRefreshTimer = null
+      try {
+        await refreshMonitor()
+      } catch {
+        // The next stream event or fallback poll retries.
+      }
+    }, 300)
+  }
+
+  // Apply one task stream delta (see composables/useTaskStream.js) without refetching /status.
+  function applyTaskEvent({ kind, data }) {
+    if (kind === 'task' && data.test_type === 'RTD') {
+      const index = tasks.value.findIndex((task) => task.task_id === data.task_id)
+      if (index >= 0) {
+        tasks.value.splice(index, 1, data)
+      } else {
+        tasks.value.unshift(data)
+      }
+      return
+    }
+    if (kind === 'queue') {
+      let touchesMonitor = false
+      for (const item of data.items || []) {
+        const task = tasks.value.find((entry) => entry.task_id === item.task_id)
+        if (!task) continue
+        task.message = item.message
+        touchesMonitor = touchesMonitor || targetLines.value.includes(task.target_name)
+      }
+      if (touchesMonitor) scheduleMonitorRefresh()
+      return
+    }
+    if (kind === 'target' && data.test_type === 'RTD' && targetLines.value.includes(data.target_name)) {
+      scheduleMonitorRefresh()
+    }
+  }
+
   async function refreshMonitor() {
     if (!targetLines.value.length) {
       monitorItems.value = []
@@ -548,6 +589,7 @@ export const useRtdStore = defineStore('rtd', () => {
     executeAction,
     refreshTasks,
     refreshMonitor,
+    applyTaskEvent,
     generateSummary,
     downloadRaw,
     downloadSummary,